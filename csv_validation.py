@@ -0,0 +1,112 @@
+import csv
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# Checking large CSV files on several processes.
+#
+# The file is split into byte ranges that each end on a row boundary (a
+# newline outside quotes), and every range is parsed and checked by a worker
+# process. Workers number rows from the start of their own range; results
+# come back in file order and the caller adds the rows of the ranges before,
+# so row numbers and errors are the same however the file was split.
+
+# Bytes per range handed to a worker
+CHUNK_BYTES = 4 * 1024 * 1024
+# Smaller files are checked in the calling process, as starting workers costs more
+PARALLEL_MIN_BYTES = 8 * 1024 * 1024
+
+def data_start(path, skip_rows=0):
+    """Byte offset after a UTF-8 byte order mark and skip_rows header rows"""
+    with open(path, 'rb') as f:
+        offset = 3 if f.read(3) == b'\xef\xbb\xbf' else 0
+        f.seek(offset)
+        for _ in range(skip_rows):
+            offset += len(_read_row(f))
+    return offset
+
+def _read_row(f):
+    """The bytes of one CSV row, which may span lines inside quotes"""
+    row = f.readline()
+    while row.count(b'"') % 2 and row.endswith(b'\n'):
+        row += f.readline()
+    return row
+
+def split_ranges(path, start=0, chunk_bytes=CHUNK_BYTES):
+    """[(start, end)] byte ranges covering the file from start, each ending on a row boundary"""
+    size = os.path.getsize(path)
+    ranges = []
+    with open(path, 'rb') as f:
+        while start < size:
+            f.seek(start)
+            block = f.read(chunk_bytes)
+            end = start + len(block)
+            # Quotes come in pairs (an escaped quote is doubled), so a newline
+            # ends a row when the quotes before it since start are even
+            quoted = block.count(b'"') % 2 == 1
+            while end < size:
+                piece = f.read(64 * 1024)
+                cut = None
+                for index, byte in enumerate(piece):
+                    if byte == 0x22:
+                        quoted = not quoted
+                    elif byte == 0x0a and not quoted:
+                        cut = index + 1
+                        break
+                if cut is not None:
+                    end += cut
+                    break
+                end += len(piece)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+def read_range(path, start, end, delimiter=","):
+    """csv.reader over the rows in bytes [start, end) of a UTF-8 file"""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return csv.reader(io.StringIO(data.decode('utf-8'), newline=''), delimiter=delimiter)
+
+def check_ranges(check, path, ranges, args=(), workers=None, on_progress=None):
+    """[check(path, start, end, *args)] for every range, in file order.
+    
+    Runs on a pool of worker processes (by default one per CPU) when the
+    ranges add up to PARALLEL_MIN_BYTES or more, so check must be a
+    module-level function.
+    on_progress(done bytes, total bytes) is called as ranges finish and may
+    raise to stop the work; ranges not started yet are then dropped.
+    """
+    total = sum(end - start for start, end in ranges)
+    done = 0
+    workers = workers or os.cpu_count() or 1
+    if total < PARALLEL_MIN_BYTES or len(ranges) < 2 or workers < 2:
+        results = []
+        for start, end in ranges:
+            results.append(check(path, start, end, *args))
+            done += end - start
+            if on_progress is not None:
+                on_progress(done, total)
+        return results
+    
+    # Spawned rather than forked: forking a process that runs Tk and threads is unsafe
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        futures = [pool.submit(check, path, start, end, *args) for start, end in ranges]
+        results = []
+        for future, (start, end) in zip(futures, ranges):
+            results.append(future.result())
+            done += end - start
+            if on_progress is not None:
+                on_progress(done, total)
+        return results
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def format_throughput(rows, size, seconds):
+    """Rows and megabytes checked and the rate, for a dry run report"""
+    seconds = max(seconds, 1e-6)
+    megabytes = size / (1024 * 1024)
+    return (f"{rows:,} rows ({megabytes:.1f} MB) in {seconds:.1f} s: "
+            f"{rows / seconds:,.0f} rows/s, {megabytes / seconds:.1f} MB/s")
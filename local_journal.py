@@ -0,0 +1,189 @@
+import json
+import os
+import pickle
+import queue
+import threading
+
+class LocalJournal:
+    """Durable local-mode storage: an append-only journal plus compacted snapshots.
+    
+    Every change is recorded as one JSON line with a sequence number. Lines
+    are written and fsynced in batches by a background thread, so the Tk
+    thread never waits on the disk. After compact_after changes the owner's
+    full state is written as a snapshot and the journal starts over; entries
+    the snapshot already covers are skipped on load, so a crash between the
+    two steps cannot apply a change twice. Snapshots are pickled, which keeps
+    large arrays cheap to write and read back.
+    """
+    
+    def __init__(self, base_path, compact_after=10000, flush_interval=0.5):
+        self.journal_path = base_path + ".journal"
+        self.snapshot_path = base_path + ".snapshot"
+        self.compact_after = compact_after
+        self.flush_interval = flush_interval
+        
+        self.sequence = 0
+        self.entries_since_snapshot = 0
+        
+        self._pending = queue.Queue()
+        self._closed = False
+        self._writer = threading.Thread(target=self._write_loop, name="local-journal", daemon=True)
+    
+    def load(self, restore, apply):
+        """Read the snapshot and replay the journal, then start writing.
+        
+        restore(state) receives the snapshot state (skipped if there is none)
+        and apply(op, args) is called for every journal entry after it.
+        Returns the number of journal entries replayed.
+        """
+        snapshot_sequence = 0
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "rb") as f:
+                snapshot = pickle.load(f)
+            snapshot_sequence = snapshot["sequence"]
+            restore(snapshot["state"])
+        self.sequence = snapshot_sequence
+        
+        replayed = 0
+        if os.path.exists(self.journal_path):
+            valid_bytes = 0
+            torn = False
+            with open(self.journal_path, "rb") as f:
+                for line in f:
+                    try:
+                        if not line.endswith(b"\n"):
+                            raise ValueError("incomplete line")
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A torn last line from a crash mid-write
+                        torn = True
+                        break
+                    valid_bytes += len(line)
+                    if entry["seq"] <= snapshot_sequence:
+                        continue
+                    apply(entry["op"], entry["args"])
+                    self.sequence = entry["seq"]
+                    replayed += 1
+            if torn:
+                # Cut it off so new entries are not appended to the fragment
+                os.truncate(self.journal_path, valid_bytes)
+        
+        self.entries_since_snapshot = replayed
+        self._writer.start()
+        return replayed
+    
+    def record(self, op, *args):
+        """Queue one change for the background writer"""
+        self.sequence += 1
+        self.entries_since_snapshot += 1
+        # Serialized on the writer thread; args must not be mutated afterwards
+        self._pending.put(("entry", (self.sequence, op, args)))
+    
+    def needs_compaction(self):
+        return self.entries_since_snapshot >= self.compact_after
+    
+    def compact(self, state):
+        """Queue a snapshot of state (as of the last recorded change)"""
+        self.entries_since_snapshot = 0
+        self._pending.put(("snapshot", {"sequence": self.sequence, "state": state}))
+    
+    def flush(self):
+        """Block until everything recorded so far is on disk"""
+        done = threading.Event()
+        self._pending.put(("flush", done))
+        if self._writer.is_alive():
+            done.wait()
+    
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._pending.put(("close", None))
+            if self._writer.is_alive():
+                self._writer.join()
+    
+    def _write_loop(self):
+        journal = open(self.journal_path, "a", encoding="utf-8")
+        try:
+            while True:
+                # Wait for the first item, then take whatever else piled up
+                items = [self._pending.get()]
+                try:
+                    while True:
+                        items.append(self._pending.get_nowait())
+                except queue.Empty:
+                    pass
+                
+                stop = False
+                waiters = []
+                for kind, payload in items:
+                    if kind == "entry":
+                        sequence, op, args = payload
+                        journal.write(json.dumps({"seq": sequence, "op": op, "args": args},
+                                                 ensure_ascii=False) + "\n")
+                    elif kind == "snapshot":
+                        journal = self._write_snapshot(journal, payload)
+                    elif kind == "flush":
+                        waiters.append(payload)
+                    elif kind == "close":
+                        stop = True
+                
+                journal.flush()
+                os.fsync(journal.fileno())
+                for waiter in waiters:
+                    waiter.set()
+                if stop:
+                    return
+                
+                if not waiters:
+                    # Let more changes accumulate into the next batch
+                    threading.Event().wait(self.flush_interval)
+        finally:
+            journal.close()
+    
+    def _write_snapshot(self, journal, snapshot):
+        """Write the snapshot atomically, then start an empty journal"""
+        temp_path = self.snapshot_path + ".tmp"
+        with open(temp_path, "wb") as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.snapshot_path)
+        
+        journal.close()
+        return open(self.journal_path, "w", encoding="utf-8")
+
+class JournaledDict(dict):
+    """dict whose item assignments and deletions are recorded in a LocalJournal.
+    
+    Values must be replaced, not mutated in place, for changes to be saved.
+    """
+    
+    def __init__(self, journal):
+        super().__init__()
+        self.journal = journal
+        self._loaded = False
+    
+    def load(self):
+        """Read the saved items; changes are only recorded from here on"""
+        self.journal.load(self.update, self._apply)
+        self._loaded = True
+    
+    def _apply(self, op, args):
+        if op == "set":
+            dict.__setitem__(self, args[0], args[1])
+        elif op == "delete":
+            dict.pop(self, args[0], None)
+    
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, value)
+        self._record("set", key, value)
+    
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self._record("delete", key)
+    
+    def _record(self, op, *args):
+        if self._loaded:
+            self.journal.record(op, *args)
+            if self.journal.needs_compaction():
+                self.journal.compact(dict(self))
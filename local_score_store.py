@@ -0,0 +1,279 @@
+from array import array
+from collections import Counter
+from itertools import accumulate
+from collections.abc import Mapping
+from datetime import date
+
+class LocalScoreStore(Mapping):
+    """In-memory student and score data for local mode.
+    
+    Reads like a dict of student_id -> {"name", "class", "major"}; scores are
+    added through add_score(). Each student's scores for a subject are kept
+    as two compact arrays (score, date ordinal) instead of a dict per entry,
+    and the totals the reports need are kept up to date on every change:
+    latest score per subject, per-subject sums of latest scores, per-class
+    sums of student averages and class/major head counts. As in the
+    database backends the latest score is the one with the newest date,
+    and of several on the same date the one added last.
+    
+    With a LocalJournal attached (see load_journal) every change is also
+    recorded to disk. Snapshots are columnar, and a student's score history
+    is only unpacked from the loaded snapshot the first time it is used, so
+    loading a large store costs little more than building the student index.
+    """
+    
+    def __init__(self):
+        self.journal = None
+        self._students = {}
+        # student_id -> {subject: (array('d') scores, array('l') date ordinals)}
+        self._history = {}
+        # student_id -> {subject: latest score}, and the date ordinal of each
+        self._latest = {}
+        self._latest_dates = {}
+        # Histories still held in the loaded snapshot: student_id -> position,
+        # subject -> (start offsets, scores, date ordinals)
+        self._base_index = {}
+        self._base_subjects = {}
+        
+        self.subject_sums = {}
+        self.subject_counts = Counter()
+        self.class_counts = Counter()
+        self.major_counts = Counter()
+        # Averages of students that have a non-zero average, per class and overall
+        self.class_average_sums = {}
+        self.class_average_counts = Counter()
+        self.average_sum = 0.0
+        self.average_count = 0
+    
+    def __getitem__(self, student_id):
+        return self._students[student_id]
+    
+    def __iter__(self):
+        return iter(self._students)
+    
+    def __len__(self):
+        return len(self._students)
+    
+    def __contains__(self, student_id):
+        return student_id in self._students
+    
+    def load_journal(self, journal):
+        """Load the saved data from journal, then record every change to it"""
+        replayed = journal.load(self.restore, self._apply)
+        self.journal = journal
+        return replayed
+    
+    def _apply(self, op, args):
+        getattr(self, op)(*args)
+    
+    def _record(self, op, *args):
+        # Called after the change is applied, so a snapshot taken here includes it
+        if self.journal is not None:
+            self.journal.record(op, *args)
+            if self.journal.needs_compaction():
+                self.journal.compact(self.snapshot())
+    
+    def snapshot(self):
+        """Columnar copy of all students, score histories and running totals"""
+        ids = list(self._students)
+        columns = {}
+        for position, student_id in enumerate(ids):
+            for subject, (scores, dates) in self._subject_history(student_id).items():
+                column = columns.get(subject)
+                if column is None:
+                    column = columns[subject] = (array('l', [0]) * len(ids), array('d'), array('l'))
+                column[0][position] = len(scores)
+                column[1].extend(scores)
+                column[2].extend(dates)
+        
+        return {
+            "ids": ids,
+            "names": [self._students[student_id]["name"] for student_id in ids],
+            "classes": [self._students[student_id]["class"] for student_id in ids],
+            "majors": [self._students[student_id]["major"] for student_id in ids],
+            "subjects": columns,
+            "totals": {
+                "subject_sums": dict(self.subject_sums),
+                "subject_counts": dict(self.subject_counts),
+                "class_counts": dict(self.class_counts),
+                "major_counts": dict(self.major_counts),
+                "class_average_sums": dict(self.class_average_sums),
+                "class_average_counts": dict(self.class_average_counts),
+                "average_sum": self.average_sum,
+                "average_count": self.average_count,
+            },
+        }
+    
+    def restore(self, snapshot):
+        """Load a snapshot() result into an empty store"""
+        ids = snapshot["ids"]
+        self._students = {
+            student_id: {"name": name, "class": class_name, "major": major}
+            for student_id, name, class_name, major in zip(
+                ids, snapshot["names"], snapshot["classes"], snapshot["majors"])
+        }
+        self._base_index = {student_id: position for position, student_id in enumerate(ids)}
+        self._base_subjects = {
+            subject: (array('l', accumulate(counts, initial=0)), scores, dates)
+            for subject, (counts, scores, dates) in snapshot["subjects"].items()
+        }
+        
+        totals = snapshot["totals"]
+        self.subject_sums = totals["subject_sums"]
+        self.subject_counts = Counter(totals["subject_counts"])
+        self.class_counts = Counter(totals["class_counts"])
+        self.major_counts = Counter(totals["major_counts"])
+        self.class_average_sums = totals["class_average_sums"]
+        self.class_average_counts = Counter(totals["class_average_counts"])
+        self.average_sum = totals["average_sum"]
+        self.average_count = totals["average_count"]
+    
+    def _subject_history(self, student_id):
+        """{subject: (scores, dates)} for a student, without unpacking it"""
+        position = self._base_index.get(student_id)
+        if position is None:
+            return self._history[student_id]
+        history = {}
+        for subject, (starts, scores, dates) in self._base_subjects.items():
+            start, end = starts[position], starts[position + 1]
+            if end > start:
+                history[subject] = (scores[start:end], dates[start:end])
+        return history
+    
+    def _unpack(self, student_id):
+        """Move a student's history out of the loaded snapshot on first use"""
+        if student_id in self._base_index:
+            history = self._subject_history(student_id)
+            del self._base_index[student_id]
+            self._history[student_id] = history
+            latest = self._latest[student_id] = {}
+            latest_dates = self._latest_dates[student_id] = {}
+            for subject, (scores, dates) in history.items():
+                # Last of the entries with the newest date
+                newest = max(dates)
+                position = len(dates) - 1 - dates[::-1].index(newest)
+                latest[subject] = scores[position]
+                latest_dates[subject] = newest
+    
+    def add_student(self, student_id, name, class_name, major):
+        """Add a student, or replace their name, class and major"""
+        if student_id in self._students:
+            self.update_student(student_id, name, class_name, major)
+            return
+        self._students[student_id] = {"name": name, "class": class_name, "major": major}
+        self._history[student_id] = {}
+        self._latest[student_id] = {}
+        self._latest_dates[student_id] = {}
+        self.class_counts[class_name] += 1
+        self.major_counts[major] += 1
+        self._record("add_student", student_id, name, class_name, major)
+    
+    def update_student(self, student_id, name, class_name, major):
+        data = self._students[student_id]
+        # Move the student's counts and average to the new class/major
+        average = self.average(student_id)
+        self._count_student(data, -1, average)
+        data.update({"name": name, "class": class_name, "major": major})
+        self._count_student(data, 1, average)
+        self._record("update_student", student_id, name, class_name, major)
+    
+    def remove_student(self, student_id):
+        data = self._students[student_id]
+        self._count_student(data, -1, self.average(student_id))
+        for subject, score in self._latest[student_id].items():
+            self._add_latest(subject, score, -1)
+        del self._students[student_id]
+        del self._history[student_id]
+        del self._latest[student_id]
+        del self._latest_dates[student_id]
+        self._record("remove_student", student_id)
+    
+    def add_score(self, student_id, subject, score, date_recorded):
+        """Append a score; date_recorded is a date or a "YYYY-MM-DD" string"""
+        if isinstance(date_recorded, str):
+            date_recorded = date.fromisoformat(date_recorded)
+        self._unpack(student_id)
+        
+        history = self._history[student_id].get(subject)
+        if history is None:
+            history = self._history[student_id][subject] = (array('d'), array('l'))
+        ordinal = date_recorded.toordinal()
+        history[0].append(score)
+        history[1].append(ordinal)
+        
+        # A score for an earlier date than the latest only joins the history;
+        # on the same date the newer entry wins, as in the database backends
+        latest_dates = self._latest_dates[student_id]
+        if ordinal >= latest_dates.get(subject, ordinal):
+            class_name = self._students[student_id]["class"]
+            latest = self._latest[student_id]
+            self._add_average(class_name, self.average(student_id), -1)
+            if subject in latest:
+                self._add_latest(subject, latest[subject], -1)
+            latest[subject] = score
+            latest_dates[subject] = ordinal
+            self._add_latest(subject, score, 1)
+            self._add_average(class_name, self.average(student_id), 1)
+        self._record("add_score", student_id, subject, score, date_recorded.isoformat())
+    
+    def latest_scores(self, student_id):
+        """{subject: latest score} for one student (empty if none)"""
+        self._unpack(student_id)
+        return self._latest.get(student_id, {})
+    
+    def average(self, student_id):
+        """Average of the student's latest score per subject (0 if none)"""
+        self._unpack(student_id)
+        latest = self._latest.get(student_id)
+        if not latest:
+            return 0
+        return sum(latest.values()) / len(latest)
+    
+    def history(self, student_id):
+        """Yield (subject, score, "YYYY-MM-DD") for every score of the student"""
+        self._unpack(student_id)
+        for subject, (scores, dates) in self._history.get(student_id, {}).items():
+            for score, ordinal in zip(scores, dates):
+                yield subject, score, date.fromordinal(ordinal).isoformat()
+    
+    def subject_average(self, subject):
+        """(average of latest scores, number of students) for one subject"""
+        count = self.subject_counts[subject]
+        return (self.subject_sums[subject] / count if count else 0, count)
+    
+    def class_average(self, class_name):
+        """(average of student averages, students with scores) for one class"""
+        count = self.class_average_counts[class_name]
+        return (self.class_average_sums[class_name] / count if count else 0, count)
+    
+    def system_average(self):
+        """(average of student averages, students with scores) over everyone"""
+        return (self.average_sum / self.average_count if self.average_count else 0,
+                self.average_count)
+    
+    def _count_student(self, data, sign, average):
+        self.class_counts[data["class"]] += sign
+        self.major_counts[data["major"]] += sign
+        for counter, key in ((self.class_counts, data["class"]), (self.major_counts, data["major"])):
+            if counter[key] <= 0:
+                del counter[key]
+        self._add_average(data["class"], average, sign)
+    
+    def _add_latest(self, subject, score, sign):
+        self.subject_sums[subject] = self.subject_sums.get(subject, 0.0) + sign * score
+        self.subject_counts[subject] += sign
+        if self.subject_counts[subject] <= 0:
+            del self.subject_counts[subject]
+            del self.subject_sums[subject]
+    
+    def _add_average(self, class_name, average, sign):
+        # Students without scores (average 0) are not counted, as in the reports
+        if average <= 0:
+            return
+        self.class_average_sums[class_name] = self.class_average_sums.get(class_name, 0.0) + sign * average
+        self.class_average_counts[class_name] += sign
+        if self.class_average_counts[class_name] <= 0:
+            del self.class_average_counts[class_name]
+            del self.class_average_sums[class_name]
+        self.average_sum += sign * average
+        self.average_count += sign
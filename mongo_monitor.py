@@ -0,0 +1,107 @@
+from query_executor import JobCancelled
+
+# Used by both MongoDB apps unless overridden on the command line
+DEFAULT_MONGODB_URI = "mongodb://localhost:27017/"
+DEFAULT_TIMEOUTS_MS = {
+    "serverSelectionTimeoutMS": 5000,
+    "connectTimeoutMS": 5000,
+    "socketTimeoutMS": 10000,
+}
+
+class MongoConnectionMonitor:
+    """Connects to MongoDB in the background and keeps checking it is up.
+    
+    connect() runs on a worker thread and returns an open client, raising if
+    the server cannot be reached; slow one-off setup such as creating indexes
+    belongs there too. While connected the server is pinged every
+    health_interval seconds; while not, connect() is retried every
+    retry_interval seconds. on_connected(client) and on_disconnected() are
+    called on the Tk thread, once per change of state, so the timeouts can be
+    as long as a remote cluster needs without ever blocking the UI.
+    """
+    
+    def __init__(self, executor, connect, on_connected, on_disconnected,
+                 health_interval=10.0, retry_interval=5.0):
+        self.executor = executor
+        self.connect = connect
+        self.on_connected = on_connected
+        self.on_disconnected = on_disconnected
+        self.health_interval = health_interval
+        self.retry_interval = retry_interval
+        self.job = None
+    
+    @property
+    def running(self):
+        return self.job is not None
+    
+    def start(self):
+        """Start connecting unless the monitor is already running"""
+        if self.job is None:
+            job = self.executor.submit(
+                self._run, name="mongodb-monitor",
+                on_event=lambda event, client=None: self._event(job, event, client),
+                on_error=lambda error: self._failed(job, error),
+                on_cancel=lambda: self._stopped(job)
+            )
+            self.job = job
+    
+    def stop(self):
+        if self.job is not None:
+            self.job.cancel()
+            self.job = None
+    
+    def restart(self):
+        """Drop the current connection and connect again from scratch"""
+        self.stop()
+        self.start()
+    
+    def _run(self, job):
+        client = None
+        reported = None
+        while True:
+            if client is None:
+                try:
+                    client = self.connect()
+                except JobCancelled:
+                    raise
+                except Exception:
+                    if reported is not False:
+                        reported = False
+                        job.emit("disconnected")
+                    job.sleep(self.retry_interval)
+                    continue
+                reported = True
+                try:
+                    job.emit("connected", client)
+                except JobCancelled:
+                    # Never reached the Tk thread, so nobody else will close it
+                    client.close()
+                    raise
+            
+            job.sleep(self.health_interval)
+            try:
+                client.admin.command('ping')
+            except Exception:
+                # The Tk thread owns the client from here and closes it
+                client = None
+                reported = False
+                job.emit("disconnected")
+    
+    def _event(self, job, event, client):
+        if self.job is not job:
+            if client is not None:
+                client.close()
+            return
+        if event == "connected":
+            self.on_connected(client)
+        else:
+            self.on_disconnected()
+    
+    def _failed(self, job, error):
+        print(f"MongoDB monitor stopped: {error}")
+        if self.job is job:
+            self.job = None
+    
+    def _stopped(self, job):
+        if self.job is job:
+            self.job = None
@@ -1,11 +1,26 @@
 # -*- coding: utf-8 -*-
+import sys
+from startup_profile import StartupProfiler
+
+# --profile-startup times every import below, so the profiler comes first
+startup_profiler = StartupProfiler.from_argv(sys.argv) if __name__ == "__main__" else None
+
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import csv
-from datetime import datetime
-from pymongo import MongoClient
-import sys
 import os
+import argparse
+import itertools
+from local_journal import LocalJournal, JournaledDict
+from query_executor import QueryExecutor
+from write_behind import WriteBehindQueue, MongoReplicator
+from mongo_monitor import MongoConnectionMonitor, DEFAULT_MONGODB_URI, DEFAULT_TIMEOUTS_MS
+from repositories import MemoryProfessorRepository, MongoProfessorRepository, prepare_professor_database
+from virtual_tree import VirtualTreeview, ListDataSource
+from report_cache import ChangeBus, ReportCache
+from professor_search import ProfessorSearchIndex
+from professor_groups import ProfessorGroups
+from professor_import import ProfessorImport
 
 # UTF-8 encoding setup
 import locale
@@ -17,8 +32,21 @@ except:
     except:
         print("Locale setup failed, using default settings")
 
+# Storage backends selectable with --backend
+BACKENDS = ("mongo", "local", "sqlite")
+
+# Pause after the last keystroke before the name search runs
+SEARCH_DEBOUNCE_MS = 150
+
+# Every report and the statistics are built from all professors
+ALL_PROFESSORS = (("professors", None),)
+
+# How often the report groups are reloaded from MongoDB in the background
+GROUPS_REFRESH_MS = 60000
+
 class ProfessorAdminSystem:
-    def __init__(self, root):
+    def __init__(self, root, backend="mongo", mongodb_uri=DEFAULT_MONGODB_URI, mongodb_timeouts=None,
+                 health_interval=10.0):
         self.root = root
         self.root.title("Professor Administration System")
         self.root.geometry("1024x768")
@@ -33,28 +61,90 @@ class ProfessorAdminSystem:
         # Font setup
         self.setup_fonts()
         
-        # Local data initialization
-        self.professors = {}
+        # Local data initialization, kept on disk so that data entered
+        # while MongoDB is unreachable is not lost
+        self.local_journal = LocalJournal("professors_local")
+        self.professors = JournaledDict(self.local_journal)
         
         # Department and position options
         self.departments = ["Computer Science", "Mathematics", "Physics", "Chemistry", "Biology", "Engineering", "Business", "Literature"]
         self.positions = ["Professor", "Associate Professor", "Assistant Professor", "Lecturer", "Emeritus Professor"]
         self.specializations = ["AI/Machine Learning", "Software Engineering", "Database Systems", "Network Security", "Web Development", "Data Science", "Computer Graphics", "Systems Programming"]
         
+        # Report texts, dropped as the writes they depend on are published,
+        # including the background reloads of the report groups that pick up
+        # what other clients wrote to MongoDB (see refresh_professor_groups)
+        self.changes = ChangeBus()
+        self.report_cache = ReportCache()
+        self.changes.subscribe(self.report_cache.invalidate)
+        
+        # Rows of the professor list, the search index and the report groups
+        # over the same professors; all are changed one professor at a time
+        # after a load
+        self.professor_source = ListDataSource([])
+        self.professor_source_mongodb = False
+        self.search_index = ProfessorSearchIndex()
+        self.professor_groups = ProfessorGroups()
+        self.search_after_id = None
+        
+        # The background check of a CSV file being imported or validated
+        self.csv_check_job = None
+        # The background reload of the report groups in MongoDB mode
+        self.groups_refresh_job = None
+        
         # Initialize MongoDB-related attributes
         self.client = None
         self.db = None
-        self.professors_collection = None
         self.use_mongodb = False
+        self.backend = backend
+        self.mongodb_uri = mongodb_uri
+        self.mongodb_timeouts = dict(DEFAULT_TIMEOUTS_MS, **(mongodb_timeouts or {}))
+        
+        # Connecting, health checks and replay all run off the Tk thread;
+        # the monitor and the replicator each hold a worker while running
+        self.executor = QueryExecutor(self.root, max_workers=4)
+        self.connection_monitor = MongoConnectionMonitor(
+            self.executor, self._connect_mongodb, self._on_mongodb_connected,
+            self._on_mongodb_disconnected, health_interval=health_interval
+        )
+        
+        # Local writes are queued for MongoDB and replayed once it is reachable again
+        self.write_behind = WriteBehindQueue("professors_pending")
+        self.replicator = MongoReplicator(
+            self.executor, self.write_behind, self._connect_for_replay,
+            self._replay_to_mongodb, self._mongodb_recovered
+        )
+        
+        # All reads and writes go through a repository: the local one (the
+        # journaled dict, queueing writes for MongoDB, or a SQLite database)
+        # or the MongoDB one while connected
+        self.sqlite_db = None
+        if self.backend == "sqlite":
+            from sqlite_manager import SQLiteConnectionManager
+            from repositories import SqliteProfessorRepository
+            self.sqlite_db = SQLiteConnectionManager("professors.db")
+            self.local_professors = SqliteProfessorRepository(self.sqlite_db)
+        else:
+            self.local_professors = MemoryProfessorRepository(self.professors, self.write_behind)
+        self.professor_repository = self.local_professors
         
         # Create GUI widgets first
         self.create_widgets()
+        self.root.bind("<<DatabaseModeChanged>>", self._on_mode_changed)
+        
+        # Saved local data is read before any input is handled, so that no
+        # change made meanwhile is overwritten by the load or left unjournaled
+        self.load_local_data()
         
         # MongoDB connection setup
-        self.root.after(100, self.setup_mongodb)
+        if self.backend == "mongo":
+            self.root.after(100, self.setup_mongodb)
+        else:
+            self.root.after(100, self._update_mode_indicator)
         
-        # Update professor list after a delay
+        # Show the local data right away; the list reloads if MongoDB connects
         self.root.after(200, self.update_professor_list)
+        self.root.after(GROUPS_REFRESH_MS, self.refresh_professor_groups)
     
     def setup_fonts(self):
         """Font setup for the application"""
@@ -70,42 +160,69 @@ class ProfessorAdminSystem:
             self.title_font = ('TkDefaultFont', 18, 'bold')
             self.button_font = ('TkDefaultFont', 18, 'bold')
     
+    def load_local_data(self):
+        """Load the local professors from their snapshot and journal"""
+        try:
+            self.professors.load()
+            self.write_behind.load()
+            self.changes.publish()
+        except Exception as e:
+            print(f"Failed to load local data: {e}")
+    
     def setup_mongodb(self):
-        """MongoDB connection setup (completely silent)"""
-        self.client = None
-        self.db = None
-        self.professors_collection = None
-        self.use_mongodb = False
+        """Start connecting to MongoDB in the background (completely silent).
         
+        The app runs on local data until the monitor reports a connection;
+        every later change of mode arrives as a <<DatabaseModeChanged>> event.
+        """
+        self.connection_monitor.start()
+    
+    def _open_mongodb_client(self):
+        """New client with the configured timeouts, pinged (raises if unreachable)"""
+        # Imported here so the local backend never loads the driver
+        from pymongo import MongoClient
+        
+        client = MongoClient(self.mongodb_uri, **self.mongodb_timeouts)
         try:
-            from pymongo import MongoClient
-            
-            self.client = MongoClient(
-                'mongodb://localhost:27017/',
-                serverSelectionTimeoutMS=50,
-                connectTimeoutMS=50,
-                socketTimeoutMS=50,
-                connect=False
-            )
-            
-            self.client.admin.command('ping')
-            
-            self.db = self.client['professor_admin_db']
-            self.professors_collection = self.db['professors']
-            
-            try:
-                self.professors_collection.create_index("professor_id", unique=True)
-                self.professors_collection.create_index([("department", 1), ("position", 1)])
-            except:
-                pass
-            
-            self.use_mongodb = True
-            
+            client.admin.command('ping')
         except:
-            self._cleanup_mongodb()
+            client.close()
+            raise
+        return client
+    
+    def _connect_mongodb(self):
+        """Connect and prepare the collection; runs on the monitor thread"""
+        client = self._open_mongodb_client()
+        
+        try:
+            prepare_professor_database(client['professor_admin_db'])
+        except Exception as e:
+            print(f"Preparing the professor collection failed: {e}")
         
+        return client
+    
+    def _on_mongodb_connected(self, client):
+        """The monitor reached MongoDB"""
+        self._cleanup_mongodb()
+        self.client = client
+        if len(self.write_behind):
+            # Local writes from an earlier outage go first; the replicator
+            # switches to the database once they are in
+            self.replicator.start()
+        else:
+            self._use_mongodb_client()
+    
+    def _use_mongodb_client(self):
+        """Switch to database mode on the monitor's client"""
+        self.db = self.client['professor_admin_db']
+        self.professor_repository = MongoProfessorRepository(self.db)
+        self._set_mongodb_mode(True)
+    
+    def _on_mongodb_disconnected(self):
+        """The monitor lost MongoDB (or never reached it)"""
+        self._cleanup_mongodb()
         self._update_mode_indicator()
-            
+    
     def _cleanup_mongodb(self):
         """Clean up MongoDB connection objects"""
         try:
@@ -116,21 +233,76 @@ class ProfessorAdminSystem:
         
         self.client = None
         self.db = None
-        self.professors_collection = None
-        self.use_mongodb = False
+        self.professor_repository = self.local_professors
+        self._set_mongodb_mode(False)
+    
+    def _set_mongodb_mode(self, enabled):
+        """Record the current mode and announce a change to the UI"""
+        if enabled != self.use_mongodb:
+            self.use_mongodb = enabled
+            # Reports now come from the other store
+            self.changes.publish()
+            self.root.event_generate("<<DatabaseModeChanged>>", when="tail")
+    
+    def _on_mode_changed(self, event=None):
+        """Show data from whichever store the app now uses"""
+        self._update_mode_indicator()
+        self.update_professor_list()
+        self.update_search_results()
+    
+    def _connect_for_replay(self):
+        """Open a MongoDB client for the replicator thread (raises if unreachable)"""
+        return self._open_mongodb_client()
+    
+    def _replay_to_mongodb(self, client, operations):
+        """Apply queued local writes to MongoDB; each one can safely be applied twice"""
+        professors = MongoProfessorRepository(client['professor_admin_db'])
+        
+        # Each run of operations of one kind is applied as one batch, in order,
+        # so a delete and a later re-add of the same ID stay in sequence
+        for kind, run in itertools.groupby(operations, key=lambda operation: operation[0]):
+            batch = [args for _, args in run]
+            if kind == "upsert_professor":
+                professors.add_many([dict(fields, professor_id=professor_id) for professor_id, fields in batch])
+            elif kind == "delete_professor":
+                for (professor_id,) in batch:
+                    professors.delete(professor_id)
+    
+    def _mongodb_recovered(self):
+        """Every queued local write is in MongoDB; switch back to database mode"""
+        if self.client is not None and not self.use_mongodb:
+            self._use_mongodb_client()
     
     def _fallback_to_local(self, operation_name="Operation"):
         """Silent fallback to local mode when MongoDB fails"""
         if self.use_mongodb:
             self._cleanup_mongodb()
+            # Reconnect from scratch; the monitor reports when the server is back
+            self.connection_monitor.restart()
             return True
         return False
     
+    def _professors(self, method, *args):
+        """Run a ProfessorRepository method, falling back to local storage if MongoDB fails.
+        
+        This is the only place that deals with MongoDB errors; after a
+        fallback the call is repeated on the local repository.
+        """
+        if self.professor_repository is not self.local_professors:
+            try:
+                return getattr(self.professor_repository, method)(*args)
+            except Exception as e:
+                print(f"MongoDB {method} failed: {e}")
+                self._fallback_to_local()
+        return getattr(self.local_professors, method)(*args)
+    
     def _update_mode_indicator(self):
         """Update the status indicator showing current mode"""
         if hasattr(self, 'mode_label'):
             if self.use_mongodb:
                 self.mode_label.config(text="Mode: Database Connected", foreground="green")
+            elif self.backend == "sqlite":
+                self.mode_label.config(text="Mode: SQLite Database", foreground="green")
             else:
                 self.mode_label.config(text="Mode: Local Storage", foreground="orange")
         
@@ -250,6 +422,9 @@ class ProfessorAdminSystem:
         self.professor_tree.pack(side="left", fill="both", expand=True)
         scrollbar_professor.pack(side="right", fill="y")
         
+        # Only the visible rows exist as Treeview items
+        self.professor_view = VirtualTreeview(self.professor_tree, scrollbar_professor)
+        
         self.professor_tree.bind("<ButtonRelease-1>", self.on_professor_select)
         
     def create_search_tab(self):
@@ -326,6 +501,8 @@ class ProfessorAdminSystem:
         self.search_tree.pack(side="left", fill="both", expand=True)
         scrollbar_search.pack(side="right", fill="y")
         
+        self.search_view = VirtualTreeview(self.search_tree, scrollbar_search)
+        
     def create_reports_tab(self):
         reports_frame = ttk.Frame(self.notebook)
         self.notebook.add(reports_frame, text="Reports")
@@ -344,7 +521,10 @@ class ProfessorAdminSystem:
         import_frame.pack(fill="x", padx=10, pady=5)
         
         ttk.Button(import_frame, text="Import from CSV", command=self.import_from_csv).pack(side="left", padx=5, ipady=8)
+        ttk.Button(import_frame, text="Validate CSV (Dry Run)", command=self.validate_csv).pack(side="left", padx=5, ipady=8)
         ttk.Button(import_frame, text="Download CSV Template", command=self.download_csv_template).pack(side="left", padx=5, ipady=8)
+        self.import_status_label = ttk.Label(import_frame, text="", font=self.default_font)
+        self.import_status_label.pack(side="left", padx=5)
         
         # Import instructions
         instructions = tk.Label(import_frame, 
@@ -393,96 +573,84 @@ class ProfessorAdminSystem:
             messagebox.showerror("Error", "Please fill required fields (ID, Name, Email, Department, Position)")
             return
         
-        # Check for duplicate professor ID
-        if self.use_mongodb and self.professors_collection is not None:
-            try:
-                if self.professors_collection.find_one({"professor_id": professor_id}):
-                    messagebox.showerror("Error", "Professor ID already exists")
-                    return
-            except:
-                self._fallback_to_local()
-        
-        if not self.use_mongodb and professor_id in self.professors:
+        added_professor = {
+            "professor_id": professor_id,
+            "name": name,
+            "email": email,
+            "phone": phone,
+            "department": department,
+            "position": position,
+            "specialization": specialization,
+            "office": office
+        }
+        # Refused if the ID is already taken
+        added = self._professors("add", added_professor)
+        if not added:
             messagebox.showerror("Error", "Professor ID already exists")
             return
         
-        # Add professor
-        operation_successful = False
-        
-        if self.use_mongodb and self.professors_collection is not None:
-            try:
-                professor_data = {
-                    "professor_id": professor_id,
-                    "name": name,
-                    "email": email,
-                    "phone": phone,
-                    "department": department,
-                    "position": position,
-                    "specialization": specialization,
-                    "office": office,
-                    "created_at": datetime.now()
-                }
-                self.professors_collection.insert_one(professor_data)
-                operation_successful = True
-            except:
-                self._fallback_to_local()
-        
-        # Local mode
-        if not operation_successful:
-            self.professors[professor_id] = {
-                "name": name,
-                "email": email,
-                "phone": phone,
-                "department": department,
-                "position": position,
-                "specialization": specialization,
-                "office": office
-            }
-            operation_successful = True
-        
-        if operation_successful:
-            self.update_professor_list()
-            self.clear_professor_fields()
-            mode_text = "in database" if self.use_mongodb else "locally"
-            messagebox.showinfo("Success", f"Professor added successfully {mode_text}")
+        self.changes.publish("professors", professor_id)
+        self.professor_changed(professor_id, added_professor)
+        self.clear_professor_fields()
+        mode_text = "in database" if self.use_mongodb else "locally"
+        messagebox.showinfo("Success", f"Professor added successfully {mode_text}")
     
     def update_professor_list(self):
-        # Clear both trees
-        for item in self.professor_tree.get_children():
-            self.professor_tree.delete(item)
-        for item in self.search_tree.get_children():
-            self.search_tree.delete(item)
-        
-        # Load professors
-        professors_loaded = False
-        
-        if self.use_mongodb and self.professors_collection is not None:
-            try:
-                professors = list(self.professors_collection.find({}, {"_id": 0}))
-                
-                for professor in professors:
-                    self.professor_tree.insert("", "end", values=(
-                        professor["professor_id"], professor["name"], professor["department"], 
-                        professor["position"], professor.get("email", ""), 
-                        professor.get("phone", ""), professor.get("office", "")
-                    ))
-                
-                professors_loaded = True
-                
-            except:
-                self._fallback_to_local()
+        self.cancel_groups_refresh()
+        professors = self._professors("all")
+        rows = [(professor["professor_id"], self._professor_row(professor)) for professor in professors]
+        
+        self.professor_source = ListDataSource(rows)
+        self.professor_source_mongodb = self.use_mongodb
+        self.professor_view.set_source(self.professor_source, keep_position=True)
+        
+        # Reports and local searches run against indexes rather than
+        # refetching; MongoDB searches itself (see update_search_results)
+        records = [self.professor_record(professor) for professor in professors]
+        self.professor_groups.load(records)
+        self.search_index.load(() if self.use_mongodb else records)
+        self.update_search_results()
+    
+    def professor_changed(self, professor_id, professor):
+        """Apply one added, updated or deleted (None) professor to the list and the indexes"""
+        # A reload already under way may have read the data from before it
+        self.cancel_groups_refresh()
+        if self.professor_source_mongodb != self.use_mongodb:
+            # Fell back to local data since the list was loaded
+            self.update_professor_list()
+            return
         
-        # Local mode
-        if not professors_loaded:
-            for professor_id, data in self.professors.items():
-                self.professor_tree.insert("", "end", values=(
-                    professor_id, data["name"], data["department"], data["position"],
-                    data.get("email", ""), data.get("phone", ""), data.get("office", "")
-                ))
+        if professor is None:
+            position = self.professor_source.remove(professor_id)
+            if position is not None:
+                self.professor_view.invalidate(position)
+            self.professor_groups.remove(professor_id)
+            if not self.use_mongodb:
+                self.search_index.remove(professor_id)
+        else:
+            existing = self.professor_source.index(professor_id) is not None
+            position = self.professor_source.upsert(professor_id, self._professor_row(professor))
+            if existing:
+                if self.professor_view.has_row(professor_id):
+                    self.professor_view.update_row(professor_id, self.professor_source.build(professor_id))
+            else:
+                self.professor_view.invalidate(position)
+            record = self.professor_record(professor)
+            self.professor_groups.add(record)
+            if not self.use_mongodb:
+                self.search_index.add(record)
         
-        # Update search results
         self.update_search_results()
     
+    @staticmethod
+    def _professor_row(professor):
+        """Displayed values of the professor list"""
+        return (
+            professor["professor_id"], professor["name"], professor["department"], 
+            professor["position"], professor.get("email", ""), 
+            professor.get("phone", ""), professor.get("office", "")
+        )
+    
     def on_professor_select(self, event):
         selection = self.professor_tree.selection()
         if selection:
@@ -516,55 +684,25 @@ class ProfessorAdminSystem:
             messagebox.showerror("Error", "Please fill required fields")
             return
         
-        operation_successful = False
-        
-        if self.use_mongodb and self.professors_collection is not None:
-            try:
-                result = self.professors_collection.update_one(
-                    {"professor_id": professor_id},
-                    {"$set": {
-                        "name": name,
-                        "email": email,
-                        "phone": phone,
-                        "department": department,
-                        "position": position,
-                        "specialization": specialization,
-                        "office": office,
-                        "updated_at": datetime.now()
-                    }}
-                )
-                
-                if result.matched_count == 0:
-                    messagebox.showerror("Error", "Professor ID not found")
-                    return
-                
-                operation_successful = True
-                
-            except:
-                self._fallback_to_local()
+        fields = {
+            "name": name,
+            "email": email,
+            "phone": phone,
+            "department": department,
+            "position": position,
+            "specialization": specialization,
+            "office": office
+        }
+        found = self._professors("update", professor_id, fields)
+        if not found:
+            messagebox.showerror("Error", "Professor ID not found")
+            return
         
-        # Local mode
-        if not operation_successful:
-            if professor_id not in self.professors:
-                messagebox.showerror("Error", "Professor ID not found")
-                return
-            
-            self.professors[professor_id].update({
-                "name": name,
-                "email": email,
-                "phone": phone,
-                "department": department,
-                "position": position,
-                "specialization": specialization,
-                "office": office
-            })
-            operation_successful = True
-        
-        if operation_successful:
-            self.update_professor_list()
-            self.clear_professor_fields()
-            mode_text = "in database" if self.use_mongodb else "locally"
-            messagebox.showinfo("Success", f"Professor updated successfully {mode_text}")
+        self.changes.publish("professors", professor_id)
+        self.professor_changed(professor_id, dict(fields, professor_id=professor_id))
+        self.clear_professor_fields()
+        mode_text = "in database" if self.use_mongodb else "locally"
+        messagebox.showinfo("Success", f"Professor updated successfully {mode_text}")
     
     def delete_professor(self):
         professor_id = self.professor_id_entry.get().strip()
@@ -578,35 +716,15 @@ class ProfessorAdminSystem:
         if not result:
             return
         
-        operation_successful = False
-        
-        if self.use_mongodb and self.professors_collection is not None:
-            try:
-                professor = self.professors_collection.find_one({"professor_id": professor_id})
-                if not professor:
-                    messagebox.showerror("Error", "Professor ID not found")
-                    return
-                
-                self.professors_collection.delete_one({"professor_id": professor_id})
-                operation_successful = True
-                
-            except:
-                self._fallback_to_local()
-        
-        # Local mode
-        if not operation_successful:
-            if professor_id not in self.professors:
-                messagebox.showerror("Error", "Professor ID not found")
-                return
-            
-            del self.professors[professor_id]
-            operation_successful = True
+        if not self._professors("delete", professor_id):
+            messagebox.showerror("Error", "Professor ID not found")
+            return
         
-        if operation_successful:
-            self.update_professor_list()
-            self.clear_professor_fields()
-            mode_text = "from database" if self.use_mongodb else "locally"
-            messagebox.showinfo("Success", f"Professor deleted successfully {mode_text}")
+        self.changes.publish("professors", professor_id)
+        self.professor_changed(professor_id, None)
+        self.clear_professor_fields()
+        mode_text = "from database" if self.use_mongodb else "locally"
+        messagebox.showinfo("Success", f"Professor deleted successfully {mode_text}")
     
     def clear_professor_fields(self):
         self.professor_id_entry.delete(0, tk.END)
@@ -619,7 +737,10 @@ class ProfessorAdminSystem:
         self.professor_office_entry.delete(0, tk.END)
     
     def on_search_change(self, event):
-        self.update_search_results()
+        # Search once typing pauses rather than on every keystroke
+        if self.search_after_id is not None:
+            self.root.after_cancel(self.search_after_id)
+        self.search_after_id = self.root.after(SEARCH_DEBOUNCE_MS, self.update_search_results)
     
     def on_filter_change(self, event):
         self.update_search_results()
@@ -635,114 +756,116 @@ class ProfessorAdminSystem:
         self.update_search_results()
     
     def update_search_results(self):
-        # Clear search tree
-        for item in self.search_tree.get_children():
-            self.search_tree.delete(item)
+        # Runs now, so a debounced run still pending is not needed
+        if self.search_after_id is not None:
+            self.root.after_cancel(self.search_after_id)
+            self.search_after_id = None
         
         # Get search criteria
-        search_name = self.search_name_entry.get().strip().lower()
+        search_name = self.search_name_entry.get()
         filter_dept = self.filter_dept_var.get()
         filter_pos = self.filter_pos_var.get()
         sort_by = self.sort_var.get()
         
-        # Get professor data
-        professor_data = []
+        department = None if filter_dept == "All" else filter_dept
+        position = None if filter_pos == "All" else filter_pos
+        row_builder = lambda prof: (
+            prof["id"], prof["name"], prof["department"], prof["position"],
+            prof["specialization"], prof["email"], prof["office"]
+        )
         
-        if self.use_mongodb and self.professors_collection is not None:
-            try:
-                professors = list(self.professors_collection.find({}, {"_id": 0}))
-                for professor in professors:
-                    professor_data.append({
-                        "id": professor["professor_id"],
-                        "name": professor["name"],
-                        "department": professor["department"],
-                        "position": professor["position"],
-                        "specialization": professor.get("specialization", ""),
-                        "email": professor.get("email", ""),
-                        "office": professor.get("office", "")
-                    })
-            except:
-                self._fallback_to_local()
+        if self.use_mongodb:
+            # The server filters and sorts, and only the pages being shown are read
+            results = self.professor_repository.search(
+                search_name, department=department, position=position, sort_by=sort_by,
+                formatter=lambda professor: row_builder(self.professor_record(professor)),
+                on_error=self._search_failed
+            )
+        else:
+            # Matches come from the index ("All" filters nothing) and are only
+            # put in order as far as rows are shown
+            results = self.search_index.search(
+                search_name, department=department, position=position, sort_by=sort_by,
+                row_builder=row_builder
+            )
         
-        if not self.use_mongodb:
-            for professor_id, data in self.professors.items():
-                professor_data.append({
-                    "id": professor_id,
-                    "name": data["name"],
-                    "department": data["department"],
-                    "position": data["position"],
-                    "specialization": data.get("specialization", ""),
-                    "email": data.get("email", ""),
-                    "office": data.get("office", "")
-                })
-        
-        # Filter data
-        filtered_data = []
-        for prof in professor_data:
-            # Name search
-            if search_name and search_name not in prof["name"].lower():
-                continue
-            
-            # Department filter
-            if filter_dept != "All" and prof["department"] != filter_dept:
-                continue
-            
-            # Position filter
-            if filter_pos != "All" and prof["position"] != filter_pos:
-                continue
-            
-            filtered_data.append(prof)
-        
-        # Sort data
-        if sort_by == "Name":
-            filtered_data.sort(key=lambda x: x["name"])
-        elif sort_by == "Department":
-            filtered_data.sort(key=lambda x: x["department"])
-        elif sort_by == "Position":
-            filtered_data.sort(key=lambda x: x["position"])
-        elif sort_by == "ID":
-            filtered_data.sort(key=lambda x: x["id"])
-        
-        # Populate search tree
-        for prof in filtered_data:
-            self.search_tree.insert("", "end", values=(
-                prof["id"], prof["name"], prof["department"], prof["position"],
-                prof["specialization"], prof["email"], prof["office"]
-            ))
+        # Populate search tree (only the visible rows become Treeview items)
+        self.search_view.set_source(results)
     
-    def generate_department_report(self):
-        professor_data = self.get_all_professor_data()
+    def _search_failed(self, error):
+        """A MongoDB search query failed; search the local data instead"""
+        print(f"MongoDB search failed: {error}")
+        # Not from inside the Treeview update that ran the query
+        self.root.after_idle(self._fallback_to_local)
+    
+    def refresh_professor_groups(self):
+        """Reload the report groups from MongoDB in the background, and again every GROUPS_REFRESH_MS.
+        
+        The groups follow this client's own changes as they are made; the
+        reload picks up what other clients wrote, without a query on the Tk
+        thread when a report is opened.
+        """
+        self.root.after(GROUPS_REFRESH_MS, self.refresh_professor_groups)
+        if not self.use_mongodb or self.groups_refresh_job is not None:
+            return
+        repository = self.professor_repository
         
-        if not professor_data:
+        def loaded(records):
+            # Cancelled by a change, or MongoDB was dropped, since it started
+            if self.groups_refresh_job is not job:
+                return
+            self.groups_refresh_job = None
+            if self.professor_repository is repository:
+                self.professor_groups.load(records)
+                self.changes.publish("professors")
+        
+        def failed(error):
+            if self.groups_refresh_job is job:
+                self.groups_refresh_job = None
+            print(f"Reloading the professor groups failed: {error}")
+        
+        job = self.executor.submit(self.fetch_professor_records, repository,
+                                   name="groups_refresh", on_success=loaded, on_error=failed)
+        self.groups_refresh_job = job
+    
+    def fetch_professor_records(self, job, repository):
+        """Every professor in repository as a report record (runs on a worker thread)"""
+        return [self.professor_record(professor) for professor in repository.all()]
+    
+    def cancel_groups_refresh(self):
+        if self.groups_refresh_job is not None:
+            self.groups_refresh_job.cancel()
+            self.groups_refresh_job = None
+    
+    def cached_report(self, key, build):
+        """build() through the report cache; it reads only the report groups"""
+        return self.report_cache.get_or_build(key, build, ALL_PROFESSORS)
+    
+    def generate_department_report(self):
+        report = self.cached_report(("department",), self.build_department_report)
+        if report is None:
             messagebox.showerror("Error", "No professor data available")
             return
         
-        departments = {}
-        for prof in professor_data:
-            dept = prof["department"]
-            if dept not in departments:
-                departments[dept] = []
-            departments[dept].append(prof)
+        self.report_text.delete(1.0, tk.END)
+        self.report_text.insert(1.0, report)
+    
+    def build_department_report(self):
+        if not self.professor_groups:
+            return None
         
         report = "DEPARTMENT REPORT\n"
         report += "=" * 50 + "\n\n"
         
-        for dept_name, professors in sorted(departments.items()):
+        # Already grouped by department and position and sorted by name
+        for dept_name, positions in self.professor_groups.by_department():
             report += f"DEPARTMENT: {dept_name}\n"
             report += "-" * 30 + "\n"
-            report += f"Total Professors: {len(professors)}\n\n"
+            report += f"Total Professors: {sum(len(pos_profs) for _, pos_profs in positions)}\n\n"
             
-            # Group by position
-            positions = {}
-            for prof in professors:
-                pos = prof["position"]
-                if pos not in positions:
-                    positions[pos] = []
-                positions[pos].append(prof)
-            
-            for pos_name, pos_profs in sorted(positions.items()):
+            for pos_name, pos_profs in positions:
                 report += f"  {pos_name}: {len(pos_profs)}\n"
-                for prof in sorted(pos_profs, key=lambda x: x["name"]):
+                for prof in pos_profs:
                     report += f"    - {prof['name']} (ID: {prof['id']})\n"
                     if prof.get("office"):
                         report += f"      Office: {prof['office']}\n"
@@ -750,42 +873,32 @@ class ProfessorAdminSystem:
             
             report += "\n"
         
-        self.report_text.delete(1.0, tk.END)
-        self.report_text.insert(1.0, report)
+        return report
     
     def generate_position_report(self):
-        professor_data = self.get_all_professor_data()
-        
-        if not professor_data:
+        report = self.cached_report(("position",), self.build_position_report)
+        if report is None:
             messagebox.showerror("Error", "No professor data available")
             return
         
-        positions = {}
-        for prof in professor_data:
-            pos = prof["position"]
-            if pos not in positions:
-                positions[pos] = []
-            positions[pos].append(prof)
+        self.report_text.delete(1.0, tk.END)
+        self.report_text.insert(1.0, report)
+    
+    def build_position_report(self):
+        if not self.professor_groups:
+            return None
         
         report = "POSITION REPORT\n"
         report += "=" * 50 + "\n\n"
         
-        for pos_name, professors in sorted(positions.items()):
+        for pos_name, departments in self.professor_groups.by_position():
             report += f"POSITION: {pos_name}\n"
             report += "-" * 30 + "\n"
-            report += f"Total: {len(professors)}\n\n"
-            
-            # Group by department
-            departments = {}
-            for prof in professors:
-                dept = prof["department"]
-                if dept not in departments:
-                    departments[dept] = []
-                departments[dept].append(prof)
+            report += f"Total: {sum(len(dept_profs) for _, dept_profs in departments)}\n\n"
             
-            for dept_name, dept_profs in sorted(departments.items()):
+            for dept_name, dept_profs in departments:
                 report += f"  {dept_name}: {len(dept_profs)}\n"
-                for prof in sorted(dept_profs, key=lambda x: x["name"]):
+                for prof in dept_profs:
                     report += f"    - {prof['name']} (ID: {prof['id']})\n"
                     if prof.get("email"):
                         report += f"      Email: {prof['email']}\n"
@@ -793,20 +906,25 @@ class ProfessorAdminSystem:
             
             report += "\n"
         
-        self.report_text.delete(1.0, tk.END)
-        self.report_text.insert(1.0, report)
+        return report
     
     def generate_contact_report(self):
-        professor_data = self.get_all_professor_data()
-        
-        if not professor_data:
+        report = self.cached_report(("contact",), self.build_contact_report)
+        if report is None:
             messagebox.showerror("Error", "No professor data available")
             return
         
+        self.report_text.delete(1.0, tk.END)
+        self.report_text.insert(1.0, report)
+    
+    def build_contact_report(self):
+        if not self.professor_groups:
+            return None
+        
         report = "PROFESSOR CONTACT LIST\n"
         report += "=" * 50 + "\n\n"
         
-        for prof in sorted(professor_data, key=lambda x: x["name"]):
+        for prof in self.professor_groups.by_name():
             report += f"Name: {prof['name']}\n"
             report += f"ID: {prof['id']}\n"
             report += f"Department: {prof['department']}\n"
@@ -821,100 +939,70 @@ class ProfessorAdminSystem:
                 report += f"Specialization: {prof['specialization']}\n"
             report += "-" * 40 + "\n\n"
         
-        self.report_text.delete(1.0, tk.END)
-        self.report_text.insert(1.0, report)
+        return report
     
     def get_all_professor_data(self):
-        professor_data = []
-        
-        if self.use_mongodb and self.professors_collection is not None:
-            try:
-                professors = list(self.professors_collection.find({}, {"_id": 0}))
-                for professor in professors:
-                    professor_data.append({
-                        "id": professor["professor_id"],
-                        "name": professor["name"],
-                        "department": professor["department"],
-                        "position": professor["position"],
-                        "specialization": professor.get("specialization", ""),
-                        "email": professor.get("email", ""),
-                        "phone": professor.get("phone", ""),
-                        "office": professor.get("office", "")
-                    })
-            except:
-                self._fallback_to_local()
-        
-        if not self.use_mongodb:
-            for professor_id, data in self.professors.items():
-                professor_data.append({
-                    "id": professor_id,
-                    "name": data["name"],
-                    "department": data["department"],
-                    "position": data["position"],
-                    "specialization": data.get("specialization", ""),
-                    "email": data.get("email", ""),
-                    "phone": data.get("phone", ""),
-                    "office": data.get("office", "")
-                })
-        
-        return professor_data
+        return [self.professor_record(professor) for professor in self._professors("all")]
+    
+    @staticmethod
+    def professor_record(professor):
+        """A stored professor as the flat record used by search, reports and statistics"""
+        return {
+            "id": professor["professor_id"],
+            "name": professor["name"],
+            "department": professor["department"],
+            "position": professor["position"],
+            "specialization": professor.get("specialization", ""),
+            "email": professor.get("email", ""),
+            "phone": professor.get("phone", ""),
+            "office": professor.get("office", "")
+        }
     
     def update_statistics(self):
-        professor_data = self.get_all_professor_data()
+        stats = self.cached_report(("statistics",), self.build_statistics)
         
-        if not professor_data:
-            self.stats_text.delete(1.0, tk.END)
-            self.stats_text.insert(1.0, "No professor data available")
-            return
+        self.stats_text.delete(1.0, tk.END)
+        self.stats_text.insert(1.0, stats or "No professor data available")
+    
+    def build_statistics(self):
+        groups = self.professor_groups
+        total = len(groups)
+        if not total:
+            return None
         
         stats = "PROFESSOR SYSTEM STATISTICS\n"
         stats += "=" * 40 + "\n\n"
         
         # Basic stats
-        stats += f"Total Professors: {len(professor_data)}\n\n"
-        
-        # Department distribution
-        departments = {}
-        positions = {}
-        specializations = {}
-        
-        for prof in professor_data:
-            dept = prof["department"]
-            pos = prof["position"]
-            spec = prof.get("specialization", "Not Specified")
-            
-            departments[dept] = departments.get(dept, 0) + 1
-            positions[pos] = positions.get(pos, 0) + 1
-            specializations[spec] = specializations.get(spec, 0) + 1
+        stats += f"Total Professors: {total}\n\n"
         
+        # Distributions straight from the group sizes
         stats += "DEPARTMENT DISTRIBUTION:\n"
-        for dept, count in sorted(departments.items()):
-            percentage = (count / len(professor_data)) * 100
+        for dept, count in groups.counts("department"):
+            percentage = (count / total) * 100
             stats += f"  {dept}: {count} ({percentage:.1f}%)\n"
         
         stats += "\nPOSITION DISTRIBUTION:\n"
-        for pos, count in sorted(positions.items()):
-            percentage = (count / len(professor_data)) * 100
+        for pos, count in groups.counts("position"):
+            percentage = (count / total) * 100
             stats += f"  {pos}: {count} ({percentage:.1f}%)\n"
         
         stats += "\nSPECIALIZATION DISTRIBUTION:\n"
-        for spec, count in sorted(specializations.items()):
-            if count > 0:
-                percentage = (count / len(professor_data)) * 100
-                stats += f"  {spec}: {count} ({percentage:.1f}%)\n"
+        for spec, count in groups.counts("specialization"):
+            percentage = (count / total) * 100
+            stats += f"  {spec}: {count} ({percentage:.1f}%)\n"
         
         # Contact info completeness
-        email_count = sum(1 for prof in professor_data if prof.get("email"))
-        phone_count = sum(1 for prof in professor_data if prof.get("phone"))
-        office_count = sum(1 for prof in professor_data if prof.get("office"))
+        email_count = len(groups.filled["email"])
+        phone_count = len(groups.filled["phone"])
+        office_count = len(groups.filled["office"])
         
         stats += "\nCONTACT INFORMATION COMPLETENESS:\n"
-        stats += f"  Email addresses: {email_count}/{len(professor_data)} ({(email_count/len(professor_data)*100):.1f}%)\n"
-        stats += f"  Phone numbers: {phone_count}/{len(professor_data)} ({(phone_count/len(professor_data)*100):.1f}%)\n"
-        stats += f"  Office locations: {office_count}/{len(professor_data)} ({(office_count/len(professor_data)*100):.1f}%)\n"
+        stats += f"  Email addresses: {email_count}/{total} ({(email_count/total*100):.1f}%)\n"
+        stats += f"  Phone numbers: {phone_count}/{total} ({(phone_count/total*100):.1f}%)\n"
+        stats += f"  Office locations: {office_count}/{total} ({(office_count/total*100):.1f}%)\n"
         
-        self.stats_text.delete(1.0, tk.END)
-        self.stats_text.insert(1.0, stats)
+        return stats
     
     def export_to_csv(self):
         professor_data = self.get_all_professor_data()
@@ -991,133 +1079,132 @@ class ProfessorAdminSystem:
         if not filename:
             return
         
+        # The file is checked off the Tk thread; the import goes on in import_checked_file
+        self.check_csv_file(filename, self.import_checked_file)
+    
+    def validate_csv(self):
+        """Check a CSV file as an import would, without importing anything"""
+        filename = filedialog.askopenfilename(
+            title="Select CSV file to validate",
+            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
+        )
+        
+        if filename:
+            self.check_csv_file(filename, self.show_csv_validation)
+    
+    def check_csv_file(self, filename, on_checked):
+        """Check filename in the background and pass the ProfessorImport to on_checked"""
+        if self.csv_check_job is not None:
+            messagebox.showinfo("Import", "A CSV file is already being checked")
+            return
+        
+        def finished(checked):
+            self.csv_check_job = None
+            self.import_status_label.config(text="")
+            on_checked(checked)
+        
+        def failed(e):
+            self.csv_check_job = None
+            self.import_status_label.config(text="")
+            messagebox.showerror("Import Error", f"Failed to read CSV file: {str(e)}")
+        
+        def progressed(done, total, message):
+            self.import_status_label.config(text=f"{message}: {done * 100 // total if total else 100}%")
+        
+        self.import_status_label.config(text=f"Checking {os.path.basename(filename)}...")
+        self.csv_check_job = self.executor.submit(
+            self.run_csv_check, filename, list(self.departments), list(self.positions),
+            name="csv_check", on_success=finished, on_error=failed, on_progress=progressed,
+            on_cancel=lambda: setattr(self, "csv_check_job", None)
+        )
+    
+    def run_csv_check(self, job, filename, departments, positions):
+        """Read and check a professor CSV file (runs on a worker thread, large files on several processes)"""
+        return ProfessorImport().check_file(
+            filename, departments, positions,
+            on_progress=lambda done, total: job.report_progress(done, total, "Checking file")
+        )
+    
+    @staticmethod
+    def _format_csv_errors(checked):
+        """The invalid rows and duplicate IDs of a checked file, at most 20 of each"""
+        text = ""
+        for title, errors in (("Invalid Rows", checked.invalid_rows), ("Duplicate IDs", checked.duplicate_ids)):
+            if errors:
+                text += f"{title}:\n"
+                for _, error in errors[:20]:
+                    text += f"  - {error}\n"
+                if len(errors) > 20:
+                    text += f"  ... and {len(errors) - 20} more\n"
+                text += "\n"
+        return text
+    
+    def show_csv_validation(self, checked):
+        """Show the result of a dry run in the report area"""
+        report = "CSV VALIDATION (DRY RUN)\n"
+        report += "=" * 50 + "\n\n"
+        report += f"Checked {checked.throughput()}\n\n"
+        report += f"Valid records found: {checked.valid}\n"
+        report += f"Invalid rows: {len(checked.invalid_rows)}\n"
+        report += f"Duplicate IDs: {len(checked.duplicate_ids)}\n\n"
+        if checked.unknown_departments:
+            report += f"Departments not in the predefined list: {', '.join(checked.unknown_departments)}\n"
+        if checked.unknown_positions:
+            report += f"Positions not in the predefined list: {', '.join(checked.unknown_positions)}\n"
+        if checked.unknown_departments or checked.unknown_positions:
+            report += "\n"
+        report += self._format_csv_errors(checked)
+        report += "Nothing was imported; IDs were not checked against the stored professors."
+        
+        self.report_text.delete(1.0, tk.END)
+        self.report_text.insert(1.0, report)
+    
+    def import_checked_file(self, checked):
+        """Confirm and import a checked CSV file"""
         try:
-            # Read and validate CSV file
-            imported_data = []
-            duplicate_ids = []
-            invalid_rows = []
-            
-            with open(filename, 'r', encoding='utf-8-sig') as csvfile:
-                # Try to detect if file has header
-                sample = csvfile.read(1024)
-                csvfile.seek(0)
-                sniffer = csv.Sniffer()
-                has_header = sniffer.has_header(sample)
-                
-                reader = csv.reader(csvfile)
-                
-                # Skip header if present
-                if has_header:
-                    next(reader)
-                
-                row_number = 1 if has_header else 0
-                
-                for row in reader:
-                    row_number += 1
-                    
-                    # Skip empty rows
-                    if not any(cell.strip() for cell in row):
-                        continue
-                    
-                    # Ensure row has enough columns (pad with empty strings if needed)
-                    while len(row) < 8:
-                        row.append("")
-                    
-                    professor_id = row[0].strip()
-                    name = row[1].strip()
-                    department = row[2].strip()
-                    position = row[3].strip()
-                    specialization = row[4].strip()
-                    email = row[5].strip()
-                    phone = row[6].strip()
-                    office = row[7].strip()
-                    
-                    # Validate required fields
-                    if not all([professor_id, name, department, position]):
-                        invalid_rows.append(f"Row {row_number}: Missing required fields (ID, Name, Department, Position)")
-                        continue
-                    
-                    # Check for duplicate IDs in current import
-                    if professor_id in [data['professor_id'] for data in imported_data]:
-                        duplicate_ids.append(f"Row {row_number}: Duplicate ID '{professor_id}' in import file")
-                        continue
-                    
-                    # Check if professor already exists in database
-                    if self.professor_exists(professor_id):
-                        duplicate_ids.append(f"Row {row_number}: Professor ID '{professor_id}' already exists in database")
-                        continue
-                    
-                    # Validate department and position
-                    if department not in self.departments:
-                        response = messagebox.askyesno("Unknown Department", 
-                            f"Department '{department}' is not in the predefined list.\nDo you want to add it?")
-                        if response:
-                            self.departments.append(department)
-                    
-                    if position not in self.positions:
-                        response = messagebox.askyesno("Unknown Position", 
-                            f"Position '{position}' is not in the predefined list.\nDo you want to add it?")
-                        if response:
-                            self.positions.append(position)
-                    
-                    imported_data.append({
-                        'professor_id': professor_id,
-                        'name': name,
-                        'department': department,
-                        'position': position,
-                        'specialization': specialization,
-                        'email': email,
-                        'phone': phone,
-                        'office': office
-                    })
+            # Stored IDs are looked up a chunk of rows at a time
+            checked.check_stored(lambda professor_ids: self._professors("taken_ids", professor_ids))
             
             # Show validation results
-            validation_report = f"CSV Import Validation Results:\n\n"
-            validation_report += f"Valid records found: {len(imported_data)}\n"
-            validation_report += f"Invalid rows: {len(invalid_rows)}\n"
-            validation_report += f"Duplicate IDs: {len(duplicate_ids)}\n\n"
-            
-            if invalid_rows:
-                validation_report += "Invalid Rows:\n"
-                for error in invalid_rows:
-                    validation_report += f"  - {error}\n"
-                validation_report += "\n"
-            
-            if duplicate_ids:
-                validation_report += "Duplicate IDs:\n"
-                for error in duplicate_ids:
-                    validation_report += f"  - {error}\n"
-                validation_report += "\n"
+            validation_report = "CSV Import Validation Results:\n\n"
+            validation_report += f"Valid records found: {len(checked.professors)}\n"
+            validation_report += f"Invalid rows: {len(checked.invalid_rows)}\n"
+            validation_report += f"Duplicate IDs: {len(checked.duplicate_ids)}\n\n"
+            validation_report += self._format_csv_errors(checked)
             
-            if not imported_data:
+            if not checked.professors:
                 validation_report += "No valid data to import."
                 messagebox.showerror("Import Failed", validation_report)
                 return
             
             # Ask user to confirm import
-            validation_report += f"Do you want to import {len(imported_data)} valid records?"
+            validation_report += f"Do you want to import {len(checked.professors)} valid records?"
             
             if not messagebox.askyesno("Confirm Import", validation_report):
                 return
             
-            # Import the data
-            success_count = 0
-            failed_imports = []
+            # One question for all the departments and positions not in the lists
+            if checked.unknown_departments or checked.unknown_positions:
+                question = ""
+                if checked.unknown_departments:
+                    question += f"Departments not in the predefined list: {', '.join(checked.unknown_departments)}\n"
+                if checked.unknown_positions:
+                    question += f"Positions not in the predefined list: {', '.join(checked.unknown_positions)}\n"
+                if messagebox.askyesno("Unknown Departments and Positions", question + "\nDo you want to add them?"):
+                    self.departments.extend(checked.unknown_departments)
+                    self.positions.extend(checked.unknown_positions)
             
-            for data in imported_data:
-                try:
-                    if self.import_single_professor(data):
-                        success_count += 1
-                    else:
-                        failed_imports.append(f"Failed to import: {data['name']} (ID: {data['professor_id']})")
-                except Exception as e:
-                    failed_imports.append(f"Error importing {data['name']}: {str(e)}")
+            # Import the data in batches
+            success_count, failed_imports = checked.write(
+                lambda professors: self._professors("add_new", professors)
+            )
             
             # Update the professor list
+            self.changes.publish("professors")
             self.update_professor_list()
             
             # Show final results
-            result_message = f"Import completed!\n\n"
+            result_message = "Import completed!\n\n"
             result_message += f"Successfully imported: {success_count} professors\n"
             result_message += f"Failed imports: {len(failed_imports)}\n"
             
@@ -1134,76 +1221,66 @@ class ProfessorAdminSystem:
                 messagebox.showerror("Import Failed", result_message)
                 
         except Exception as e:
-            messagebox.showerror("Import Error", f"Failed to read CSV file: {str(e)}")
-    
-    def professor_exists(self, professor_id):
-        """Check if professor ID already exists"""
-        if self.use_mongodb and self.professors_collection is not None:
-            try:
-                return self.professors_collection.find_one({"professor_id": professor_id}) is not None
-            except:
-                pass
-        
-        return professor_id in self.professors
-    
-    def import_single_professor(self, data):
-        """Import a single professor record"""
-        try:
-            # Try MongoDB first
-            if self.use_mongodb and self.professors_collection is not None:
-                try:
-                    professor_data = {
-                        "professor_id": data['professor_id'],
-                        "name": data['name'],
-                        "email": data['email'],
-                        "phone": data['phone'],
-                        "department": data['department'],
-                        "position": data['position'],
-                        "specialization": data['specialization'],
-                        "office": data['office'],
-                        "created_at": datetime.now(),
-                        "imported": True
-                    }
-                    self.professors_collection.insert_one(professor_data)
-                    return True
-                except:
-                    self._fallback_to_local()
-            
-            # Local mode
-            if not self.use_mongodb:
-                self.professors[data['professor_id']] = {
-                    "name": data['name'],
-                    "email": data['email'],
-                    "phone": data['phone'],
-                    "department": data['department'],
-                    "position": data['position'],
-                    "specialization": data['specialization'],
-                    "office": data['office']
-                }
-                return True
-            
-            return False
-            
-        except Exception as e:
-            print(f"Error importing professor {data['professor_id']}: {e}")
-            return False
+            messagebox.showerror("Import Error", f"Failed to import CSV file: {str(e)}")
     
     def close_connection(self):
-        """Close MongoDB connection"""
+        """Close MongoDB connection and write out pending local changes"""
         try:
-            if hasattr(self, 'use_mongodb') and self.use_mongodb:
-                if hasattr(self, 'client') and self.client:
-                    self.client.close()
-                    print("MongoDB connection closed.")
+            self.connection_monitor.stop()
+            # The client may be open while local writes are still being replayed
+            if hasattr(self, 'client') and self.client:
+                self.client.close()
+                print("MongoDB connection closed.")
         except Exception as e:
             print(f"Error closing MongoDB connection: {e}")
         finally:
             self.use_mongodb = False
+            self.replicator.stop()
+            if self.csv_check_job is not None:
+                self.csv_check_job.cancel()
+            self.executor.shutdown()
+            self.write_behind.close()
+            self.local_journal.close()
+            if self.sqlite_db is not None:
+                self.sqlite_db.close()
 
 def main():
+    parser = argparse.ArgumentParser(description="Professor Administration System")
+    parser.add_argument("--backend", choices=BACKENDS, default="mongo",
+                        help="mongo: MongoDB with local fallback (default); local: local storage only, "
+                             "without loading the MongoDB driver; sqlite: a SQLite database (professors.db)")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print import and startup times (like python -X importtime) once the window is up")
+    parser.add_argument("--mongodb-uri", default=DEFAULT_MONGODB_URI,
+                        help="MongoDB connection string")
+    parser.add_argument("--server-selection-timeout-ms", type=int,
+                        default=DEFAULT_TIMEOUTS_MS["serverSelectionTimeoutMS"],
+                        help="how long to wait for a usable MongoDB server")
+    parser.add_argument("--connect-timeout-ms", type=int,
+                        default=DEFAULT_TIMEOUTS_MS["connectTimeoutMS"],
+                        help="MongoDB socket connect timeout")
+    parser.add_argument("--socket-timeout-ms", type=int,
+                        default=DEFAULT_TIMEOUTS_MS["socketTimeoutMS"],
+                        help="MongoDB socket read/write timeout")
+    parser.add_argument("--health-interval", type=float, default=10.0,
+                        help="seconds between MongoDB health checks")
+    args = parser.parse_args()
+    if startup_profiler is not None:
+        startup_profiler.mark("imports")
+    timeouts = {
+        "serverSelectionTimeoutMS": args.server_selection_timeout_ms,
+        "connectTimeoutMS": args.connect_timeout_ms,
+        "socketTimeoutMS": args.socket_timeout_ms,
+    }
+    
     try:
         root = tk.Tk()
-        app = ProfessorAdminSystem(root)
+        app = ProfessorAdminSystem(root, backend=args.backend, mongodb_uri=args.mongodb_uri,
+                                   mongodb_timeouts=timeouts, health_interval=args.health_interval)
+        
+        if startup_profiler is not None:
+            startup_profiler.mark("window and widgets created")
+            root.after(0, startup_profiler.finish)
         
         # Close MongoDB connection when window is closed
         def on_closing():
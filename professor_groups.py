@@ -0,0 +1,121 @@
+import bisect
+from collections import defaultdict
+
+# Group-by indexes behind the professor app's reports and statistics.
+#
+# The app keeps one ProfessorGroups up to date with every professor it adds,
+# updates, deletes or loads, so the department, position and contact reports
+# walk groups that are already built and sorted instead of fetching and
+# regrouping the whole directory each time.
+
+GROUP_FIELDS = ("department", "position", "specialization")
+CONTACT_FIELDS = ("email", "phone", "office")
+
+class ProfessorGroups:
+    """Professor records grouped by department, position and specialization.
+    
+    Records are dicts with at least "id", "name" and the GROUP_FIELDS and
+    CONTACT_FIELDS (see ProfessorAdminSystem.professor_record). Each
+    department and position pair keeps its members sorted by name, and so
+    does the whole directory; the set of professors with each contact field
+    filled in is kept too.
+    """
+    
+    def __init__(self, records=()):
+        self.load(records)
+    
+    def load(self, records):
+        self.records = {}
+        # field -> value -> ids
+        self.groups = {field: defaultdict(set) for field in GROUP_FIELDS}
+        # field -> ids of the professors who have it
+        self.filled = {field: set() for field in CONTACT_FIELDS}
+        # department -> position -> [(name, id)] in order, and the same lists by position -> department
+        self._by_department = defaultdict(dict)
+        self._by_position = defaultdict(dict)
+        self._by_name = []
+        
+        for record in records:
+            self._insert(record)
+        self._by_name.sort()
+        for positions in self._by_department.values():
+            for members in positions.values():
+                members.sort()
+    
+    def __len__(self):
+        return len(self.records)
+    
+    def add(self, record):
+        """Add or replace one record"""
+        self.remove(record["id"])
+        self._insert(record, keep_sorted=True)
+    
+    def _insert(self, record, keep_sorted=False):
+        key = record["id"]
+        self.records[key] = record
+        for field in GROUP_FIELDS:
+            self.groups[field][record[field]].add(key)
+        for field in CONTACT_FIELDS:
+            if record[field]:
+                self.filled[field].add(key)
+        
+        entry = (record["name"], key)
+        department, position = record["department"], record["position"]
+        members = self._by_department[department].get(position)
+        if members is None:
+            members = self._by_department[department][position] = []
+            self._by_position[position][department] = members
+        if keep_sorted:
+            bisect.insort(members, entry)
+            bisect.insort(self._by_name, entry)
+        else:
+            members.append(entry)
+            self._by_name.append(entry)
+    
+    def remove(self, key):
+        record = self.records.pop(key, None)
+        if record is None:
+            return
+        for field in GROUP_FIELDS:
+            keys = self.groups[field][record[field]]
+            keys.discard(key)
+            if not keys:
+                del self.groups[field][record[field]]
+        for field in CONTACT_FIELDS:
+            self.filled[field].discard(key)
+        
+        entry = (record["name"], key)
+        department, position = record["department"], record["position"]
+        members = self._by_department[department][position]
+        del members[bisect.bisect_left(members, entry)]
+        if not members:
+            del self._by_department[department][position]
+            del self._by_position[position][department]
+            if not self._by_department[department]:
+                del self._by_department[department]
+            if not self._by_position[position]:
+                del self._by_position[position]
+        del self._by_name[bisect.bisect_left(self._by_name, entry)]
+    
+    def counts(self, field):
+        """[(value, number of professors)] for a GROUP_FIELDS field, by value"""
+        return sorted((value, len(keys)) for value, keys in self.groups[field].items())
+    
+    def by_department(self):
+        """Yield (department, [(position, records by name)]), both in order"""
+        return self._nested(self._by_department)
+    
+    def by_position(self):
+        """Yield (position, [(department, records by name)]), both in order"""
+        return self._nested(self._by_position)
+    
+    def _nested(self, outer):
+        records = self.records
+        for name in sorted(outer):
+            yield name, [(inner, [records[key] for _, key in members])
+                         for inner, members in sorted(outer[name].items())]
+    
+    def by_name(self):
+        """Every record, by name"""
+        records = self.records
+        return [records[key] for _, key in self._by_name]
@@ -0,0 +1,148 @@
+import csv
+import os
+import time
+
+from csv_validation import data_start, split_ranges, read_range, check_ranges, format_throughput
+
+# Bulk CSV import for the professor app.
+#
+# The file is read and each row checked on its own first, on several
+# processes for large files (see csv_validation.py). Duplicate IDs within
+# the file are then found through a set, in row order, and IDs already
+# stored through one ProfessorRepository.taken_ids lookup per chunk. The
+# valid professors are written with ProfessorRepository.add_new, a batch at
+# a time.
+
+COLUMNS = ["professor_id", "name", "department", "position", "specialization", "email", "phone", "office"]
+
+# Rows checked against the stored IDs per lookup, and written per add_new call
+IMPORT_CHUNK_SIZE = 5000
+
+def has_header(path):
+    """True if the file seems to start with a header row"""
+    with open(path, 'r', newline='', encoding='utf-8-sig') as f:
+        sample = f.read(1024)
+    return bool(sample) and csv.Sniffer().has_header(sample)
+
+def check_professor(cells):
+    """Why a row of stripped cells, in COLUMNS order, cannot be imported as a professor, or None"""
+    if not all(cells[:4]):
+        return "Missing required fields (ID, Name, Department, Position)"
+    return None
+
+def check_professor_range(path, start, end):
+    """Check the rows in bytes [start, end) of a professor CSV file (runs in worker processes).
+    
+    Returns the number of rows read and [(row index, cells or error
+    message)] for the non-empty ones, counting rows from 1. Cells are
+    tuples rather than dicts, as they are cheaper to send back.
+    """
+    width = len(COLUMNS)
+    padding = ("",) * width
+    checked = []
+    index = 0
+    for index, row in enumerate(read_range(path, start, end), start=1):
+        if not any(cell.strip() for cell in row):
+            continue
+        cells = tuple(cell.strip() for cell in row[:width]) + padding[len(row):]
+        checked.append((index, check_professor(cells) or cells))
+    return index, checked
+
+class ProfessorImport:
+    """The checked contents of a professor CSV file, ready to be written"""
+    
+    def __init__(self):
+        self.professors = []
+        # (row number, message), in row order once checked
+        self.invalid_rows = []
+        self.duplicate_ids = []
+        # Values not in the app's lists, in order of first appearance
+        self.unknown_departments = {}
+        self.unknown_positions = {}
+        # Non-empty rows read, file size and seconds taken by check_file
+        self.rows = 0
+        self.size = 0
+        self.seconds = 0.0
+        self._seen = set()
+        # (row number, cells) not yet checked against the stored IDs
+        self._unchecked = []
+    
+    def check_file(self, path, departments, positions, workers=None, on_progress=None):
+        """Read and check every row of the file; nothing is looked up or written.
+        
+        Row numbers count the header and empty rows, like a spreadsheet.
+        on_progress(done bytes, total bytes) may raise to stop the check.
+        """
+        started = time.perf_counter()
+        departments = set(departments)
+        positions = set(positions)
+        header = has_header(path)
+        ranges = split_ranges(path, data_start(path, 1 if header else 0))
+        
+        row_number = 1 if header else 0
+        for count, checked in check_ranges(check_professor_range, path, ranges,
+                                           workers=workers, on_progress=on_progress):
+            for index, result in checked:
+                self._add(row_number + index, result, departments, positions)
+            row_number += count
+            self.rows += len(checked)
+        
+        self.size = os.path.getsize(path)
+        self.seconds = time.perf_counter() - started
+        return self
+    
+    def _add(self, row_number, result, departments, positions):
+        if isinstance(result, str):
+            self.invalid_rows.append((row_number, f"Row {row_number}: {result}"))
+            return
+        professor_id, _, department, position = result[:4]
+        if professor_id in self._seen:
+            self.duplicate_ids.append((row_number, f"Row {row_number}: Duplicate ID '{professor_id}' in import file"))
+            return
+        self._seen.add(professor_id)
+        if department not in departments:
+            self.unknown_departments[department] = None
+        if position not in positions:
+            self.unknown_positions[position] = None
+        self._unchecked.append((row_number, result))
+    
+    def check_stored(self, taken_ids, chunk_size=IMPORT_CHUNK_SIZE):
+        """Drop the rows whose IDs are stored already; taken_ids(ids) returns those IDs"""
+        for start in range(0, len(self._unchecked), chunk_size):
+            chunk = self._unchecked[start:start + chunk_size]
+            taken = taken_ids([cells[0] for _, cells in chunk])
+            for row_number, cells in chunk:
+                if cells[0] in taken:
+                    self.duplicate_ids.append(
+                        (row_number, f"Row {row_number}: Professor ID '{cells[0]}' already exists in database")
+                    )
+                else:
+                    self.professors.append(dict(zip(COLUMNS, cells)))
+        self._unchecked = []
+        self.duplicate_ids.sort()
+        return self
+    
+    @property
+    def valid(self):
+        """Rows that passed every check so far"""
+        return len(self.professors) + len(self._unchecked)
+    
+    def throughput(self):
+        return format_throughput(self.rows, self.size, self.seconds)
+    
+    def write(self, add_new, batch_size=IMPORT_CHUNK_SIZE):
+        """Add the checked professors through add_new(batch); returns (added count, failure messages)"""
+        added = 0
+        failures = []
+        for start in range(0, len(self.professors), batch_size):
+            batch = [dict(values, imported=True) for values in self.professors[start:start + batch_size]]
+            try:
+                rejected = add_new(batch)
+            except Exception as e:
+                failures.extend(f"Error importing {professor['name']}: {e}" for professor in batch)
+                continue
+            added += len(batch) - len(rejected)
+            # Taken by another client since the check
+            failures.extend(f"Failed to import: {professor['name']} (ID: {professor['professor_id']})"
+                            for professor in rejected)
+        return added, failures
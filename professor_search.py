@@ -0,0 +1,286 @@
+import bisect
+import heapq
+import itertools
+from collections import defaultdict
+
+# In-memory name search for the professor app's Search & Sort tab.
+#
+# Names are indexed by trigrams of a normalized form: lowercased, with Hangul
+# syllables decomposed into jamo, so that a name also matches while its last
+# syllable is still being composed ("김처" finds "김철수"). A query made only
+# of initial consonants ("ㄱㅊㅅ") is matched against the names' initial
+# consonants instead.
+
+HANGUL_BASE = 0xAC00
+HANGUL_END = 0xD7A3
+INITIALS = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+MEDIALS = ["ㅏ", "ㅐ", "ㅑ", "ㅒ", "ㅓ", "ㅔ", "ㅕ", "ㅖ", "ㅗ", "ㅗㅏ", "ㅗㅐ", "ㅗㅣ", "ㅛ", "ㅜ",
+           "ㅜㅓ", "ㅜㅔ", "ㅜㅣ", "ㅠ", "ㅡ", "ㅡㅣ", "ㅣ"]
+FINALS = ["", "ㄱ", "ㄲ", "ㄱㅅ", "ㄴ", "ㄴㅈ", "ㄴㅎ", "ㄷ", "ㄹ", "ㄹㄱ", "ㄹㅁ", "ㄹㅂ", "ㄹㅅ", "ㄹㅌ",
+          "ㄹㅍ", "ㄹㅎ", "ㅁ", "ㅂ", "ㅂㅅ", "ㅅ", "ㅆ", "ㅇ", "ㅈ", "ㅊ", "ㅋ", "ㅌ", "ㅍ", "ㅎ"]
+# Compound jamo typed on their own, split like the ones inside syllables
+COMPOUND_JAMO = {
+    "ㄳ": "ㄱㅅ", "ㄵ": "ㄴㅈ", "ㄶ": "ㄴㅎ", "ㄺ": "ㄹㄱ", "ㄻ": "ㄹㅁ", "ㄼ": "ㄹㅂ", "ㄽ": "ㄹㅅ",
+    "ㄾ": "ㄹㅌ", "ㄿ": "ㄹㅍ", "ㅀ": "ㄹㅎ", "ㅄ": "ㅂㅅ",
+    "ㅘ": "ㅗㅏ", "ㅙ": "ㅗㅐ", "ㅚ": "ㅗㅣ", "ㅝ": "ㅜㅓ", "ㅞ": "ㅜㅔ", "ㅟ": "ㅜㅣ", "ㅢ": "ㅡㅣ",
+}
+CONSONANTS = frozenset(INITIALS)
+
+NGRAM = 3
+
+# Fields each Sort by option orders on, before the ID; the MongoDB indexes
+# (see repositories.prepare_professor_database) follow the same orders
+SORT_KEYS = {
+    "Name": ("name",),
+    "Department": ("department", "position", "name"),
+    "Position": ("position", "name"),
+    "ID": (),
+}
+
+# str.translate tables, built on first use
+_jamo_table = None
+_initials_table = None
+
+def _tables():
+    global _jamo_table, _initials_table
+    if _jamo_table is None:
+        jamo = dict((ord(char), parts) for char, parts in COMPOUND_JAMO.items())
+        initials = {}
+        for offset in range(HANGUL_END - HANGUL_BASE + 1):
+            initial = INITIALS[offset // 588]
+            jamo[HANGUL_BASE + offset] = initial + MEDIALS[offset % 588 // 28] + FINALS[offset % 28]
+            initials[HANGUL_BASE + offset] = initial
+        _jamo_table, _initials_table = jamo, initials
+    return _jamo_table, _initials_table
+
+def normalize(text):
+    """Lowercased text with Hangul syllables and compound jamo split into jamo"""
+    return text.lower().translate(_tables()[0])
+
+def initial_consonants(text):
+    """The initial consonant of every Hangul syllable ("김철수" -> "ㄱㅊㅅ"); other characters lowercased"""
+    return text.lower().translate(_tables()[1])
+
+def is_initials_query(query):
+    return bool(query) and all(char in CONSONANTS for char in query)
+
+class NgramIndex:
+    """Substring search over one text per key, through trigram posting sets"""
+    
+    def __init__(self):
+        self.texts = {}
+        self.postings = defaultdict(set)
+    
+    def add(self, key, text):
+        if key in self.texts:
+            self.remove(key)
+        self.texts[key] = text
+        for gram in self._grams(text):
+            self.postings[gram].add(key)
+    
+    def remove(self, key):
+        text = self.texts.pop(key, None)
+        if text is None:
+            return
+        for gram in self._grams(text):
+            keys = self.postings[gram]
+            keys.discard(key)
+            if not keys:
+                del self.postings[gram]
+    
+    @staticmethod
+    def _grams(text):
+        return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+    
+    def search(self, query, candidates=None):
+        """Keys whose text contains query, looked for among candidates if given"""
+        texts = self.texts
+        if candidates is not None and len(candidates) * 2 > len(texts):
+            # Scanning everything is cheaper than looking up most of it
+            candidates = None
+        if candidates is None:
+            if len(query) < NGRAM:
+                # Too short for a trigram; a scan of the texts is still fast
+                return {key for key, text in texts.items() if query in text}
+            postings = sorted((self.postings.get(gram, ()) for gram in self._grams(query)), key=len)
+            candidates = set(postings[0]).intersection(*postings[1:]) if postings[0] else set()
+        return {key for key in candidates if query in texts[key]}
+
+class SearchResults:
+    """Matching records as a VirtualTreeview data source.
+    
+    Matches are put in sort order only as far as rows are fetched: the first
+    pages are picked out with a heap, and the whole result is sorted only
+    once the list is scrolled far into it. entries maps each key to its
+    (sort values, key) entry of order. row_builder turns a record into the
+    displayed values.
+    """
+    
+    def __init__(self, records, order, entries, matches, row_builder=None):
+        self.records = records
+        self.row_builder = row_builder
+        self._order = order
+        self._entries = entries
+        self._matches = matches
+        self._count = len(order) if matches is None else len(matches)
+        self._keys = []
+    
+    def count(self):
+        return self._count
+    
+    def __len__(self):
+        return self._count
+    
+    def _first_keys(self, end):
+        """Keys of the first end matches, in order"""
+        if self._matches is None:
+            return [key for _, key in self._order[:end]]
+        end = min(end, self._count)
+        if len(self._keys) < end:
+            if self._count * 4 > len(self._order) and end * 4 < self._count:
+                # Dense matches: the first ones are found a short way into the order
+                matches = self._matches
+                self._keys = list(itertools.islice(
+                    (key for _, key in self._order if key in matches), end
+                ))
+                return self._keys
+            entries = map(self._entries.__getitem__, self._matches)
+            if end * 4 < self._count:
+                entries = heapq.nsmallest(end, entries)
+            else:
+                entries = sorted(entries)
+            self._keys = [key for _, key in entries]
+        return self._keys[:end]
+    
+    def keys(self):
+        """Keys of every match, in order"""
+        return self._first_keys(self._count)
+    
+    def fetch(self, offset, limit):
+        if self._matches is None:
+            keys = [key for _, key in self._order[offset:offset + limit]]
+        else:
+            keys = self._first_keys(offset + limit)[offset:]
+        records = self.records
+        if self.row_builder is None:
+            return [(key, records[key]) for key in keys]
+        return [(key, self.row_builder(records[key])) for key in keys]
+    
+    def __iter__(self):
+        return iter([self.records[key] for key in self.keys()])
+
+class ProfessorSearchIndex:
+    """Name search, department/position filters and sort orders over professor records.
+    
+    Records are dicts with at least "id", "name", "department" and "position".
+    Results of the last query are kept, so a query that extends it (another
+    keystroke) only rechecks those. Every Sort by option's order is built on
+    load and kept sorted as records are added and removed rather than
+    re-sorted; matches are ordered by their entries in it, which change
+    only for the record added or removed.
+    """
+    
+    def __init__(self, records=()):
+        self.load(records)
+    
+    def load(self, records):
+        self.records = {}
+        self.names = NgramIndex()
+        self.initials = NgramIndex()
+        self.by_field = {"department": defaultdict(set), "position": defaultdict(set)}
+        # Sort by option -> [(sort values, key)] in order, and {key: its entry}
+        self._orders = {}
+        self._entries = {}
+        self._last = None
+        for record in records:
+            key = record["id"]
+            if key in self.records:
+                self.remove(key)
+            self.records[key] = record
+            self._index_name(key, record["name"])
+            for field, keys in self.by_field.items():
+                keys[record[field]].add(key)
+        # Every order up front, so no search pays for sorting
+        for sort_by in SORT_KEYS:
+            entries = {key: (self._sort_values(record, sort_by), key) for key, record in self.records.items()}
+            self._entries[sort_by] = entries
+            self._orders[sort_by] = sorted(entries.values())
+    
+    def __len__(self):
+        return len(self.records)
+    
+    def add(self, record):
+        """Add or replace one record"""
+        key = record["id"]
+        self.remove(key)
+        self.records[key] = record
+        self._index_name(key, record["name"])
+        for field, keys in self.by_field.items():
+            keys[record[field]].add(key)
+        for sort_by, order in self._orders.items():
+            entry = (self._sort_values(record, sort_by), key)
+            # A new list, as results being shown may still be walking the old one
+            order = list(order)
+            bisect.insort(order, entry)
+            self._orders[sort_by] = order
+            self._entries[sort_by][key] = entry
+        self._last = None
+    
+    def _index_name(self, key, name):
+        self.names.add(key, normalize(name))
+        initials = initial_consonants(name)
+        # Only names with Hangul can match a query of initial consonants
+        if initials != name.lower():
+            self.initials.add(key, initials)
+    
+    def remove(self, key):
+        record = self.records.pop(key, None)
+        if record is None:
+            return
+        self.names.remove(key)
+        self.initials.remove(key)
+        for field, keys in self.by_field.items():
+            keys[record[field]].discard(key)
+        for sort_by, order in self._orders.items():
+            order = list(order)
+            del order[bisect.bisect_left(order, self._entries[sort_by].pop(key))]
+            self._orders[sort_by] = order
+        self._last = None
+    
+    def _match_name(self, query):
+        """Keys of the records whose name matches query (all of them if it is empty)"""
+        if not query:
+            return None
+        if is_initials_query(query):
+            index, text = self.initials, query
+        else:
+            index, text = self.names, normalize(query)
+        
+        candidates = None
+        last = self._last
+        if last is not None and last[0] is index and last[1] in text:
+            # The previous query's matches are a superset of this one's
+            candidates = last[2]
+        matches = index.search(text, candidates)
+        self._last = (index, text, matches)
+        return matches
+    
+    @staticmethod
+    def _sort_values(record, sort_by):
+        return tuple(record[field] for field in SORT_KEYS[sort_by])
+    
+    def order(self, sort_by):
+        """[(sort values, key)] for every record, in the order of the Sort by option"""
+        return self._orders[sort_by]
+    
+    def search(self, query="", department=None, position=None, sort_by="Name", row_builder=None):
+        """SearchResults for the matching records in sort order; department and position of None match all"""
+        matches = self._match_name(query.strip())
+        for field, value in (("department", department), ("position", position)):
+            if value is not None:
+                keys = self.by_field[field].get(value, set())
+                matches = keys if matches is None else matches & keys
+        
+        if sort_by not in SORT_KEYS:
+            sort_by = "Name"
+        return SearchResults(self.records, self._orders[sort_by], self._entries[sort_by], matches, row_builder)
@@ -0,0 +1,183 @@
+import queue
+import sys
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+class JobCancelled(Exception):
+    """Raised inside a job function once its job has been cancelled"""
+
+class QueryJob:
+    """Handle for one unit of background work: progress, cancellation, callbacks"""
+    
+    def __init__(self, name, on_success=None, on_error=None, on_progress=None, on_cancel=None,
+                 on_event=None):
+        self.name = name
+        self.on_success = on_success
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.on_cancel = on_cancel
+        self.on_event = on_event
+        
+        self._cancelled = threading.Event()
+        self._cancel_callbacks = []
+        self._lock = threading.Lock()
+        self._executor = None
+        self._last_progress = None
+        self._finished = False
+    
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+    
+    def cancel(self):
+        """Request cancellation; the job stops at its next check or interrupt"""
+        with self._lock:
+            self._cancelled.set()
+            # Callbacks such as Connection.interrupt must not fire once the job
+            # is done, or they would hit whatever the connection runs next, so
+            # they run under the lock that _finish() takes
+            if self._finished:
+                return
+            for callback in self._cancel_callbacks:
+                try:
+                    callback()
+                except Exception:
+                    pass
+    
+    def add_cancel_callback(self, callback):
+        """Run callback when the job is cancelled (e.g. sqlite3 Connection.interrupt)"""
+        with self._lock:
+            if not self._cancelled.is_set():
+                self._cancel_callbacks.append(callback)
+                return
+        callback()
+    
+    def _finish(self):
+        with self._lock:
+            self._finished = True
+            self._cancel_callbacks = []
+    
+    def sleep(self, seconds):
+        """Wait up to seconds, raising JobCancelled as soon as the job is cancelled"""
+        if self._cancelled.wait(seconds):
+            raise JobCancelled(self.name)
+    
+    def check_cancelled(self):
+        """Raise JobCancelled if cancellation was requested"""
+        if self._cancelled.is_set():
+            raise JobCancelled(self.name)
+    
+    def report_progress(self, done, total, message=""):
+        """Report progress from the worker thread; delivered on the Tk thread"""
+        self.check_cancelled()
+        # Only forward whole-percent changes so the event queue stays small
+        percent = int(done * 100 / total) if total else 100
+        if percent != self._last_progress and self._executor is not None:
+            self._last_progress = percent
+            self._executor._events.put((self, "progress", (done, total, message)))
+    
+    def emit(self, *args):
+        """Send args to on_event on the Tk thread (for jobs that run indefinitely).
+        
+        Raises JobCancelled instead once the job is cancelled; events already
+        sent still reach on_event, which must check whether the job is stale.
+        """
+        self.check_cancelled()
+        if self._executor is not None:
+            self._executor._events.put((self, "event", args))
+
+class QueryExecutor:
+    """Runs database work on a thread pool and hands results back to Tk.
+    
+    Tk widgets may only be touched from the main thread, so workers push their
+    outcome onto a queue that the main loop drains with root.after().
+    """
+    
+    def __init__(self, root, max_workers=2, poll_interval=50):
+        self.root = root
+        self.poll_interval = poll_interval
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="query")
+        self._events = queue.Queue()
+        self._shutdown = False
+        self.root.after(self.poll_interval, self._poll)
+    
+    def submit(self, func, *args, name=None, on_success=None, on_error=None,
+               on_progress=None, on_cancel=None, on_event=None):
+        """Run func(job, *args) in the background and return its QueryJob.
+        
+        on_success(result), on_error(exception), on_progress(done, total, message),
+        on_cancel() and on_event(*args) are all called on the Tk thread.
+        """
+        job = QueryJob(name or getattr(func, "__name__", "query"),
+                       on_success=on_success, on_error=on_error,
+                       on_progress=on_progress, on_cancel=on_cancel, on_event=on_event)
+        job._executor = self
+        self._pool.submit(self._run, job, func, args)
+        return job
+    
+    def _run(self, job, func, args):
+        if job.cancelled:
+            self._events.put((job, "cancelled", None))
+            return
+        try:
+            try:
+                result = func(job, *args)
+            finally:
+                job._finish()
+        except JobCancelled:
+            self._events.put((job, "cancelled", None))
+        except Exception as e:
+            # An interrupted query surfaces as an OperationalError
+            self._events.put((job, "cancelled" if job.cancelled else "error", e))
+        else:
+            self._events.put((job, "cancelled" if job.cancelled else "success", result))
+    
+    def _poll(self):
+        """Deliver finished work and progress updates on the Tk thread"""
+        try:
+            while True:
+                job, kind, payload = self._events.get_nowait()
+                try:
+                    if kind == "progress":
+                        if job.on_progress and not job.cancelled:
+                            job.on_progress(*payload)
+                    elif kind == "event":
+                        # Delivered even after cancellation: an event may carry
+                        # something to release, so on_event ignores stale jobs
+                        if job.on_event:
+                            job.on_event(*payload)
+                    elif kind == "success":
+                        if job.on_success:
+                            job.on_success(payload)
+                    elif kind == "error":
+                        if job.on_error:
+                            job.on_error(payload)
+                    elif kind == "cancelled":
+                        if job.on_cancel:
+                            job.on_cancel()
+                except Exception as e:
+                    self._callback_failed(job, kind, e)
+        except queue.Empty:
+            pass
+        
+        if not self._shutdown:
+            self.root.after(self.poll_interval, self._poll)
+    
+    def _callback_failed(self, job, kind, error):
+        """Report an exception raised by one of job's callbacks"""
+        # The job's own error handler shows it like any failure of the job;
+        # only a failing error handler itself falls back to a traceback
+        if kind != "error" and job.on_error:
+            try:
+                job.on_error(error)
+                return
+            except Exception:
+                pass
+        print(f"Error in callback for {job.name}:", file=sys.stderr)
+        traceback.print_exception(type(error), error, error.__traceback__)
+    
+    def shutdown(self, wait=False):
+        """Stop polling and let running jobs finish, waiting for them if wait is set"""
+        self._shutdown = True
+        self._pool.shutdown(wait=wait)
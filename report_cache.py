@@ -0,0 +1,116 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Caching of the desktop apps' report texts.
+#
+# Every app method that writes data publishes what it changed on the app's
+# ChangeBus, as a topic ("students", "scores", "professors") and optionally
+# the one ID that changed. The ReportCache listens on the bus and drops only
+# the reports that were built from the changed data, so opening a report
+# again is instant until something it shows has actually changed.
+
+class ChangeBus:
+    """Tells subscribers about data changes, synchronously on the publishing thread"""
+    
+    def __init__(self):
+        self._subscribers = []
+    
+    def subscribe(self, callback):
+        """Call callback(topic, key) for every change published from now on"""
+        self._subscribers.append(callback)
+    
+    def publish(self, topic=None, key=None):
+        """Announce a change to one key of topic, all of topic (key None) or everything (topic None)"""
+        for callback in list(self._subscribers):
+            callback(topic, key)
+
+class ReportCache:
+    """LRU cache of built reports, keyed by report type and parameters.
+    
+    Each entry remembers the (topic, key) pairs it was built from, with key
+    None for a whole topic, and invalidate() drops the entries a change
+    touches. max_age (seconds) bounds how long an entry is trusted where
+    other clients can write the same data without the app hearing of it.
+    Safe to use from worker threads.
+    """
+    
+    def __init__(self, maxsize=32, max_age=None, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.max_age = max_age
+        self._clock = clock
+        # key -> (value, dependencies, built at), least recently used first
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by every invalidation, so a build that overlapped a write is not kept
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def get_or_build(self, key, build, depends):
+        """The cached value for key, or build() cached under the dependencies in depends.
+        
+        A build() result of None (nothing to report) is returned but not cached.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not self._expired(entry):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            generation = self._generation
+        
+        value = build()
+        
+        with self._lock:
+            if value is not None and generation == self._generation:
+                self._entries[key] = (value, frozenset(depends), self._clock())
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return value
+    
+    def _expired(self, entry):
+        return self.max_age is not None and self._clock() - entry[2] > self.max_age
+    
+    def invalidate(self, topic=None, key=None):
+        """Drop the entries built from data that changed (a ChangeBus subscriber)"""
+        with self._lock:
+            self._generation += 1
+            if topic is None:
+                stale = list(self._entries)
+            elif key is None:
+                stale = [entry_key for entry_key, (_, depends, _) in self._entries.items()
+                         if any(depends_topic == topic for depends_topic, _ in depends)]
+            else:
+                stale = [entry_key for entry_key, (_, depends, _) in self._entries.items()
+                         if (topic, None) in depends or (topic, key) in depends]
+            for entry_key in stale:
+                del self._entries[entry_key]
+            self.invalidations += len(stale)
+    
+    def stats(self):
+        """Hit, miss, eviction and invalidation counts and the current size"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "size": len(self._entries),
+            }
+    
+    def format_stats(self):
+        stats = self.stats()
+        lookups = stats["hits"] + stats["misses"]
+        hit_rate = stats["hits"] / lookups * 100 if lookups else 0
+        return (f"{stats['hits']} hits, {stats['misses']} misses ({hit_rate:.0f}% hits), "
+                f"{stats['size']} cached, {stats['evictions']} evicted, "
+                f"{stats['invalidations']} invalidated")
@@ -0,0 +1,959 @@
+import itertools
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+from score_analytics import LETTER_GRADES
+from professor_search import SORT_KEYS, normalize, initial_consonants, is_initials_query
+
+# Storage-independent data access for the desktop apps.
+#
+# Students are {"name", "class", "major"} keyed by student_id, scores are
+# entered as (score_id, student_id, subject, score, datetime) tuples and
+# professors are dicts carrying their professor_id. Every backend has an
+# in-memory, a MongoDB and a SQLite implementation with the same methods,
+# including the batch ones (add_many, add_scores), so the apps do not branch
+# on the backend and the backends can be compared like for like.
+
+def get_grade(score):
+    """Letter grade used by the student score app and its summaries"""
+    return LETTER_GRADES.grade(score)
+
+def average_latest_score(latest):
+    """Average of one student's {subject: latest score} (0 if there are none)"""
+    if not latest:
+        return 0
+    return sum(latest.values()) / len(latest)
+
+class StudentRepository(ABC):
+    """Students keyed by student_id"""
+    
+    @abstractmethod
+    def get(self, student_id):
+        """{"name", "class", "major"} for one student, or None"""
+        raise NotImplementedError
+    
+    @abstractmethod
+    def all(self):
+        """Mapping of student_id -> {"name", "class", "major"}"""
+        raise NotImplementedError
+    
+    @abstractmethod
+    def add(self, student_id, name, class_name, major):
+        """Add a student; returns False if the ID is already taken"""
+        raise NotImplementedError
+    
+    @abstractmethod
+    def add_many(self, students):
+        """Add or replace (student_id, name, class_name, major) rows in one batch"""
+        raise NotImplementedError
+    
+    @abstractmethod
+    def update(self, student_id, name, class_name, major):
+        """Returns False if there is no such student"""
+        raise NotImplementedError
+    
+    @abstractmethod
+    def delete(self, student_id):
+        """Delete a student and all their scores; returns False if there was none"""
+        raise NotImplementedError
+
+class ScoreRepository(ABC):
+    """Score history and the latest score per student and subject"""
+    
+    @abstractmethod
+    def add_scores(self, scores):
+        """Record (score_id, student_id, subject, score, datetime) entries in one batch"""
+        raise NotImplementedError
+    
+    def load_scores(self, batches):
+        """Record an iterable of add_scores batches, e.g. a bulk import.
+        
+        Backends that can load faster than batch by batch override this.
+        """
+        for batch in batches:
+            self.add_scores(batch)
+    
+    @abstractmethod
+    def history(self, student_id):
+        """[(date "YYYY-MM-DD", subject, score)] for one student, newest first"""
+        raise NotImplementedError
+    
+    @abstractmethod
+    def latest_scores(self, student_ids=None):
+        """{student_id: {subject: latest score}} for many students (all if None).
+        
+        Students without scores are left out.
+        """
+        raise NotImplementedError
+    
+    def average(self, student_id):
+        """Average of the student's latest score per subject (0 if none)"""
+        return average_latest_score(self.latest_scores([student_id]).get(student_id))
+    
+    def statistics(self, students, subjects):
+        """Totals for the statistics tab from students (StudentRepository.all()).
+        
+        Returns (class counts, major counts, {subject: (average, count)},
+        average of student averages, students with scores).
+        """
+        latest = self.latest_scores()
+        
+        classes = {}
+        majors = {}
+        for student_data in students.values():
+            class_name = student_data["class"]
+            major = student_data["major"]
+            classes[class_name] = classes.get(class_name, 0) + 1
+            majors[major] = majors.get(major, 0) + 1
+        
+        subject_totals = {subject: [0.0, 0] for subject in subjects}
+        average_total = 0.0
+        average_count = 0
+        for student_id in students:
+            student_latest = latest.get(student_id, {})
+            for subject, score in student_latest.items():
+                if subject in subject_totals:
+                    subject_totals[subject][0] += score
+                    subject_totals[subject][1] += 1
+            avg = average_latest_score(student_latest)
+            if avg > 0:
+                average_total += avg
+                average_count += 1
+        
+        subject_averages = {
+            subject: (total / count if count else 0, count)
+            for subject, (total, count) in subject_totals.items()
+        }
+        system_avg = average_total / average_count if average_count else 0
+        return classes, majors, subject_averages, system_avg, average_count
+
+class ProfessorRepository(ABC):
+    """Professors keyed by professor_id"""
+    
+    @abstractmethod
+    def get(self, professor_id):
+        """The professor's dict (including professor_id), or None"""
+        raise NotImplementedError
+    
+    @abstractmethod
+    def all(self):
+        """List of professor dicts"""
+        raise NotImplementedError
+    
+    @abstractmethod
+    def add(self, professor):
+        """Add a professor dict; returns False if the ID is already taken"""
+        raise NotImplementedError
+    
+    @abstractmethod
+    def add_many(self, professors):
+        """Add or replace professor dicts in one batch"""
+        raise NotImplementedError
+    
+    @abstractmethod
+    def add_new(self, professors):
+        """Add the professor dicts whose IDs are free, in one batch; returns the rest"""
+        raise NotImplementedError
+    
+    @abstractmethod
+    def taken_ids(self, professor_ids):
+        """The set of professor_ids that are already in use, looked up in one query"""
+        raise NotImplementedError
+    
+    @abstractmethod
+    def update(self, professor_id, fields):
+        """Change some fields; returns False if there is no such professor"""
+        raise NotImplementedError
+    
+    @abstractmethod
+    def delete(self, professor_id):
+        """Returns False if there was no such professor"""
+        raise NotImplementedError
+
+# In-memory backends. Given a WriteBehindQueue they also queue every change
+# for MongoDB, in the operation format the apps replay.
+
+class MemoryStudentRepository(StudentRepository):
+    def __init__(self, store, write_behind=None):
+        self.store = store
+        self.write_behind = write_behind
+    
+    def _queue(self, kind, *args):
+        if self.write_behind is not None:
+            self.write_behind.enqueue(kind, *args)
+    
+    def get(self, student_id):
+        return self.store.get(student_id)
+    
+    def all(self):
+        return self.store
+    
+    def add(self, student_id, name, class_name, major):
+        if student_id in self.store:
+            return False
+        self.store.add_student(student_id, name, class_name, major)
+        self._queue("upsert_student", student_id, name, class_name, major)
+        return True
+    
+    def add_many(self, students):
+        for student_id, name, class_name, major in students:
+            self.store.add_student(student_id, name, class_name, major)
+            self._queue("upsert_student", student_id, name, class_name, major)
+    
+    def update(self, student_id, name, class_name, major):
+        if student_id not in self.store:
+            return False
+        self.store.update_student(student_id, name, class_name, major)
+        self._queue("upsert_student", student_id, name, class_name, major)
+        return True
+    
+    def delete(self, student_id):
+        if student_id not in self.store:
+            return False
+        self.store.remove_student(student_id)
+        self._queue("delete_student", student_id)
+        return True
+
+class MemoryScoreRepository(ScoreRepository):
+    def __init__(self, store, write_behind=None):
+        self.store = store
+        self.write_behind = write_behind
+    
+    def add_scores(self, scores):
+        queued = {}
+        for score_id, student_id, subject, score, date_recorded in scores:
+            self.store.add_score(student_id, subject, score, date_recorded.date())
+            queued.setdefault(student_id, []).append(
+                [score_id, subject, score, date_recorded.isoformat()])
+        if self.write_behind is not None:
+            for student_id, entries in queued.items():
+                self.write_behind.enqueue("insert_scores", student_id, entries)
+    
+    def history(self, student_id):
+        if student_id not in self.store:
+            return []
+        history = [(date_recorded, subject, score)
+                   for subject, score, date_recorded in self.store.history(student_id)]
+        # Stable, so scores from the same day keep their entry order
+        history.reverse()
+        history.sort(key=lambda entry: entry[0], reverse=True)
+        return history
+    
+    def latest_scores(self, student_ids=None):
+        latest = {}
+        for student_id in (self.store if student_ids is None else student_ids):
+            scores = self.store.latest_scores(student_id)
+            if scores:
+                latest[student_id] = scores
+        return latest
+    
+    def average(self, student_id):
+        return self.store.average(student_id)
+    
+    def statistics(self, students, subjects):
+        # The store keeps these totals up to date on every change
+        system_avg, students_with_scores = self.store.system_average()
+        return (self.store.class_counts, self.store.major_counts,
+                {subject: self.store.subject_average(subject) for subject in subjects},
+                system_avg, students_with_scores)
+
+class MemoryProfessorRepository(ProfessorRepository):
+    """Professors in a dict of professor_id -> fields (e.g. a JournaledDict)"""
+    
+    def __init__(self, professors, write_behind=None):
+        self.professors = professors
+        self.write_behind = write_behind
+    
+    def _queue(self, kind, *args):
+        if self.write_behind is not None:
+            self.write_behind.enqueue(kind, *args)
+    
+    def get(self, professor_id):
+        data = self.professors.get(professor_id)
+        return None if data is None else dict(data, professor_id=professor_id)
+    
+    def all(self):
+        return [dict(data, professor_id=professor_id) for professor_id, data in self.professors.items()]
+    
+    def _put(self, professor_id, data):
+        # Replaced rather than updated in place so a JournaledDict records it
+        self.professors[professor_id] = data
+        self._queue("upsert_professor", professor_id, data)
+    
+    def add(self, professor):
+        if professor["professor_id"] in self.professors:
+            return False
+        self.add_many([professor])
+        return True
+    
+    def add_many(self, professors):
+        for professor in professors:
+            data = dict(professor)
+            self._put(data.pop("professor_id"), data)
+    
+    def add_new(self, professors):
+        rejected = []
+        for professor in professors:
+            if professor["professor_id"] in self.professors:
+                rejected.append(professor)
+            else:
+                data = dict(professor)
+                self._put(data.pop("professor_id"), data)
+        return rejected
+    
+    def taken_ids(self, professor_ids):
+        return {professor_id for professor_id in professor_ids if professor_id in self.professors}
+    
+    def update(self, professor_id, fields):
+        if professor_id not in self.professors:
+            return False
+        self._put(professor_id, {**self.professors[professor_id], **fields})
+        return True
+    
+    def delete(self, professor_id):
+        if professor_id not in self.professors:
+            return False
+        del self.professors[professor_id]
+        self._queue("delete_professor", professor_id)
+        return True
+
+# MongoDB backends (pymongo is only imported by the methods that need it)
+
+class MongoStudentRepository(StudentRepository):
+    def __init__(self, db):
+        self.students = db['students']
+        self.scores = db['scores']
+        self.summaries = db['student_summaries']
+    
+    def get(self, student_id):
+        return self.students.find_one(
+            {"student_id": student_id}, {"_id": 0, "name": 1, "class": 1, "major": 1}
+        )
+    
+    def all(self):
+        students = self.students.find(
+            {}, {"_id": 0, "student_id": 1, "name": 1, "class": 1, "major": 1}
+        )
+        return {student["student_id"]: student for student in students}
+    
+    def add(self, student_id, name, class_name, major):
+        from pymongo.errors import DuplicateKeyError
+        
+        try:
+            self.students.insert_one({
+                "student_id": student_id,
+                "name": name,
+                "class": class_name,
+                "major": major,
+                "created_at": datetime.now()
+            })
+        except DuplicateKeyError:
+            return False
+        return True
+    
+    def add_many(self, students):
+        from pymongo import UpdateOne
+        
+        requests = [
+            UpdateOne(
+                {"student_id": student_id},
+                {"$set": {"name": name, "class": class_name, "major": major, "updated_at": datetime.now()},
+                 "$setOnInsert": {"created_at": datetime.now()}},
+                upsert=True
+            )
+            for student_id, name, class_name, major in students
+        ]
+        if requests:
+            # Ordered, so the last of several changes to one student wins
+            self.students.bulk_write(requests, ordered=True)
+    
+    def update(self, student_id, name, class_name, major):
+        result = self.students.update_one(
+            {"student_id": student_id},
+            {"$set": {
+                "name": name,
+                "class": class_name,
+                "major": major,
+                "updated_at": datetime.now()
+            }}
+        )
+        return result.matched_count > 0
+    
+    def delete(self, student_id):
+        # Scores first, so a failure part way leaves no orphaned scores
+        self.scores.delete_many({"student_id": student_id})
+        self.summaries.delete_one({"student_id": student_id})
+        return self.students.delete_one({"student_id": student_id}).deleted_count > 0
+
+class MongoScoreRepository(ScoreRepository):
+    """Scores plus the per-student documents in student_summaries"""
+    
+    def __init__(self, db):
+        self.scores = db['scores']
+        self.summaries = db['student_summaries']
+    
+    def add_scores(self, scores):
+        from pymongo import UpdateOne
+        
+        requests = []
+        new_scores = {}
+        for score_id, student_id, subject, score, date_recorded in scores:
+            score_data = {
+                "student_id": student_id,
+                "subject": subject,
+                "score": score,
+                "date_recorded": date_recorded
+            }
+            # Keyed by the client-side id, so adding the same entry twice is harmless
+            requests.append(UpdateOne({"_id": score_id}, {"$setOnInsert": score_data}, upsert=True))
+            new_scores.setdefault(student_id, []).append(score_data)
+        
+        if requests:
+            self.scores.bulk_write(requests, ordered=False)
+            update_student_summaries(self.summaries, new_scores)
+    
+    def history(self, student_id):
+        scores = self.scores.find(
+            {"student_id": student_id}, {"_id": 0, "subject": 1, "score": 1, "date_recorded": 1}
+        ).sort("date_recorded", -1)
+        return [(score_data["date_recorded"].strftime("%Y-%m-%d"), score_data["subject"], score_data["score"])
+                for score_data in scores]
+    
+    def latest_scores(self, student_ids=None):
+        # One query over the precomputed summaries rather than aggregating history
+        query = {}
+        if student_ids is not None:
+            query = {"student_id": {"$in": list(student_ids)}}
+        summaries = self.summaries.find(query, {"_id": 0, "student_id": 1, "latest": 1})
+        return {summary["student_id"]: summary["latest"] for summary in summaries if summary.get("latest")}
+    
+    def average(self, student_id):
+        summary = self.summaries.find_one({"student_id": student_id}, {"_id": 0, "average": 1})
+        return summary["average"] if summary else 0
+
+class MongoProfessorRepository(ProfessorRepository):
+    """Professors in one collection; each document also carries its name in
+    the normalized forms the name search matches against (see professor_search.py)"""
+    
+    # Everything but the search fields
+    PROJECTION = {"_id": 0, "name_key": 0, "name_initials": 0}
+    
+    def __init__(self, db):
+        self.professors = db['professors']
+    
+    @staticmethod
+    def _with_search_fields(professor):
+        if "name" not in professor:
+            return dict(professor)
+        return dict(professor, name_key=normalize(professor["name"]),
+                    name_initials=initial_consonants(professor["name"]))
+    
+    def get(self, professor_id):
+        return self.professors.find_one({"professor_id": professor_id}, self.PROJECTION)
+    
+    def all(self):
+        return list(self.professors.find({}, self.PROJECTION))
+    
+    def search(self, query="", department=None, position=None, sort_by="Name", formatter=None, on_error=None):
+        """The matching professors as a MongoDataSource, filtered and sorted by the server.
+        
+        Matches names like ProfessorSearchIndex.search; rows are read a page at
+        a time as they are shown.
+        """
+        import re
+        from virtual_tree import MongoDataSource
+        
+        conditions = {}
+        if department is not None:
+            conditions["department"] = department
+        if position is not None:
+            conditions["position"] = position
+        query = query.strip()
+        if is_initials_query(query):
+            conditions["name_initials"] = {"$regex": re.escape(query)}
+        elif query:
+            conditions["name_key"] = {"$regex": re.escape(normalize(query))}
+        
+        sort = [(field, 1) for field in SORT_KEYS.get(sort_by, SORT_KEYS["Name"])] + [("professor_id", 1)]
+        return MongoDataSource(self.professors, conditions, sort, "professor_id", self.PROJECTION,
+                               formatter=formatter, on_error=on_error)
+    
+    def add(self, professor):
+        from pymongo.errors import DuplicateKeyError
+        
+        try:
+            self.professors.insert_one(dict(self._with_search_fields(professor), created_at=datetime.now()))
+        except DuplicateKeyError:
+            return False
+        return True
+    
+    def add_many(self, professors):
+        from pymongo import UpdateOne
+        
+        requests = [
+            UpdateOne(
+                {"professor_id": professor["professor_id"]},
+                {"$set": dict(self._with_search_fields(professor), updated_at=datetime.now()),
+                 "$setOnInsert": {"created_at": datetime.now()}},
+                upsert=True
+            )
+            for professor in professors
+        ]
+        if requests:
+            # Ordered, so the last of several changes to one professor wins
+            self.professors.bulk_write(requests, ordered=True)
+    
+    def add_new(self, professors):
+        from pymongo.errors import BulkWriteError
+        
+        professors = list(professors)
+        if not professors:
+            return []
+        created_at = datetime.now()
+        documents = [dict(self._with_search_fields(professor), created_at=created_at) for professor in professors]
+        try:
+            # Unordered, so a taken ID does not stop the rest of the batch
+            self.professors.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(error.get("code") != 11000 for error in errors):
+                raise
+            return [professors[error["index"]] for error in errors]
+        return []
+    
+    def taken_ids(self, professor_ids):
+        cursor = self.professors.find({"professor_id": {"$in": list(professor_ids)}}, {"_id": 0, "professor_id": 1})
+        return {professor["professor_id"] for professor in cursor}
+    
+    def update(self, professor_id, fields):
+        result = self.professors.update_one(
+            {"professor_id": professor_id},
+            {"$set": dict(self._with_search_fields(fields), updated_at=datetime.now())}
+        )
+        return result.matched_count > 0
+    
+    def delete(self, professor_id):
+        return self.professors.delete_one({"professor_id": professor_id}).deleted_count > 0
+
+# SQLite backends on a SQLiteConnectionManager; the student and score tables
+# are those of student_schema.py's migrations
+
+# Stays well under SQLite's limit on host parameters per statement
+SQLITE_BATCH_SIZE = 500
+
+# Numbers the staging table of each SqliteScoreRepository.load_scores call
+_score_import_tables = itertools.count(1)
+
+class SqliteStudentRepository(StudentRepository):
+    def __init__(self, db):
+        self.db = db
+    
+    def get(self, student_id):
+        row = self.db.reader().execute(
+            'SELECT name, class_name, major FROM students WHERE student_id = ?', (student_id,)
+        ).fetchone()
+        return None if row is None else {"name": row[0], "class": row[1], "major": row[2]}
+    
+    def all(self):
+        rows = self.db.reader().execute(
+            'SELECT student_id, name, class_name, major FROM students ORDER BY student_id'
+        )
+        return {row[0]: {"name": row[1], "class": row[2], "major": row[3]} for row in rows}
+    
+    def add(self, student_id, name, class_name, major):
+        with self.db.transaction() as cursor:
+            cursor.execute('''
+                INSERT INTO students (student_id, name, class_name, major)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (student_id) DO NOTHING
+            ''', (student_id, name, class_name, major))
+            return cursor.rowcount > 0
+    
+    def add_many(self, students):
+        with self.db.transaction() as cursor:
+            cursor.executemany('''
+                INSERT INTO students (student_id, name, class_name, major)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (student_id) DO UPDATE SET
+                    name = excluded.name,
+                    class_name = excluded.class_name,
+                    major = excluded.major
+            ''', students)
+    
+    def update(self, student_id, name, class_name, major):
+        with self.db.transaction() as cursor:
+            cursor.execute('''
+                UPDATE students
+                SET name = ?, class_name = ?, major = ?
+                WHERE student_id = ?
+            ''', (name, class_name, major, student_id))
+            return cursor.rowcount > 0
+    
+    def delete(self, student_id):
+        with self.db.transaction() as cursor:
+            # Scores first; the trigger keeps latest_scores in step
+            cursor.execute('DELETE FROM scores WHERE student_id = ?', (student_id,))
+            cursor.execute('DELETE FROM students WHERE student_id = ?', (student_id,))
+            return cursor.rowcount > 0
+
+class SqliteScoreRepository(ScoreRepository):
+    """Scores; latest_scores is maintained by the schema's triggers"""
+    
+    def __init__(self, db):
+        self.db = db
+    
+    def add_scores(self, scores):
+        # SQLite numbers its own rows, so the client-side score_id is not stored
+        with self.db.transaction() as cursor:
+            cursor.executemany('''
+                INSERT INTO scores (student_id, subject, score, date_recorded)
+                VALUES (?, ?, ?, ?)
+            ''', [
+                (student_id, subject, score, date_recorded.strftime("%Y-%m-%d %H:%M:%S"))
+                for _, student_id, subject, score, date_recorded in scores
+            ])
+    
+    def load_scores(self, batches):
+        """Bulk load: all or nothing, without holding up other writers.
+        
+        Batches are staged in a temporary table of this load's own, each in a
+        short transaction. A single transaction at the end copies them into scores
+        with the per-row insert trigger suspended, and merges the latest
+        score per student and subject (tracked while staging) into
+        latest_scores in one pass. Nothing reaches scores if the batches
+        raise, e.g. when an import is cancelled.
+        """
+        latest = {}
+        # Imports tend to share a handful of dates, so each is formatted once
+        date_texts = {}
+        # Not shared with other loads, so a cancelled load's cleanup cannot
+        # touch the rows of one that started after it
+        staging = f"temp.score_import_{next(_score_import_tables)}"
+        with self.db.transaction() as cursor:
+            cursor.execute(f'''
+                CREATE TABLE {staging} (
+                    student_id TEXT, subject TEXT, score REAL, date_recorded TEXT
+                )
+            ''')
+        try:
+            for batch in batches:
+                rows = []
+                for _, student_id, subject, score, date_recorded in batch:
+                    date_text = date_texts.get(date_recorded)
+                    if date_text is None:
+                        date_text = date_texts[date_recorded] = date_recorded.strftime("%Y-%m-%d %H:%M:%S")
+                    rows.append((student_id, subject, score, date_text))
+                with self.db.transaction() as cursor:
+                    cursor.executemany(f'INSERT INTO {staging} VALUES (?, ?, ?, ?)', rows)
+                
+                # Same rule as the trigger: the later entry wins a tie on date
+                for row in rows:
+                    current = latest.get(row[:2])
+                    if current is None or row[3] >= current[3]:
+                        latest[row[:2]] = row
+            
+            with self.db.transaction() as cursor:
+                trigger = cursor.execute('''
+                    SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'scores_latest_insert'
+                ''').fetchone()
+                if trigger:
+                    cursor.execute('DROP TRIGGER scores_latest_insert')
+                # In index order, which keeps each student's and subject's
+                # entries in file order but makes the index updates sequential
+                cursor.execute(f'''
+                    INSERT INTO scores (student_id, subject, score, date_recorded)
+                    SELECT student_id, subject, score, date_recorded
+                    FROM {staging}
+                    ORDER BY student_id, subject, rowid
+                ''')
+                cursor.executemany('''
+                    INSERT INTO latest_scores (student_id, subject, score, date_recorded)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT (student_id, subject) DO UPDATE SET
+                        score = excluded.score,
+                        date_recorded = excluded.date_recorded
+                    WHERE excluded.date_recorded >= latest_scores.date_recorded
+                ''', latest.values())
+                if trigger:
+                    # DDL is transactional, so other writers never see it missing
+                    cursor.execute(trigger[0])
+        finally:
+            with self.db.transaction() as cursor:
+                cursor.execute(f'DROP TABLE {staging}')
+    
+    def history(self, student_id):
+        rows = self.db.reader().execute('''
+            SELECT date_recorded, subject, score
+            FROM scores
+            WHERE student_id = ?
+            ORDER BY date_recorded DESC, id DESC
+        ''', (student_id,))
+        return [(date_recorded.split()[0], subject, score) for date_recorded, subject, score in rows]
+    
+    def latest_scores(self, student_ids=None):
+        conn = self.db.reader()
+        if student_ids is None:
+            batches = [conn.execute('SELECT student_id, subject, score FROM latest_scores')]
+        else:
+            student_ids = list(student_ids)
+            batches = (
+                conn.execute(f'''
+                    SELECT student_id, subject, score
+                    FROM latest_scores
+                    WHERE student_id IN ({", ".join("?" * len(batch))})
+                ''', batch)
+                for batch in (student_ids[start:start + SQLITE_BATCH_SIZE]
+                              for start in range(0, len(student_ids), SQLITE_BATCH_SIZE))
+            )
+        
+        latest = {}
+        for rows in batches:
+            for student_id, subject, score in rows:
+                latest.setdefault(student_id, {})[subject] = score
+        return latest
+
+class SqliteProfessorRepository(ProfessorRepository):
+    """Professors in a SQLite table of their own, created on first use"""
+    
+    FIELDS = ("name", "email", "phone", "department", "position", "specialization", "office")
+    
+    def __init__(self, db):
+        self.db = db
+        with self.db.transaction() as cursor:
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS professors (
+                    professor_id TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    email TEXT,
+                    phone TEXT,
+                    department TEXT NOT NULL,
+                    position TEXT NOT NULL,
+                    specialization TEXT,
+                    office TEXT,
+                    imported INTEGER DEFAULT 0,
+                    created_date TEXT DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_professors_department_position
+                ON professors (department, position)
+            ''')
+    
+    def _professor(self, row):
+        return dict(zip(("professor_id",) + self.FIELDS, row))
+    
+    def _values(self, professor):
+        return ((professor["professor_id"],) + tuple(professor.get(field, "") for field in self.FIELDS)
+                + (int(bool(professor.get("imported"))),))
+    
+    def get(self, professor_id):
+        row = self.db.reader().execute(
+            f'SELECT professor_id, {", ".join(self.FIELDS)} FROM professors WHERE professor_id = ?',
+            (professor_id,)
+        ).fetchone()
+        return None if row is None else self._professor(row)
+    
+    def all(self):
+        rows = self.db.reader().execute(
+            f'SELECT professor_id, {", ".join(self.FIELDS)} FROM professors ORDER BY professor_id'
+        )
+        return [self._professor(row) for row in rows]
+    
+    def add(self, professor):
+        with self.db.transaction() as cursor:
+            cursor.execute(f'''
+                INSERT INTO professors (professor_id, {", ".join(self.FIELDS)}, imported)
+                VALUES ({", ".join("?" * (len(self.FIELDS) + 2))})
+                ON CONFLICT (professor_id) DO NOTHING
+            ''', self._values(professor))
+            return cursor.rowcount > 0
+    
+    def add_many(self, professors):
+        updates = ", ".join(f"{field} = excluded.{field}" for field in self.FIELDS)
+        with self.db.transaction() as cursor:
+            cursor.executemany(f'''
+                INSERT INTO professors (professor_id, {", ".join(self.FIELDS)}, imported)
+                VALUES ({", ".join("?" * (len(self.FIELDS) + 2))})
+                ON CONFLICT (professor_id) DO UPDATE SET {updates}
+            ''', [self._values(professor) for professor in professors])
+    
+    def add_new(self, professors):
+        rejected = []
+        with self.db.transaction() as cursor:
+            for professor in professors:
+                cursor.execute(f'''
+                    INSERT INTO professors (professor_id, {", ".join(self.FIELDS)}, imported)
+                    VALUES ({", ".join("?" * (len(self.FIELDS) + 2))})
+                    ON CONFLICT (professor_id) DO NOTHING
+                ''', self._values(professor))
+                if cursor.rowcount == 0:
+                    rejected.append(professor)
+        return rejected
+    
+    def taken_ids(self, professor_ids):
+        professor_ids = list(professor_ids)
+        taken = set()
+        reader = self.db.reader()
+        # In chunks, within SQLite's limit on query parameters
+        for start in range(0, len(professor_ids), 500):
+            chunk = professor_ids[start:start + 500]
+            rows = reader.execute(
+                f'SELECT professor_id FROM professors WHERE professor_id IN ({", ".join("?" * len(chunk))})', chunk
+            )
+            taken.update(row[0] for row in rows)
+        return taken
+    
+    def update(self, professor_id, fields):
+        fields = {field: value for field, value in fields.items() if field in self.FIELDS}
+        if not fields:
+            return self.get(professor_id) is not None
+        with self.db.transaction() as cursor:
+            cursor.execute(f'''
+                UPDATE professors
+                SET {", ".join(f"{field} = ?" for field in fields)}
+                WHERE professor_id = ?
+            ''', tuple(fields.values()) + (professor_id,))
+            return cursor.rowcount > 0
+    
+    def delete(self, professor_id):
+        with self.db.transaction() as cursor:
+            cursor.execute('DELETE FROM professors WHERE professor_id = ?', (professor_id,))
+            return cursor.rowcount > 0
+
+# student_summaries maintenance shared by MongoScoreRepository, replay and
+# the --rebuild-summaries command
+
+def build_student_summary(student_id, latest, latest_dates):
+    """student_summaries document for one student from their latest score per subject"""
+    average = average_latest_score(latest)
+    return {
+        "student_id": student_id,
+        "latest": latest,
+        "latest_dates": latest_dates,
+        "average": average,
+        "grade": get_grade(average) if latest else None,
+        "updated_at": datetime.now()
+    }
+
+def update_student_summaries(summaries_collection, new_scores):
+    """Fold newly inserted score documents into the students' summaries (idempotent).
+    
+    new_scores maps student_id -> score documents; the summaries are read in
+    one query and written in one bulk write however many students there are.
+    """
+    from pymongo import ReplaceOne
+    
+    summaries = summaries_collection.find({"student_id": {"$in": list(new_scores)}})
+    summaries = {summary["student_id"]: summary for summary in summaries}
+    
+    operations = []
+    for student_id, student_scores in new_scores.items():
+        summary = summaries.get(student_id, {})
+        latest = dict(summary.get("latest", {}))
+        latest_dates = dict(summary.get("latest_dates", {}))
+        
+        for score_data in student_scores:
+            subject = score_data["subject"]
+            if subject not in latest_dates or score_data["date_recorded"] >= latest_dates[subject]:
+                latest[subject] = score_data["score"]
+                latest_dates[subject] = score_data["date_recorded"]
+        
+        operations.append(ReplaceOne(
+            {"student_id": student_id},
+            build_student_summary(student_id, latest, latest_dates),
+            upsert=True
+        ))
+    
+    if operations:
+        summaries_collection.bulk_write(operations, ordered=False)
+
+def rebuild_student_summaries(scores_collection, summaries_collection, batch_size=1000):
+    """Regenerate every student_summaries document from the raw scores.
+    
+    Needed after scores were loaded in bulk without going through
+    save_scores. Returns the number of summaries written.
+    """
+    from pymongo import ReplaceOne
+    
+    pipeline = [
+        {"$sort": {"student_id": 1, "subject": 1, "date_recorded": -1}},
+        {"$group": {
+            "_id": {"student_id": "$student_id", "subject": "$subject"},
+            "latest_score": {"$first": "$score"},
+            "latest_date": {"$first": "$date_recorded"}
+        }},
+        {"$group": {
+            "_id": "$_id.student_id",
+            "subjects": {"$push": {
+                "subject": "$_id.subject",
+                "score": "$latest_score",
+                "date": "$latest_date"
+            }}
+        }}
+    ]
+    
+    written = []
+    operations = []
+    for result in scores_collection.aggregate(pipeline, allowDiskUse=True):
+        student_id = result["_id"]
+        latest = {item["subject"]: item["score"] for item in result["subjects"]}
+        latest_dates = {item["subject"]: item["date"] for item in result["subjects"]}
+        operations.append(ReplaceOne(
+            {"student_id": student_id},
+            build_student_summary(student_id, latest, latest_dates),
+            upsert=True
+        ))
+        written.append(student_id)
+        if len(operations) >= batch_size:
+            summaries_collection.bulk_write(operations, ordered=False)
+            operations = []
+    
+    if operations:
+        summaries_collection.bulk_write(operations, ordered=False)
+    
+    # Students whose scores are all gone keep no summary
+    summaries_collection.delete_many({"student_id": {"$nin": written}})
+    return len(written)
+
+def prepare_student_database(db):
+    """Create the student database's indexes and any missing summaries.
+    
+    Safe to run on every connection; errors are left to the caller.
+    """
+    db['students'].create_index("student_id", unique=True)
+    # Also serves the latest-score-per-subject sort when summaries are rebuilt
+    db['scores'].create_index([("student_id", 1), ("subject", 1), ("date_recorded", -1)])
+    db['student_summaries'].create_index("student_id", unique=True)
+    
+    # Databases written before summaries existed get them built once
+    if (db['student_summaries'].estimated_document_count() == 0
+            and db['scores'].estimated_document_count() > 0):
+        rebuild_student_summaries(db['scores'], db['student_summaries'])
+
+def prepare_professor_database(db, batch_size=1000):
+    """Create the professor collection's indexes and fill in missing search fields.
+    
+    The compound indexes serve the department and position filters together
+    with each Sort by order. Safe to run on every connection; errors are left
+    to the caller.
+    """
+    from pymongo import UpdateOne
+    
+    professors = db['professors']
+    professors.create_index("professor_id", unique=True)
+    professors.create_index([("department", 1), ("position", 1), ("name", 1), ("professor_id", 1)])
+    professors.create_index([("position", 1), ("name", 1), ("professor_id", 1)])
+    professors.create_index([("name", 1), ("professor_id", 1)])
+    
+    # Documents written before the search fields existed get them once
+    requests = []
+    for professor in professors.find({"name_key": {"$exists": False}}, {"_id": 1, "name": 1}):
+        name = professor.get("name", "")
+        requests.append(UpdateOne({"_id": professor["_id"]}, {"$set": {
+            "name_key": normalize(name), "name_initials": initial_consonants(name)
+        }}))
+        if len(requests) >= batch_size:
+            professors.bulk_write(requests, ordered=False)
+            requests = []
+    if requests:
+        professors.bulk_write(requests, ordered=False)
@@ -0,0 +1,151 @@
+import bisect
+from collections import defaultdict
+
+# Grade scales and score statistics for the reports of both score apps.
+#
+# NumPy is optional: when it is installed, statistics are computed for all
+# groups at once in a few vectorized passes; otherwise the same numbers come
+# from plain Python. It is only imported on first use, so it is never on the
+# apps' startup path.
+
+# Percentiles reported besides the median, interpolated linearly like numpy's default
+PERCENTILES = (25, 75, 90)
+
+class GradeScale:
+    """Letter grades from a table of (minimum score, grade), highest first.
+    
+    Scores below the lowest minimum get fail_grade.
+    """
+    
+    def __init__(self, cutoffs, fail_grade="F"):
+        cutoffs = sorted(cutoffs)
+        self.bounds = [minimum for minimum, _ in cutoffs]
+        # Lowest grade first: labels[i] covers bounds[i - 1] <= score < bounds[i]
+        self.labels = [fail_grade] + [grade for _, grade in cutoffs]
+    
+    def grade(self, score):
+        return self.labels[bisect.bisect_right(self.bounds, score)]
+    
+    def grades(self, scores):
+        """Grades for a whole array of scores (needs NumPy)"""
+        import numpy as np
+        
+        return np.asarray(self.labels)[np.searchsorted(self.bounds, scores, side="right")]
+
+# The student score app's scale, also stored in MongoDB student summaries
+LETTER_GRADES = GradeScale([(95, "A+"), (90, "A"), (85, "B+"), (80, "B"), (75, "C+"),
+                            (70, "C"), (65, "D+"), (60, "D")])
+# The SQLite app's scale
+SIMPLE_GRADES = GradeScale([(90, "A"), (80, "B"), (70, "C"), (60, "D")])
+
+def group_statistics(keys, scores, scale=LETTER_GRADES):
+    """Score statistics per group, for parallel sequences of group keys and scores.
+    
+    Returns {key: {"count", "mean", "median", "std", "min", "max",
+    "percentiles": {p: value}, "grades": {grade: count}}} in key order, with
+    the grades best first. std is the population standard deviation.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        return _python_group_statistics(keys, scores, scale)
+    return _numpy_group_statistics(np, keys, scores, scale)
+
+def describe(scores, scale=LETTER_GRADES):
+    """group_statistics for a single group, or None if there are no scores"""
+    scores = list(scores)
+    if not scores:
+        return None
+    return group_statistics([""] * len(scores), scores, scale)[""]
+
+def _numpy_group_statistics(np, keys, scores, scale):
+    values = np.asarray(scores, dtype=float)
+    if values.size == 0:
+        return {}
+    # Group numbers by first appearance; cheaper than sorting the keys as strings
+    codes = {}
+    group = np.fromiter((codes.setdefault(str(key), len(codes)) for key in keys),
+                        dtype=np.intp, count=values.size)
+    group_count = len(codes)
+    
+    counts = np.bincount(group, minlength=group_count)
+    means = np.bincount(group, weights=values, minlength=group_count) / counts
+    stds = np.sqrt(np.bincount(group, weights=(values - means[group]) ** 2, minlength=group_count) / counts)
+    
+    # Sorted by group, then score: each group is one ascending run
+    ordered = values[np.lexsort((values, group))]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    ends = starts + counts - 1
+    
+    def percentile(p):
+        position = starts + (counts - 1) * (p / 100)
+        low = np.floor(position).astype(int)
+        high = np.minimum(low + 1, ends)
+        return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+    
+    grade_count = len(scale.labels)
+    grade_index = np.searchsorted(scale.bounds, values, side="right")
+    histograms = np.bincount(group * grade_count + grade_index,
+                             minlength=group_count * grade_count).reshape(group_count, grade_count)
+    
+    columns = {
+        "count": counts.tolist(),
+        "mean": means.tolist(),
+        "median": percentile(50).tolist(),
+        "std": stds.tolist(),
+        "min": ordered[starts].tolist(),
+        "max": ordered[ends].tolist(),
+    }
+    percentiles = {p: percentile(p).tolist() for p in PERCENTILES}
+    histograms = histograms.tolist()
+    
+    statistics = {}
+    for name, i in sorted(codes.items()):
+        entry = {column: column_values[i] for column, column_values in columns.items()}
+        entry["percentiles"] = {p: column_values[i] for p, column_values in percentiles.items()}
+        entry["grades"] = dict(zip(reversed(scale.labels), reversed(histograms[i])))
+        statistics[name] = entry
+    return statistics
+
+def _python_group_statistics(keys, scores, scale):
+    groups = defaultdict(list)
+    for key, score in zip(keys, scores):
+        groups[str(key)].append(float(score))
+    
+    statistics = {}
+    for name in sorted(groups):
+        values = sorted(groups[name])
+        count = len(values)
+        mean = sum(values) / count
+        
+        def percentile(p):
+            position = (count - 1) * (p / 100)
+            low = int(position)
+            high = min(low + 1, count - 1)
+            return values[low] + (values[high] - values[low]) * (position - low)
+        
+        histogram = dict.fromkeys(reversed(scale.labels), 0)
+        for value in values:
+            histogram[scale.grade(value)] += 1
+        
+        statistics[name] = {
+            "count": count,
+            "mean": mean,
+            "median": percentile(50),
+            "std": (sum((value - mean) ** 2 for value in values) / count) ** 0.5,
+            "min": values[0],
+            "max": values[-1],
+            "percentiles": {p: percentile(p) for p in PERCENTILES},
+            "grades": histogram,
+        }
+    return statistics
+
+def format_distribution(statistics):
+    """One line of median, spread and percentiles for a report"""
+    percentiles = "/".join(f"{value:.1f}" for value in statistics["percentiles"].values())
+    return (f"median {statistics['median']:.1f}, std dev {statistics['std']:.1f}, "
+            f"P{'/P'.join(str(p) for p in statistics['percentiles'])} {percentiles}")
+
+def format_grade_histogram(statistics):
+    """"A+ 3, A 5, ..." for the grades that occur, best first"""
+    return ", ".join(f"{grade} {count}" for grade, count in statistics["grades"].items() if count)
@@ -0,0 +1,497 @@
+import csv
+import heapq
+import os
+import time
+from datetime import datetime
+
+from csv_validation import data_start, split_ranges, read_range, check_ranges, format_throughput
+from repositories import average_latest_score
+from score_analytics import LETTER_GRADES, group_statistics, format_distribution, format_grade_histogram
+from write_behind import score_id_sequence
+
+# Student and score operations without any GUI, shared by the desktop apps
+# and the scores command line tool. Reports are built as plain dicts (ready
+# for JSON) and turned into the apps' text layout by the format_* functions.
+
+# Subjects of the MongoDB/local app and of the SQLite app
+DEFAULT_SUBJECTS = ["Introduction to Computers", "IoT Emb", "Capston Design"]
+SQLITE_SUBJECTS = ["Mathematics", "Science", "English", "History", "Programming", "Physics", "Chemistry"]
+
+# Rows written to the backend per add_scores/add_many call during imports
+IMPORT_BATCH_SIZE = 5000
+
+# Columns of import files, by header name or in this order
+STUDENT_COLUMNS = ["student_id", "name", "class", "major"]
+SCORE_COLUMNS = ["student_id", "subject", "score", "date_recorded"]
+
+def parse_score(text):
+    """A score between 0 and 100 from text; raises ValueError otherwise"""
+    score = float(text)
+    if not 0 <= score <= 100:
+        raise ValueError("score must be between 0-100")
+    return score
+
+def parse_date(text, default):
+    """A datetime from "YYYY-MM-DD" or ISO 8601 text, or default if empty"""
+    text = text.strip()
+    if not text:
+        return default
+    return datetime.fromisoformat(text)
+
+def csv_delimiter(path):
+    """Tab for .tsv/.tab files, comma otherwise"""
+    return "\t" if path.lower().endswith((".tsv", ".tab")) else ","
+
+def read_csv_rows(file, columns, delimiter=","):
+    """Yield (line number, {column: value}) for each data row of a CSV file.
+    
+    A header naming at least the first column picks the columns by name, in
+    any order; otherwise every row is read positionally. Rows are read one
+    at a time, so files of any size can be streamed.
+    """
+    reader = csv.reader(file, delimiter=delimiter)
+    positions = list(range(len(columns)))
+    for row in reader:
+        if not row or not any(cell.strip() for cell in row):
+            continue
+        header = [cell.strip().lower() for cell in row]
+        if columns[0] in header:
+            positions = [header.index(column) if column in header else None for column in columns]
+        else:
+            yield reader.line_num, _row_values(row, columns, positions)
+        break
+    
+    for row in reader:
+        if row and any(cell.strip() for cell in row):
+            yield reader.line_num, _row_values(row, columns, positions)
+
+def _row_values(row, columns, positions):
+    return {
+        column: row[position].strip() if position is not None and position < len(row) else ""
+        for column, position in zip(columns, positions)
+    }
+
+def csv_layout(path, columns, delimiter=","):
+    """(rows and lines before the data, column positions) of a file as read_csv_rows reads it"""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f, delimiter=delimiter)
+        for skipped, row in enumerate(reader, start=1):
+            if not row or not any(cell.strip() for cell in row):
+                continue
+            header = [cell.strip().lower() for cell in row]
+            if columns[0] in header:
+                return skipped, reader.line_num, [header.index(column) if column in header else None
+                                                  for column in columns]
+            break
+    return 0, 0, list(range(len(columns)))
+
+def check_student(values):
+    """Why a student row cannot be imported, or None"""
+    if not all(values[column] for column in STUDENT_COLUMNS):
+        return "all of student_id, name, class and major are required"
+    return None
+
+def parse_score_row(values, known_students, subjects, recorded_at):
+    """(score, date recorded) of a score row; raises ValueError with the reason it cannot be imported"""
+    if values["student_id"] not in known_students:
+        raise ValueError("unknown student")
+    if values["subject"] not in subjects:
+        raise ValueError("unknown subject")
+    return parse_score(values["score"]), parse_date(values.get("date_recorded", ""), recorded_at)
+
+def check_import_range(path, start, end, positions, delimiter, known_students, subjects):
+    """Rejected rows in bytes [start, end) of a student or score file (runs in worker processes).
+    
+    known_students is None for a file of students. Returns the lines and
+    non-empty rows read and [(line, reason, values)], counting lines from 1.
+    """
+    columns = STUDENT_COLUMNS if known_students is None else SCORE_COLUMNS
+    reader = read_range(path, start, end, delimiter)
+    rows = 0
+    rejected = []
+    for row in reader:
+        if not row or not any(cell.strip() for cell in row):
+            continue
+        rows += 1
+        values = _row_values(row, columns, positions)
+        if known_students is None:
+            reason = check_student(values)
+        else:
+            try:
+                parse_score_row(values, known_students, subjects, None)
+                reason = None
+            except ValueError as e:
+                reason = str(e)
+        if reason is not None:
+            rejected.append((reader.line_num, reason, values))
+    return reader.line_num, rows, rejected
+
+class ImportResult:
+    """Counts and rejected rows of a bulk import"""
+    
+    def __init__(self):
+        self.imported = 0
+        self.rejected = []
+    
+    def reject(self, line, reason, values):
+        self.rejected.append((line, reason, values))
+    
+    def to_dict(self, max_errors=100):
+        return {
+            "imported": self.imported,
+            "rejected": len(self.rejected),
+            "errors": [{"line": line, "error": reason, "row": values}
+                       for line, reason, values in self.rejected[:max_errors]],
+        }
+
+def write_rejects(file, result, columns):
+    """Write an import's rejected rows with their line number and error as CSV"""
+    writer = csv.writer(file)
+    writer.writerow(["line", "error"] + columns)
+    for line, reason, values in result.rejected:
+        writer.writerow([line, reason] + [values.get(column, "") for column in columns])
+
+def individual_report(student_id, student_data, latest, subjects, scale=LETTER_GRADES):
+    """One student's latest score and grade per subject plus their average"""
+    scores = []
+    for subject in subjects:
+        score = latest.get(subject)
+        scores.append({"subject": subject, "score": score,
+                       "grade": scale.grade(score) if score is not None else None})
+    
+    recorded = [entry["score"] for entry in scores if entry["score"] is not None]
+    average = sum(recorded) / len(recorded) if recorded else None
+    return {
+        "student_id": student_id,
+        "name": student_data["name"],
+        "class": student_data["class"],
+        "major": student_data["major"],
+        "scores": scores,
+        "average": average,
+        "grade": scale.grade(average) if average is not None else None,
+    }
+
+def _student_averages(students, latest):
+    """[(student_id, average)] for the students that have scores"""
+    averages = []
+    for student_id in students:
+        avg = average_latest_score(latest.get(student_id))
+        if avg > 0:
+            averages.append((student_id, avg))
+    return averages
+
+def _subject_statistics(latest, subjects, scale):
+    """group_statistics of every subject's latest scores, in one pass"""
+    keys = []
+    scores = []
+    for student_latest in latest.values():
+        for subject, score in student_latest.items():
+            keys.append(subject)
+            scores.append(score)
+    statistics = group_statistics(keys, scores, scale)
+    return {subject: statistics.get(subject) for subject in subjects}
+
+def class_report(students, latest, scale=LETTER_GRADES):
+    """Every student's average by class, classes in name order"""
+    averages = dict(_student_averages(students, latest))
+    class_statistics = group_statistics([students[student_id]["class"] for student_id in averages],
+                                        list(averages.values()), scale)
+    
+    classes = {}
+    for student_id, data in students.items():
+        classes.setdefault(data["class"], []).append((student_id, data))
+    
+    report = []
+    for class_name, members in sorted(classes.items()):
+        entries = []
+        for student_id, data in members:
+            avg = averages.get(student_id)
+            entries.append({"student_id": student_id, "name": data["name"], "average": avg,
+                            "grade": scale.grade(avg) if avg is not None else None})
+        statistics = class_statistics.get(class_name)
+        report.append({"class": class_name, "students": entries,
+                       "average": statistics["mean"] if statistics else None,
+                       "statistics": statistics})
+    return {"classes": report}
+
+def subject_report(students, latest, subjects, top=5, scale=LETTER_GRADES):
+    """Latest-score statistics and the top performers of each subject"""
+    subject_statistics = _subject_statistics(latest, subjects, scale)
+    report = []
+    for subject in subjects:
+        statistics = subject_statistics[subject]
+        entry = {"subject": subject, "count": 0, "average": None,
+                 "highest": None, "lowest": None, "statistics": statistics, "top": []}
+        if statistics:
+            scored = []
+            for student_id, data in students.items():
+                score = latest.get(student_id, {}).get(subject)
+                if score is not None:
+                    scored.append((data["name"], student_id, score))
+            entry.update(
+                count=statistics["count"],
+                average=statistics["mean"],
+                highest=statistics["max"],
+                lowest=statistics["min"],
+                top=[{"name": name, "student_id": student_id, "score": score, "grade": scale.grade(score)}
+                     for name, student_id, score in heapq.nlargest(top, scored, key=lambda x: x[2])],
+            )
+        report.append(entry)
+    return {"subjects": report}
+
+def statistics_report(students, totals, subjects, latest, scale=LETTER_GRADES):
+    """Statistics from ScoreRepository.statistics() totals and the latest scores"""
+    classes, majors, subject_averages, system_avg, students_with_scores = totals
+    averages = _student_averages(students, latest)
+    subject_statistics = _subject_statistics(latest, subjects, scale)
+    return {
+        "total_students": len(students),
+        "classes": dict(sorted(classes.items())),
+        "majors": dict(sorted(majors.items())),
+        "subjects": {subject: {"average": avg if count else None, "count": count,
+                               "statistics": subject_statistics[subject]}
+                     for subject, (avg, count) in ((s, subject_averages[s]) for s in subjects)},
+        "class_averages": group_statistics([students[student_id]["class"] for student_id, _ in averages],
+                                           [avg for _, avg in averages], scale),
+        "major_averages": group_statistics([students[student_id]["major"] for student_id, _ in averages],
+                                           [avg for _, avg in averages], scale),
+        "system_average": system_avg if students_with_scores else None,
+        "students_with_scores": students_with_scores,
+    }
+
+def export_rows(students, latest, subjects):
+    """The score export as rows, header first, generated one student at a time"""
+    yield ["Student ID", "Name", "Class", "Major"] + list(subjects) + ["Average"]
+    for student_id, data in students.items():
+        student_latest = latest.get(student_id, {})
+        avg = average_latest_score(student_latest)
+        yield ([student_id, data["name"], data["class"], data["major"]]
+               + [student_latest.get(subject, "") for subject in subjects]
+               + [f"{avg:.1f}" if avg > 0 else ""])
+
+def format_individual_report(report):
+    text = "INDIVIDUAL STUDENT REPORT\n"
+    text += "=" * 50 + "\n\n"
+    text += f"Student ID: {report['student_id']}\n"
+    text += f"Name: {report['name']}\n"
+    text += f"Class: {report['class']}\n"
+    text += f"Major: {report['major']}\n\n"
+    
+    text += "SUBJECT SCORES:\n"
+    text += "-" * 30 + "\n"
+    for entry in report["scores"]:
+        if entry["score"] is not None:
+            text += f"{entry['subject']:<15}: {entry['score']:>6.1f} ({entry['grade']})\n"
+        else:
+            text += f"{entry['subject']:<15}: {'No Score':>10}\n"
+    
+    if report["average"] is not None:
+        text += "-" * 30 + "\n"
+        text += f"{'Overall Average':<15}: {report['average']:>6.1f} ({report['grade']})\n"
+    return text
+
+def format_class_report(report):
+    text = "CLASS REPORT\n"
+    text += "=" * 50 + "\n\n"
+    for entry in report["classes"]:
+        text += f"CLASS: {entry['class']}\n"
+        text += "-" * 30 + "\n"
+        for student in entry["students"]:
+            if student["average"] is not None:
+                text += (f"{student['name']:<20} (ID: {student['student_id']}): "
+                         f"{student['average']:>6.1f} ({student['grade']})\n")
+            else:
+                text += f"{student['name']:<20} (ID: {student['student_id']}): {'No Score':>10}\n"
+        
+        if entry["average"] is not None:
+            text += f"\nClass Average: {entry['average']:.1f}\n"
+            text += f"Distribution: {format_distribution(entry['statistics'])}\n"
+            text += f"Grades: {format_grade_histogram(entry['statistics'])}\n"
+        text += "\n"
+    return text
+
+def format_subject_report(report):
+    text = "SUBJECT ANALYSIS REPORT\n"
+    text += "=" * 50 + "\n\n"
+    for entry in report["subjects"]:
+        text += f"SUBJECT: {entry['subject']}\n"
+        text += "-" * 30 + "\n"
+        if entry["count"]:
+            text += f"Students with scores: {entry['count']}\n"
+            text += f"Average Score: {entry['average']:.1f}\n"
+            text += f"Highest Score: {entry['highest']:.1f}\n"
+            text += f"Lowest Score: {entry['lowest']:.1f}\n"
+            text += f"Distribution: {format_distribution(entry['statistics'])}\n"
+            text += f"Grades: {format_grade_histogram(entry['statistics'])}\n\n"
+            
+            text += "Top performers:\n"
+            for i, student in enumerate(entry["top"]):
+                text += (f"  {i+1}. {student['name']} (ID: {student['student_id']}): "
+                         f"{student['score']:.1f} ({student['grade']})\n")
+        else:
+            text += "No scores recorded for this subject\n"
+        text += "\n"
+    return text
+
+def format_statistics(report):
+    text = "SYSTEM STATISTICS\n"
+    text += "=" * 40 + "\n\n"
+    text += f"Total Students: {report['total_students']}\n\n"
+    
+    text += "CLASS DISTRIBUTION:\n"
+    for class_name, count in report["classes"].items():
+        text += f"  {class_name}: {count} students\n"
+    
+    text += "\nMAJOR DISTRIBUTION:\n"
+    for major, count in report["majors"].items():
+        text += f"  {major}: {count} students\n"
+    
+    text += "\nSUBJECT AVERAGES:\n"
+    for subject, entry in report["subjects"].items():
+        if entry["count"]:
+            text += f"  {subject:<15}: {entry['average']:>6.1f} ({entry['count']} students)\n"
+        else:
+            text += f"  {subject:<15}: {'No Data':>10}\n"
+    
+    for title, groups in (("CLASS AVERAGES", report["class_averages"]),
+                          ("MAJOR AVERAGES", report["major_averages"])):
+        if groups:
+            text += f"\n{title}:\n"
+            for name, statistics in groups.items():
+                text += f"  {name}: {statistics['mean']:.1f} ({format_distribution(statistics)})\n"
+    
+    if report["students_with_scores"]:
+        text += f"\nSYSTEM AVERAGE: {report['system_average']:.1f}\n"
+        text += f"Students with scores: {report['students_with_scores']}\n"
+    return text
+
+class ScoreService:
+    """Student and score operations on a pair of repositories.
+    
+    Works the same on every backend in repositories.py; bulk operations take
+    any iterable and write it in batches, so input never has to fit in memory.
+    Grades come from scale (a score_analytics.GradeScale): LETTER_GRADES for
+    the MongoDB/local app's data, SIMPLE_GRADES for the SQLite app's.
+    """
+    
+    def __init__(self, students, scores, subjects=DEFAULT_SUBJECTS, scale=LETTER_GRADES):
+        self.students = students
+        self.scores = scores
+        self.subjects = list(subjects)
+        self.scale = scale
+    
+    def add_student(self, student_id, name, class_name, major):
+        """Returns False if the ID is already taken"""
+        return self.students.add(student_id, name, class_name, major)
+    
+    def add_students(self, rows, batch_size=IMPORT_BATCH_SIZE, on_batch=None):
+        """Add or replace students from (line, {"student_id", "name", "class", "major"}) rows"""
+        result = ImportResult()
+        batch = []
+        for line, values in rows:
+            reason = check_student(values)
+            if reason is not None:
+                result.reject(line, reason, values)
+                continue
+            student = (values["student_id"], values["name"], values["class"], values["major"])
+            batch.append(student)
+            if len(batch) >= batch_size:
+                self.students.add_many(batch)
+                result.imported += len(batch)
+                batch = []
+                if on_batch is not None:
+                    on_batch(result)
+        
+        if batch:
+            self.students.add_many(batch)
+            result.imported += len(batch)
+        return result
+    
+    def import_scores(self, rows, batch_size=IMPORT_BATCH_SIZE, recorded_at=None, on_batch=None):
+        """Record scores from (line, {"student_id", "subject", "score", "date_recorded"}) rows.
+        
+        Rows for unknown students or subjects and invalid scores or dates are
+        rejected, the rest loaded through ScoreRepository.load_scores. Rows
+        without a date get recorded_at (default: now). on_batch(result) is
+        called as each batch is handed over and may raise to abort the import.
+        """
+        result = ImportResult()
+        self.scores.load_scores(self._score_batches(rows, batch_size, recorded_at or datetime.now(),
+                                                    result, on_batch))
+        return result
+    
+    def _score_batches(self, rows, batch_size, recorded_at, result, on_batch):
+        known_students = set(self.students.all())
+        subjects = set(self.subjects)
+        score_ids = score_id_sequence()
+        
+        batch = []
+        for line, values in rows:
+            try:
+                score, date_recorded = parse_score_row(values, known_students, subjects, recorded_at)
+            except ValueError as e:
+                result.reject(line, str(e), values)
+                continue
+            
+            batch.append((next(score_ids), values["student_id"], values["subject"], score, date_recorded))
+            if len(batch) >= batch_size:
+                result.imported += len(batch)
+                if on_batch is not None:
+                    on_batch(result)
+                yield batch
+                batch = []
+        
+        if batch:
+            result.imported += len(batch)
+            if on_batch is not None:
+                on_batch(result)
+            yield batch
+    
+    def validate_file(self, path, students=False, workers=None, on_progress=None):
+        """Check a students or scores file as add_students/import_scores would, importing nothing.
+        
+        Large files are checked on several processes (see csv_validation.py).
+        Returns an ImportResult, with the rows that would be imported counted
+        as imported, and a line on how fast the file was checked.
+        """
+        started = time.perf_counter()
+        columns = STUDENT_COLUMNS if students else SCORE_COLUMNS
+        delimiter = csv_delimiter(path)
+        skipped, line, positions = csv_layout(path, columns, delimiter)
+        known_students = None if students else frozenset(self.students.all())
+        ranges = split_ranges(path, data_start(path, skipped))
+        
+        result = ImportResult()
+        rows = 0
+        for lines, count, rejected in check_ranges(
+                check_import_range, path, ranges,
+                (positions, delimiter, known_students, frozenset(self.subjects)),
+                workers=workers, on_progress=on_progress):
+            for index, reason, values in rejected:
+                result.reject(line + index, reason, values)
+            result.imported += count - len(rejected)
+            rows += count
+            line += lines
+        return result, format_throughput(rows, os.path.getsize(path), time.perf_counter() - started)
+    
+    def individual_report(self, student_id):
+        """None if there is no such student"""
+        student_data = self.students.get(student_id)
+        if student_data is None:
+            return None
+        latest = self.scores.latest_scores([student_id]).get(student_id, {})
+        return individual_report(student_id, student_data, latest, self.subjects, self.scale)
+    
+    def class_report(self):
+        return class_report(self.students.all(), self.scores.latest_scores(), self.scale)
+    
+    def subject_report(self, top=5):
+        return subject_report(self.students.all(), self.scores.latest_scores(), self.subjects, top, self.scale)
+    
+    def statistics(self):
+        students = self.students.all()
+        return statistics_report(students, self.scores.statistics(students, self.subjects), self.subjects,
+                                 self.scores.latest_scores(), self.scale)
+    
+    def export_rows(self):
+        return export_rows(self.students.all(), self.scores.latest_scores(), self.subjects)
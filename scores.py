@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""Command line tool for bulk student score operations, without the GUI.
+    
+    python scores.py [--backend mongo|sqlite|local] import scores.csv
+    python scores.py import --students students.csv
+    python scores.py import --dry-run registrar_dump.csv
+    python scores.py export --output scores_export.csv
+    python scores.py report class --format text
+    python scores.py stats
+
+Results are printed as JSON (reports and stats can also be printed as the
+apps' text), so the tool can be driven from scripts, e.g. to load the end
+of term's scores in one batch.
+"""
+import argparse
+import contextlib
+import csv
+import json
+import sys
+
+from mongo_monitor import DEFAULT_MONGODB_URI, DEFAULT_TIMEOUTS_MS
+from score_analytics import SIMPLE_GRADES
+from score_service import (ScoreService, DEFAULT_SUBJECTS, SQLITE_SUBJECTS, IMPORT_BATCH_SIZE, STUDENT_COLUMNS,
+                           SCORE_COLUMNS, read_csv_rows, csv_delimiter, write_rejects, format_individual_report,
+                           format_class_report, format_subject_report, format_statistics)
+
+BACKENDS = ("mongo", "sqlite", "local")
+
+def open_backend(args):
+    """(ScoreService, close) for the backend chosen on the command line"""
+    if args.backend == "mongo":
+        from pymongo import MongoClient
+        from repositories import MongoStudentRepository, MongoScoreRepository, prepare_student_database
+        
+        client = MongoClient(args.mongodb_uri, **{
+            "serverSelectionTimeoutMS": args.server_selection_timeout_ms,
+            "connectTimeoutMS": args.connect_timeout_ms,
+            "socketTimeoutMS": args.socket_timeout_ms,
+        })
+        try:
+            db = client['student_management_db']
+            prepare_student_database(db)
+        except Exception:
+            client.close()
+            raise
+        service = ScoreService(MongoStudentRepository(db), MongoScoreRepository(db), DEFAULT_SUBJECTS)
+        return service, client.close
+    
+    if args.backend == "sqlite":
+        from sqlite_manager import SQLiteConnectionManager
+        from repositories import SqliteStudentRepository, SqliteScoreRepository
+        from student_schema import run_migrations
+        
+        db = SQLiteConnectionManager(args.sqlite_path)
+        run_migrations(db)
+        # Graded like the SQLite app grades the same database
+        service = ScoreService(SqliteStudentRepository(db), SqliteScoreRepository(db), SQLITE_SUBJECTS,
+                               SIMPLE_GRADES)
+        return service, db.close
+    
+    # The app's local store; changes are queued for MongoDB like the app's own.
+    # Do not run this while the app is open, as both would write the journal.
+    from local_score_store import LocalScoreStore
+    from local_journal import LocalJournal
+    from write_behind import WriteBehindQueue
+    from repositories import MemoryStudentRepository, MemoryScoreRepository
+    
+    store = LocalScoreStore()
+    journal = LocalJournal("student_scores_local")
+    store.load_journal(journal)
+    write_behind = WriteBehindQueue("student_scores_pending")
+    write_behind.load()
+    service = ScoreService(MemoryStudentRepository(store, write_behind),
+                           MemoryScoreRepository(store, write_behind), DEFAULT_SUBJECTS)
+    return service, lambda: (write_behind.close(), journal.close())
+
+def print_json(data, file=None):
+    print(json.dumps(data, ensure_ascii=False, indent=2), file=file or sys.stdout)
+
+def open_input(path):
+    if path == "-":
+        # Left open for the rest of the process
+        return contextlib.nullcontext(sys.stdin)
+    return open(path, newline='', encoding='utf-8-sig')
+
+def open_output(path, bom=False):
+    """bom marks the file as UTF-8 for Excel; only CSV files want it, as JSON parsers reject it"""
+    if path == "-":
+        return contextlib.nullcontext(sys.stdout)
+    return open(path, 'w', newline='', encoding='utf-8-sig' if bom else 'utf-8')
+
+def command_import(service, args):
+    columns = STUDENT_COLUMNS if args.students else SCORE_COLUMNS
+    throughput = None
+    if args.dry_run:
+        if args.file == "-":
+            print_json({"error": "--dry-run needs a file rather than standard input"}, sys.stderr)
+            return 2
+        result, throughput = service.validate_file(args.file, students=args.students, workers=args.workers)
+    else:
+        with open_input(args.file) as f:
+            rows = read_csv_rows(f, columns, csv_delimiter(args.file))
+            if args.students:
+                result = service.add_students(rows, batch_size=args.batch_size)
+            else:
+                result = service.import_scores(rows, batch_size=args.batch_size)
+    
+    if args.rejects and result.rejected:
+        with open_output(args.rejects, bom=True) as f:
+            write_rejects(f, result, columns)
+    
+    output = result.to_dict()
+    if throughput is not None:
+        # Nothing was written: "imported" counts the rows that would be
+        output.update(dry_run=True, checked=throughput)
+    print_json(output)
+    return 1 if result.rejected else 0
+
+def command_export(service, args):
+    rows = service.export_rows()
+    with open_output(args.output, bom=args.format == "csv") as f:
+        if args.format == "csv":
+            csv.writer(f).writerows(rows)
+        else:
+            header = next(rows)
+            for row in rows:
+                # Subjects without a score are blank in CSV and null in JSON
+                record = {key: None if value == "" else value for key, value in zip(header, row)}
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return 0
+
+def command_report(service, args):
+    if args.kind == "individual":
+        if not args.student_id:
+            print_json({"error": "--student-id is required for an individual report"}, sys.stderr)
+            return 2
+        report = service.individual_report(args.student_id)
+        if report is None:
+            print_json({"error": "Student not found", "student_id": args.student_id}, sys.stderr)
+            return 1
+        formatter = format_individual_report
+    elif args.kind == "class":
+        report = service.class_report()
+        formatter = format_class_report
+    else:
+        report = service.subject_report(top=args.top)
+        formatter = format_subject_report
+    
+    if args.format == "text":
+        print(formatter(report), end="")
+    else:
+        print_json(report)
+    return 0
+
+def command_stats(service, args):
+    report = service.statistics()
+    if args.format == "text":
+        print(format_statistics(report), end="")
+    else:
+        print_json(report)
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="scores", description="Bulk student score operations")
+    parser.add_argument("--backend", choices=BACKENDS, default="mongo",
+                        help="where the data lives: MongoDB (default), the SQLite app's database, "
+                             "or the MongoDB app's local store")
+    parser.add_argument("--sqlite-path", default="student_scores.db",
+                        help="SQLite database file for --backend sqlite")
+    parser.add_argument("--mongodb-uri", default=DEFAULT_MONGODB_URI,
+                        help="MongoDB connection string")
+    parser.add_argument("--server-selection-timeout-ms", type=int,
+                        default=DEFAULT_TIMEOUTS_MS["serverSelectionTimeoutMS"],
+                        help="how long to wait for a usable MongoDB server")
+    parser.add_argument("--connect-timeout-ms", type=int,
+                        default=DEFAULT_TIMEOUTS_MS["connectTimeoutMS"],
+                        help="MongoDB socket connect timeout")
+    parser.add_argument("--socket-timeout-ms", type=int,
+                        default=DEFAULT_TIMEOUTS_MS["socketTimeoutMS"],
+                        help="MongoDB socket read/write timeout")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    import_parser = commands.add_parser(
+        "import", help="import scores (or students) from a CSV file",
+        description="Columns are student_id, subject, score[, date_recorded] for scores and "
+                    "student_id, name, class, major for students, by header name or in that order."
+    )
+    import_parser.add_argument("file", help="CSV file (TSV if named .tsv), or - for standard input")
+    import_parser.add_argument("--students", action="store_true",
+                               help="the file holds students (added or replaced) rather than scores")
+    import_parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE,
+                               help="rows written per batch")
+    import_parser.add_argument("--rejects", metavar="FILE",
+                               help="also write every rejected row with its error to this CSV file")
+    import_parser.add_argument("--dry-run", action="store_true",
+                               help="only check the file, on several processes if it is large, "
+                                    "and report what would be imported and how fast it was checked")
+    import_parser.add_argument("--workers", type=int,
+                               help="processes for --dry-run (default: one per CPU)")
+    import_parser.set_defaults(run=command_import)
+    
+    export_parser = commands.add_parser("export", help="export every student's latest scores")
+    export_parser.add_argument("--output", default="-", help="output file (default: standard output)")
+    export_parser.add_argument("--format", choices=("csv", "jsonl"), default="csv")
+    export_parser.set_defaults(run=command_export)
+    
+    report_parser = commands.add_parser("report", help="print an individual, class or subject report")
+    report_parser.add_argument("kind", choices=("individual", "class", "subject"))
+    report_parser.add_argument("--student-id", help="student for the individual report")
+    report_parser.add_argument("--top", type=int, default=5, help="top performers per subject")
+    report_parser.add_argument("--format", choices=("json", "text"), default="json")
+    report_parser.set_defaults(run=command_report)
+    
+    stats_parser = commands.add_parser("stats", help="print the system statistics")
+    stats_parser.add_argument("--format", choices=("json", "text"), default="json")
+    stats_parser.set_defaults(run=command_stats)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        service, close = open_backend(args)
+    except Exception as e:
+        print_json({"error": f"Cannot open the {args.backend} backend: {e}"}, sys.stderr)
+        return 3
+    try:
+        return args.run(service, args)
+    finally:
+        close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+class SQLiteConnectionManager:
+    """Owns the SQLite connections for one database file.
+    
+    The database is opened in WAL mode so readers never wait behind a writer.
+    All writes go through a single write connection guarded by a lock, and
+    every thread that reads gets its own read-only connection.
+    """
+    
+    def __init__(self, db_path, synchronous="NORMAL", cache_size=-65536,
+                 mmap_size=268435456, temp_store="MEMORY", busy_timeout=5000):
+        self.db_path = db_path
+        
+        # Negative cache_size is in KiB (-65536 = 64 MiB per connection)
+        self.pragmas = {
+            "synchronous": synchronous,
+            "cache_size": cache_size,
+            "mmap_size": mmap_size,
+            "temp_store": temp_store,
+            "busy_timeout": busy_timeout,
+        }
+        
+        self._write_conn = None
+        self._write_lock = threading.RLock()
+        self._local = threading.local()
+        self._readers = []
+        self._readers_lock = threading.Lock()
+        
+        # data_version: its own connection and lock, so it never waits on a writer
+        self._version_conn = None
+        self._version_lock = threading.Lock()
+        self._seen_version = None
+        self._foreign_commits = 0
+    
+    def _connect(self):
+        """Open a connection with the configured pragmas applied"""
+        conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+    
+    @property
+    def writer(self):
+        """The shared write connection (autocommit; use transaction() for writes)"""
+        with self._write_lock:
+            if self._write_conn is None:
+                conn = self._connect()
+                # journal_mode is persistent, so setting it once on the writer is enough
+                conn.execute("PRAGMA journal_mode = WAL")
+                self._write_conn = conn
+            return self._write_conn
+    
+    def reader(self):
+        """Return this thread's read-only connection, opening it on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Make sure the file exists and is in WAL mode before reading
+            self.writer
+            conn = self._connect()
+            conn.execute("PRAGMA query_only = ON")
+            self._local.conn = conn
+            with self._readers_lock:
+                self._readers.append(conn)
+        return conn
+    
+    def read_cursor(self):
+        """Return a fresh cursor on this thread's read connection"""
+        return self.reader().cursor()
+    
+    @contextmanager
+    def transaction(self):
+        """Run a block of writes atomically on the write connection"""
+        with self._write_lock:
+            cursor = self.writer.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                # Nobody else can commit until ours is done, so a change seen
+                # here is another process's and the one seen after is ours
+                self._check_version()
+                yield cursor
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+            else:
+                cursor.execute("COMMIT")
+                self._check_version(own_commit=True)
+            finally:
+                cursor.close()
+    
+    @property
+    def data_version(self):
+        """A number that changes when another process commits to the file, or it is reopened.
+        
+        Writes made through this manager do not change it. Never waits for a
+        write in progress.
+        """
+        return self._check_version()
+    
+    def _check_version(self, own_commit=False):
+        """Count the commits of other connections seen by PRAGMA data_version since the last check"""
+        with self._version_lock:
+            if self._version_conn is None:
+                if self._write_conn is None:
+                    # Make sure the file exists and is in WAL mode before reading
+                    self.writer
+                self._version_conn = self._connect()
+                self._version_conn.execute("PRAGMA query_only = ON")
+            version = self._version_conn.execute("PRAGMA data_version").fetchone()[0]
+            if self._seen_version is not None and version != self._seen_version and not own_commit:
+                self._foreign_commits += 1
+            self._seen_version = version
+            return self._foreign_commits
+    
+    def backup(self, target_path):
+        """Copy a consistent snapshot (including un-checkpointed WAL pages) to a file"""
+        with self._write_lock:
+            target = sqlite3.connect(target_path)
+            try:
+                self.writer.backup(target)
+            finally:
+                target.close()
+    
+    def close(self):
+        """Close every connection; the next access reopens them"""
+        with self._readers_lock:
+            for conn in self._readers:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._readers = []
+        self._local = threading.local()
+        
+        with self._write_lock:
+            if self._write_conn is not None:
+                self._write_conn.close()
+                self._write_conn = None
+        
+        with self._version_lock:
+            if self._version_conn is not None:
+                self._version_conn.close()
+                self._version_conn = None
+            self._seen_version = None
+            # The file may have been replaced (e.g. by a restore)
+            self._foreign_commits += 1
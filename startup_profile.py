@@ -0,0 +1,96 @@
+import builtins
+import sys
+import threading
+import time
+
+# Time from launch to the first drawn window that the desktop apps aim for
+STARTUP_BUDGET_MS = 500
+
+class StartupProfiler:
+    """Times imports and startup phases for the --profile-startup flag.
+    
+    Once installed, every module imported for the first time on the main
+    thread is timed, and report() prints the imports in the same format as
+    `python -X importtime` followed by the phases marked with mark() and a
+    comparison against the startup budget. Imports that happen later, e.g.
+    pymongo on the connection thread, are off the startup path and not shown.
+    """
+    
+    def __init__(self, budget_ms=STARTUP_BUDGET_MS):
+        self.budget_ms = budget_ms
+        self.started = time.perf_counter()
+        self.imports = []
+        self.phases = []
+        self._stack = []
+        self._original_import = None
+        self._main_thread = threading.main_thread()
+    
+    @classmethod
+    def from_argv(cls, argv):
+        """An installed profiler if argv asks for one, otherwise None"""
+        if "--profile-startup" not in argv:
+            return None
+        profiler = cls()
+        profiler.install()
+        return profiler
+    
+    def install(self):
+        if self._original_import is None:
+            self._original_import = builtins.__import__
+            builtins.__import__ = self._import
+    
+    def uninstall(self):
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+    
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        original = self._original_import
+        if (level or name in sys.modules or original is None
+                or threading.current_thread() is not self._main_thread):
+            return original(name, globals, locals, fromlist, level)
+        
+        # [time spent in nested imports], as -X importtime separates self time
+        children = [0.0]
+        self._stack.append(children)
+        start = time.perf_counter()
+        try:
+            return original(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            self._stack.pop()
+            if self._stack:
+                self._stack[-1][0] += elapsed
+            self.imports.append((name, elapsed - children[0], elapsed, len(self._stack)))
+    
+    def mark(self, phase):
+        """Record that a startup phase has finished"""
+        self.phases.append((phase, time.perf_counter()))
+    
+    def elapsed_ms(self):
+        end = self.phases[-1][1] if self.phases else time.perf_counter()
+        return (end - self.started) * 1000
+    
+    def report(self, file=None):
+        """Print import times, phase times and the budget check (to stderr by default)"""
+        file = file or sys.stderr
+        print("import time: self [us] | cumulative | imported package", file=file)
+        for name, self_time, cumulative, depth in self.imports:
+            print(f"import time: {self_time * 1e6:9.0f} | {cumulative * 1e6:10.0f} | "
+                  f"{'  ' * depth}{name}", file=file)
+        
+        print(file=file)
+        previous = self.started
+        for phase, at in self.phases:
+            print(f"startup: {(at - previous) * 1000:8.1f} ms  {phase}", file=file)
+            previous = at
+        
+        total = self.elapsed_ms()
+        verdict = "within" if total <= self.budget_ms else "OVER"
+        print(f"startup: {total:8.1f} ms  total ({verdict} the {self.budget_ms} ms budget)", file=file)
+    
+    def finish(self, phase="first frame"):
+        """Mark the last phase, stop timing imports and print the report"""
+        self.mark(phase)
+        self.uninstall()
+        self.report()
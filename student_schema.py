@@ -0,0 +1,143 @@
+# The SQLite schema shared by the student score database app and the
+# scores command line tool; neither needs the other to create or upgrade it.
+
+# Ordered schema migrations: (version, description, statements).
+# Every statement is idempotent so databases created before schema_version
+# existed can be upgraded in place from version 0.
+SCHEMA_MIGRATIONS = [
+    (1, "Create students and scores tables", [
+        '''
+        CREATE TABLE IF NOT EXISTS students (
+            student_id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            class_name TEXT NOT NULL,
+            major TEXT NOT NULL,
+            created_date TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS scores (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id TEXT,
+            subject TEXT NOT NULL,
+            score REAL NOT NULL,
+            date_recorded TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (student_id) REFERENCES students (student_id)
+        )
+        ''',
+    ]),
+    # One row per (student, subject) holding the most recent score.
+    # The triggers update it in the same transaction as every write to scores.
+    (2, "Add latest_scores table and maintenance triggers", [
+        '''
+        CREATE TABLE IF NOT EXISTS latest_scores (
+            student_id TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            score REAL NOT NULL,
+            date_recorded TEXT NOT NULL,
+            PRIMARY KEY (student_id, subject)
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS scores_latest_insert
+        AFTER INSERT ON scores
+        BEGIN
+            INSERT INTO latest_scores (student_id, subject, score, date_recorded)
+            VALUES (NEW.student_id, NEW.subject, NEW.score, NEW.date_recorded)
+            ON CONFLICT (student_id, subject) DO UPDATE SET
+                score = excluded.score,
+                date_recorded = excluded.date_recorded
+            WHERE excluded.date_recorded >= latest_scores.date_recorded;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS scores_latest_delete
+        AFTER DELETE ON scores
+        BEGIN
+            DELETE FROM latest_scores
+            WHERE student_id = OLD.student_id AND subject = OLD.subject;
+            INSERT INTO latest_scores (student_id, subject, score, date_recorded)
+            SELECT student_id, subject, score, date_recorded
+            FROM scores
+            WHERE student_id = OLD.student_id AND subject = OLD.subject
+            ORDER BY date_recorded DESC, id DESC
+            LIMIT 1;
+        END
+        ''',
+        # Backfill score history recorded before latest_scores existed
+        '''
+        INSERT OR IGNORE INTO latest_scores (student_id, subject, score, date_recorded)
+        SELECT student_id, subject, score, date_recorded
+        FROM (
+            SELECT student_id, subject, score, date_recorded,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY student_id, subject
+                       ORDER BY date_recorded DESC, id DESC
+                   ) AS rn
+            FROM scores
+        )
+        WHERE rn = 1
+        ''',
+    ]),
+    (3, "Add covering indexes for score lookups and reports", [
+        '''
+        CREATE INDEX IF NOT EXISTS idx_scores_student_subject_date
+        ON scores (student_id, subject, date_recorded DESC, score)
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_scores_subject_score
+        ON scores (subject, score)
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_latest_scores_subject_score
+        ON latest_scores (subject, score DESC)
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_students_class_name
+        ON students (class_name, name)
+        ''',
+    ]),
+]
+
+def _read_schema_version(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_date TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version')
+    return cursor.fetchone()[0]
+
+def get_schema_version(db):
+    """Return the highest applied schema migration (0 for a new database)"""
+    with db.transaction() as cursor:
+        return _read_schema_version(cursor)
+
+def run_migrations(db):
+    """Apply pending schema migrations in order, one transaction each.
+    
+    Returns the (version, description) of each migration applied.
+    """
+    current_version = get_schema_version(db)
+    applied = []
+    
+    for version, description, statements in SCHEMA_MIGRATIONS:
+        if version <= current_version:
+            continue
+        
+        with db.transaction() as cursor:
+            # Another process may have applied it since the version was read
+            if _read_schema_version(cursor) >= version:
+                continue
+            for statement in statements:
+                cursor.execute(statement)
+            cursor.execute('''
+                INSERT INTO schema_version (version, description)
+                VALUES (?, ?)
+            ''', (version, description))
+        
+        applied.append((version, description))
+    
+    return applied
@@ -4,6 +4,56 @@ import sqlite3
 import csv
 from datetime import datetime
 import os
+import bisect
+from collections import Counter
+
+from sqlite_manager import SQLiteConnectionManager
+from report_cache import ChangeBus, ReportCache
+from query_executor import QueryExecutor
+from virtual_tree import VirtualTreeview, QueryDataSource
+from repositories import SqliteStudentRepository, SqliteScoreRepository
+import student_schema
+from score_analytics import SIMPLE_GRADES, group_statistics, format_distribution, format_grade_histogram
+from score_service import (ScoreService, SQLITE_SUBJECTS, STUDENT_COLUMNS, SCORE_COLUMNS, read_csv_rows,
+                           csv_delimiter, write_rejects)
+
+# Queries run on every list refresh or report, checked with EXPLAIN QUERY PLAN
+# at startup so a missing index shows up as a full table scan in the log.
+HOT_QUERIES = {
+    "Student list page": ('''
+        SELECT s.student_id, s.name, s.class_name, s.major,
+               COALESCE(AVG(sc.score), 0) as avg_score
+        FROM students s
+        LEFT JOIN latest_scores sc ON s.student_id = sc.student_id
+        GROUP BY s.student_id, s.name, s.class_name, s.major
+        ORDER BY s.student_id
+        LIMIT ? OFFSET ?
+    ''', (200, 0)),
+    "Score history page": ('''
+        SELECT id, date_recorded, subject, score
+        FROM scores
+        WHERE student_id = ?
+        ORDER BY date_recorded DESC, id DESC
+        LIMIT ? OFFSET ?
+    ''', ("", 200, 0)),
+    "Individual report": ('''
+        SELECT subject, score, date_recorded
+        FROM latest_scores
+        WHERE student_id = ?
+        ORDER BY subject
+    ''', ("",)),
+    "Subject report": ('''
+        SELECT s.name, s.student_id, l.score
+        FROM latest_scores l
+        JOIN students s ON s.student_id = l.student_id
+        WHERE l.subject = ?
+        ORDER BY l.score DESC
+        LIMIT ?
+    ''', ("", 5)),
+}
+
+# What the class, subject and statistics reports are built from
+ALL_STUDENT_DATA = (("students", None), ("scores", None))
 
 class StudentScoreDBSystem:
     def __init__(self, root):
@@ -12,47 +62,70 @@ class StudentScoreDBSystem:
         self.root.geometry("1000x700")
         
         self.db_path = "student_scores.db"
-        self.subjects = ["Mathematics", "Science", "English", "History", "Programming", "Physics", "Chemistry"]
+        self.subjects = list(SQLITE_SUBJECTS)
+        
+        self.applied_migrations = []
+        
+        # Report and statistics texts, dropped as the writes they depend on
+        # are published; writes by other processes drop them all
+        self.changes = ChangeBus()
+        self.report_cache = ReportCache()
+        self.changes.subscribe(self.report_cache.invalidate)
+        self.seen_data_version = None
+        
+        # Score combobox entries, kept sorted by student ID so single students
+        # can be added, renamed or removed without reloading the list
+        self.student_choice_ids = []
+        self.student_choices = []
+        
+        # Background query execution; jobs are keyed by the tab they report to
+        self.executor = QueryExecutor(self.root)
+        self.jobs = {}
+        self.job_widgets = {}
         
         self.init_database()
         self.create_widgets()
         self.update_student_list()
         
+        for version, description in self.applied_migrations:
+            self.log_database_operation(f"Applied schema migration {version}: {description}")
+        self.check_query_plans()
+        
     def init_database(self):
-        """Initialize SQLite database and create tables"""
+        """Initialize SQLite database and bring the schema up to date"""
         try:
-            self.conn = sqlite3.connect(self.db_path)
-            self.cursor = self.conn.cursor()
-            
-            # Create students table
-            self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS students (
-                    student_id TEXT PRIMARY KEY,
-                    name TEXT NOT NULL,
-                    class_name TEXT NOT NULL,
-                    major TEXT NOT NULL,
-                    created_date TEXT DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # Create scores table
-            self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS scores (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    student_id TEXT,
-                    subject TEXT NOT NULL,
-                    score REAL NOT NULL,
-                    date_recorded TEXT DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (student_id) REFERENCES students (student_id)
-                )
-            ''')
+            self.db = SQLiteConnectionManager(self.db_path)
             
-            self.conn.commit()
+            self.applied_migrations = self.run_migrations()
+            self.student_repository = SqliteStudentRepository(self.db)
+            self.score_repository = SqliteScoreRepository(self.db)
             messagebox.showinfo("Database", "Database initialized successfully")
             
         except sqlite3.Error as e:
             messagebox.showerror("Database Error", f"Failed to initialize database: {e}")
     
+    def run_migrations(self):
+        """Apply pending schema migrations in order, one transaction each"""
+        return student_schema.run_migrations(self.db)
+    
+    def check_query_plans(self):
+        """Log EXPLAIN QUERY PLAN output for the hot queries"""
+        try:
+            cursor = self.db.read_cursor()
+            
+            for name, (query, params) in HOT_QUERIES.items():
+                cursor.execute(f'EXPLAIN QUERY PLAN {query}', params)
+                details = [row[-1] for row in cursor.fetchall()]
+                
+                # A SCAN that does not go through an index is a full table scan
+                full_scans = [d for d in details if d.startswith("SCAN") and "USING" not in d]
+                status = "FULL SCAN" if full_scans else "OK"
+                
+                self.log_database_operation(f"Query plan [{status}] {name}: " + "; ".join(details))
+                
+        except sqlite3.Error as e:
+            self.log_database_operation(f"Query plan check failed: {e}")
+    
     def create_widgets(self):
         # Main notebook for tabs
         self.notebook = ttk.Notebook(self.root)
@@ -128,6 +201,9 @@ class StudentScoreDBSystem:
         self.student_tree.pack(side="left", fill="both", expand=True)
         scrollbar_student.pack(side="right", fill="y")
         
+        # Only the visible rows exist as Treeview items; pages come from SQLite
+        self.student_view = VirtualTreeview(self.student_tree, scrollbar_student)
+        
         self.student_tree.bind("<ButtonRelease-1>", self.on_student_select)
         
     def create_score_tab(self):
@@ -183,6 +259,8 @@ class StudentScoreDBSystem:
         self.score_tree.pack(side="left", fill="both", expand=True)
         scrollbar_score.pack(side="right", fill="y")
         
+        self.score_view = VirtualTreeview(self.score_tree, scrollbar_score)
+        
     def create_reports_tab(self):
         reports_frame = ttk.Frame(self.notebook)
         self.notebook.add(reports_frame, text="Reports")
@@ -196,6 +274,8 @@ class StudentScoreDBSystem:
         ttk.Button(gen_frame, text="Subject Analysis", command=self.generate_subject_report).pack(side="left", padx=5)
         ttk.Button(gen_frame, text="Export to CSV", command=self.export_to_csv).pack(side="left", padx=5)
         
+        self.create_job_status(reports_frame, "reports").pack(fill="x", padx=10)
+        
         # Report display
         display_frame = ttk.LabelFrame(reports_frame, text="Report", padding="10")
         display_frame.pack(fill="both", expand=True, padx=10, pady=5)
@@ -222,6 +302,8 @@ class StudentScoreDBSystem:
         # Refresh button
         ttk.Button(stats_frame, text="Refresh Statistics", 
                   command=self.update_statistics).pack(pady=10)
+        
+        self.create_job_status(stats_frame, "statistics").pack(pady=(0, 10))
     
     def create_db_tab(self):
         db_frame = ttk.Frame(self.notebook)
@@ -242,6 +324,14 @@ class StudentScoreDBSystem:
         ttk.Button(ops_frame, text="Restore Database", command=self.restore_database).pack(side="left", padx=5)
         ttk.Button(ops_frame, text="Clear All Data", command=self.clear_all_data).pack(side="left", padx=5)
         ttk.Button(ops_frame, text="Check Database", command=self.check_database).pack(side="left", padx=5)
+        ttk.Button(ops_frame, text="Query Plans", command=self.check_query_plans).pack(side="left", padx=5)
+        ttk.Button(ops_frame, text="Import Students", command=lambda: self.import_csv(students=True)).pack(side="left", padx=5)
+        ttk.Button(ops_frame, text="Import Scores", command=self.import_csv).pack(side="left", padx=5)
+        # Imports then only check the file and report what they would do
+        self.import_dry_run = tk.BooleanVar(value=False)
+        ttk.Checkbutton(ops_frame, text="Dry run", variable=self.import_dry_run).pack(side="left", padx=5)
+        
+        self.create_job_status(db_frame, "database").pack(fill="x", padx=10)
         
         # Database log
         log_frame = ttk.LabelFrame(db_frame, text="Database Log", padding="10")
@@ -265,19 +355,17 @@ class StudentScoreDBSystem:
             return
         
         try:
-            self.cursor.execute('''
-                INSERT INTO students (student_id, name, class_name, major)
-                VALUES (?, ?, ?, ?)
-            ''', (student_id, name, class_name, major))
+            if not self.student_repository.add(student_id, name, class_name, major):
+                messagebox.showerror("Error", "Student ID already exists")
+                return
             
-            self.conn.commit()
-            self.update_student_list()
+            self.changes.publish("students", student_id)
+            self.student_view.invalidate(self.student_position(student_id))
+            self.set_student_choice(student_id, name)
             self.clear_student_fields()
             self.log_database_operation(f"Added student: {student_id} - {name}")
             messagebox.showinfo("Success", "Student added successfully")
             
-        except sqlite3.IntegrityError:
-            messagebox.showerror("Error", "Student ID already exists")
         except sqlite3.Error as e:
             messagebox.showerror("Database Error", f"Failed to add student: {e}")
     
@@ -292,18 +380,13 @@ class StudentScoreDBSystem:
             return
         
         try:
-            self.cursor.execute('''
-                UPDATE students 
-                SET name = ?, class_name = ?, major = ?
-                WHERE student_id = ?
-            ''', (name, class_name, major, student_id))
-            
-            if self.cursor.rowcount == 0:
+            if not self.student_repository.update(student_id, name, class_name, major):
                 messagebox.showerror("Error", "Student ID not found")
                 return
             
-            self.conn.commit()
-            self.update_student_list()
+            self.changes.publish("students", student_id)
+            self.refresh_student_row(student_id)
+            self.set_student_choice(student_id, name)
             self.clear_student_fields()
             self.log_database_operation(f"Updated student: {student_id} - {name}")
             messagebox.showinfo("Success", "Student updated successfully")
@@ -322,17 +405,15 @@ class StudentScoreDBSystem:
                                    f"Are you sure you want to delete student {student_id} and all their scores?")
         if result:
             try:
-                # Delete scores first
-                self.cursor.execute('DELETE FROM scores WHERE student_id = ?', (student_id,))
-                # Delete student
-                self.cursor.execute('DELETE FROM students WHERE student_id = ?', (student_id,))
-                
-                if self.cursor.rowcount == 0:
+                # Deletes the student's scores as well
+                if not self.student_repository.delete(student_id):
                     messagebox.showerror("Error", "Student ID not found")
                     return
                 
-                self.conn.commit()
-                self.update_student_list()
+                self.changes.publish("students", student_id)
+                self.changes.publish("scores", student_id)
+                self.student_view.invalidate(self.student_position(student_id))
+                self.remove_student_choice(student_id)
                 self.clear_student_fields()
                 self.log_database_operation(f"Deleted student: {student_id}")
                 messagebox.showinfo("Success", "Student deleted successfully")
@@ -341,33 +422,83 @@ class StudentScoreDBSystem:
                 messagebox.showerror("Database Error", f"Failed to delete student: {e}")
     
     def update_student_list(self):
-        for item in self.student_tree.get_children():
-            self.student_tree.delete(item)
+        try:
+            # Rows are paged in as the list scrolls
+            self.student_view.set_source(QueryDataSource(
+                self.db.reader,
+                'SELECT COUNT(*) FROM students',
+                '''
+                    SELECT s.student_id, s.name, s.class_name, s.major,
+                           COALESCE(AVG(sc.score), 0) as avg_score
+                    FROM students s
+                    LEFT JOIN latest_scores sc ON s.student_id = sc.student_id
+                    GROUP BY s.student_id, s.name, s.class_name, s.major
+                    ORDER BY s.student_id
+                    LIMIT ? OFFSET ?
+                ''',
+                formatter=lambda row: (row[0], row[1], row[2], row[3], f"{row[4]:.1f}")
+            ), keep_position=True)
+            
+            # Update combobox
+            cursor = self.db.read_cursor()
+            cursor.execute('''
+                SELECT student_id, name
+                FROM students
+                ORDER BY student_id
+            ''')
+            students = cursor.fetchall()
+            self.student_choice_ids = [student_id for student_id, _ in students]
+            self.student_choices = [f"{student_id} - {name}" for student_id, name in students]
+            self.score_student_combo['values'] = self.student_choices
+            
+        except sqlite3.Error as e:
+            messagebox.showerror("Database Error", f"Failed to load students: {e}")
+    
+    def student_position(self, student_id):
+        """Row index of student_id in the student list (ordered by student ID)"""
+        cursor = self.db.read_cursor()
+        cursor.execute('SELECT COUNT(*) FROM students WHERE student_id < ?', (student_id,))
+        return cursor.fetchone()[0]
+    
+    def refresh_student_row(self, student_id):
+        """Reload one student's row (name, class, major and average) in place"""
+        if not self.student_view.has_row(student_id):
+            # Not loaded yet; it will be read fresh when scrolled into view
+            return
         
         try:
-            self.cursor.execute('''
+            cursor = self.db.read_cursor()
+            cursor.execute('''
                 SELECT s.student_id, s.name, s.class_name, s.major,
                        COALESCE(AVG(sc.score), 0) as avg_score
                 FROM students s
-                LEFT JOIN scores sc ON s.student_id = sc.student_id
+                LEFT JOIN latest_scores sc ON s.student_id = sc.student_id
+                WHERE s.student_id = ?
                 GROUP BY s.student_id, s.name, s.class_name, s.major
-                ORDER BY s.student_id
-            ''')
-            
-            students = self.cursor.fetchall()
-            
-            for student in students:
-                student_id, name, class_name, major, avg_score = student
-                self.student_tree.insert("", "end", values=(
-                    student_id, name, class_name, major, f"{avg_score:.1f}"
-                ))
-            
-            # Update combobox
-            student_list = [f"{student[0]} - {student[1]}" for student in students]
-            self.score_student_combo['values'] = student_list
+            ''', (student_id,))
+            row = cursor.fetchone()
+            if row:
+                self.student_view.update_row(student_id, (row[0], row[1], row[2], row[3], f"{row[4]:.1f}"))
             
         except sqlite3.Error as e:
-            messagebox.showerror("Database Error", f"Failed to load students: {e}")
+            messagebox.showerror("Database Error", f"Failed to load student: {e}")
+    
+    def set_student_choice(self, student_id, name):
+        """Add or rename one entry of the score combobox"""
+        index = bisect.bisect_left(self.student_choice_ids, student_id)
+        if index < len(self.student_choice_ids) and self.student_choice_ids[index] == student_id:
+            self.student_choices[index] = f"{student_id} - {name}"
+        else:
+            self.student_choice_ids.insert(index, student_id)
+            self.student_choices.insert(index, f"{student_id} - {name}")
+        self.score_student_combo['values'] = self.student_choices
+    
+    def remove_student_choice(self, student_id):
+        index = bisect.bisect_left(self.student_choice_ids, student_id)
+        if index < len(self.student_choice_ids) and self.student_choice_ids[index] == student_id:
+            del self.student_choice_ids[index]
+            del self.student_choices[index]
+            self.score_student_combo['values'] = self.student_choices
     
     def on_student_select(self, event):
         selection = self.student_tree.selection()
@@ -397,7 +528,7 @@ class StudentScoreDBSystem:
             return
         
         student_id = selected.split(" - ")[0]
-        date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        date = datetime.now()
         
         try:
             scores_to_save = []
@@ -407,7 +538,8 @@ class StudentScoreDBSystem:
                     try:
                         score = float(score_text)
                         if 0 <= score <= 100:
-                            scores_to_save.append((student_id, subject, score, date))
+                            # No client-side score id; SQLite numbers the rows
+                            scores_to_save.append((None, student_id, subject, score, date))
                         else:
                             messagebox.showerror("Error", f"Score for {subject} must be between 0-100")
                             return
@@ -419,14 +551,12 @@ class StudentScoreDBSystem:
                 messagebox.showwarning("Warning", "No scores to save")
                 return
             
-            # Save all scores
-            self.cursor.executemany('''
-                INSERT INTO scores (student_id, subject, score, date_recorded)
-                VALUES (?, ?, ?, ?)
-            ''', scores_to_save)
+            # Save all scores in one transaction
+            self.score_repository.add_scores(scores_to_save)
+            self.changes.publish("scores", student_id)
             
-            self.conn.commit()
-            self.update_student_list()
+            # Only this student's average changed
+            self.refresh_student_row(student_id)
             self.update_score_history()
             self.clear_score_fields()
             self.log_database_operation(f"Saved {len(scores_to_save)} scores for student: {student_id}")
@@ -436,48 +566,40 @@ class StudentScoreDBSystem:
             messagebox.showerror("Database Error", f"Failed to save scores: {e}")
     
     def update_score_history(self):
-        for item in self.score_tree.get_children():
-            self.score_tree.delete(item)
-        
         selected = self.score_student_var.get()
         if not selected:
+            self.score_view.clear()
             return
         
         student_id = selected.split(" - ")[0]
         
+        def format_score(row):
+            score_id, date_recorded, subject, score = row
+            grade = self.get_grade(score)
+            # Format date to show only date part
+            date_display = date_recorded.split()[0] if ' ' in date_recorded else date_recorded
+            return (date_display, subject, f"{score:.1f}", grade)
+        
         try:
-            self.cursor.execute('''
-                SELECT date_recorded, subject, score
-                FROM scores
-                WHERE student_id = ?
-                ORDER BY date_recorded DESC
-            ''', (student_id,))
-            
-            scores = self.cursor.fetchall()
-            
-            for score_data in scores:
-                date_recorded, subject, score = score_data
-                grade = self.get_grade(score)
-                # Format date to show only date part
-                date_display = date_recorded.split()[0] if ' ' in date_recorded else date_recorded
-                self.score_tree.insert("", "end", values=(
-                    date_display, subject, f"{score:.1f}", grade
-                ))
+            self.score_view.set_source(QueryDataSource(
+                self.db.reader,
+                'SELECT COUNT(*) FROM scores WHERE student_id = ?',
+                '''
+                    SELECT id, date_recorded, subject, score
+                    FROM scores
+                    WHERE student_id = ?
+                    ORDER BY date_recorded DESC, id DESC
+                    LIMIT ? OFFSET ?
+                ''',
+                params=(student_id,),
+                formatter=format_score
+            ))
                 
         except sqlite3.Error as e:
             messagebox.showerror("Database Error", f"Failed to load score history: {e}")
     
     def get_grade(self, score):
-        if score >= 90:
-            return "A"
-        elif score >= 80:
-            return "B"
-        elif score >= 70:
-            return "C"
-        elif score >= 60:
-            return "D"
-        else:
-            return "F"
+        return SIMPLE_GRADES.grade(score)
     
     def on_score_student_select(self, event):
         self.update_score_history()
@@ -493,322 +615,458 @@ class StudentScoreDBSystem:
             return
         
         student_id = selected.split(" - ")[0]
-        
-        try:
-            # Get student info
-            self.cursor.execute('''
-                SELECT name, class_name, major
-                FROM students
-                WHERE student_id = ?
-            ''', (student_id,))
-            
-            student_info = self.cursor.fetchone()
-            if not student_info:
-                messagebox.showerror("Error", "Student not found")
-                return
-            
-            name, class_name, major = student_info
-            
-            # Get latest scores for each subject
-            self.cursor.execute('''
-                SELECT subject, score, date_recorded
-                FROM scores s1
-                WHERE student_id = ? AND date_recorded = (
-                    SELECT MAX(date_recorded)
-                    FROM scores s2
-                    WHERE s2.student_id = s1.student_id AND s2.subject = s1.subject
-                )
-                ORDER BY subject
-            ''', (student_id,))
-            
-            scores = self.cursor.fetchall()
-            
-            report = f"INDIVIDUAL STUDENT REPORT\n"
-            report += "=" * 50 + "\n\n"
-            report += f"Student ID: {student_id}\n"
-            report += f"Name: {name}\n"
-            report += f"Class: {class_name}\n"
-            report += f"Major: {major}\n\n"
-            
-            report += "SUBJECT SCORES:\n"
+        self.start_job("reports", self.cached_report, ("individual", student_id),
+                       (("students", student_id), ("scores", student_id)),
+                       self.build_individual_report, student_id,
+                       on_success=self.show_report,
+                       error_message="Failed to generate report")
+    
+    def build_individual_report(self, job, student_id):
+        """Build the individual report text (runs on a worker thread)"""
+        cursor = self.job_cursor(job)
+        
+        # Get student info
+        cursor.execute('''
+            SELECT name, class_name, major
+            FROM students
+            WHERE student_id = ?
+        ''', (student_id,))
+        
+        student_info = cursor.fetchone()
+        if not student_info:
+            raise LookupError("Student not found")
+        
+        name, class_name, major = student_info
+        
+        # Get latest scores for each subject
+        cursor.execute('''
+            SELECT subject, score, date_recorded
+            FROM latest_scores
+            WHERE student_id = ?
+            ORDER BY subject
+        ''', (student_id,))
+        
+        scores = cursor.fetchall()
+        
+        report = "INDIVIDUAL STUDENT REPORT\n"
+        report += "=" * 50 + "\n\n"
+        report += f"Student ID: {student_id}\n"
+        report += f"Name: {name}\n"
+        report += f"Class: {class_name}\n"
+        report += f"Major: {major}\n\n"
+        
+        report += "SUBJECT SCORES:\n"
+        report += "-" * 30 + "\n"
+        
+        total_score = 0
+        subject_count = 0
+        
+        # Create a dict for easy lookup
+        score_dict = {subject: (score, date) for subject, score, date in scores}
+        
+        for subject in self.subjects:
+            if subject in score_dict:
+                score, date = score_dict[subject]
+                grade = self.get_grade(score)
+                report += f"{subject:<15}: {score:>6.1f} ({grade}) [{date.split()[0]}]\n"
+                total_score += score
+                subject_count += 1
+            else:
+                report += f"{subject:<15}: {'No Score':>10}\n"
+        
+        if subject_count > 0:
+            average = total_score / subject_count
+            overall_grade = self.get_grade(average)
             report += "-" * 30 + "\n"
-            
-            total_score = 0
-            subject_count = 0
-            
-            # Create a dict for easy lookup
-            score_dict = {subject: (score, date) for subject, score, date in scores}
-            
-            for subject in self.subjects:
-                if subject in score_dict:
-                    score, date = score_dict[subject]
-                    grade = self.get_grade(score)
-                    report += f"{subject:<15}: {score:>6.1f} ({grade}) [{date.split()[0]}]\n"
-                    total_score += score
-                    subject_count += 1
-                else:
-                    report += f"{subject:<15}: {'No Score':>10}\n"
-            
-            if subject_count > 0:
-                average = total_score / subject_count
-                overall_grade = self.get_grade(average)
-                report += "-" * 30 + "\n"
-                report += f"{'Overall Average':<15}: {average:>6.1f} ({overall_grade})\n"
-            
-            self.report_text.delete(1.0, tk.END)
-            self.report_text.insert(1.0, report)
-            
-        except sqlite3.Error as e:
-            messagebox.showerror("Database Error", f"Failed to generate report: {e}")
+            report += f"{'Overall Average':<15}: {average:>6.1f} ({overall_grade})\n"
+        
+        return report
     
     def generate_class_report(self):
-        try:
-            self.cursor.execute('''
-                SELECT s.student_id, s.name, s.class_name, s.major,
-                       COALESCE(AVG(sc.score), 0) as avg_score
-                FROM students s
-                LEFT JOIN scores sc ON s.student_id = sc.student_id
-                GROUP BY s.student_id, s.name, s.class_name, s.major
-                ORDER BY s.class_name, s.name
-            ''')
-            
-            students = self.cursor.fetchall()
+        self.start_job("reports", self.cached_report, ("class",), ALL_STUDENT_DATA,
+                       self.build_class_report,
+                       on_success=self.show_report,
+                       error_message="Failed to generate class report")
+    
+    def build_class_report(self, job):
+        """Build the class report text (runs on a worker thread)"""
+        cursor = self.job_cursor(job)
+        
+        cursor.execute('SELECT COUNT(*) FROM students')
+        total_students = cursor.fetchone()[0]
+        
+        if total_students == 0:
+            raise LookupError("No students available")
+        
+        # Rows arrive ordered by class, so each class is closed off as soon as
+        # the next one starts instead of holding every student in memory
+        cursor.execute('''
+            SELECT s.student_id, s.name, s.class_name, s.major,
+                   COALESCE(AVG(sc.score), 0) as avg_score
+            FROM students s
+            LEFT JOIN latest_scores sc ON s.student_id = sc.student_id
+            GROUP BY s.student_id, s.name, s.class_name, s.major
+            ORDER BY s.class_name, s.name
+        ''')
+        
+        lines = ["CLASS REPORT", "=" * 50, ""]
+        current_class = None
+        # Class footers are filled in once every class's statistics are known
+        class_names = []
+        keys = []
+        averages = []
+        
+        for processed, (student_id, name, class_name, major, avg_score) in enumerate(cursor, 1):
+            if class_name != current_class:
+                if current_class is not None:
+                    lines.append(None)
+                current_class = class_name
+                class_names.append(class_name)
+                lines.append(f"CLASS: {class_name}")
+                lines.append("-" * 30)
             
-            if not students:
-                messagebox.showerror("Error", "No students available")
-                return
+            if avg_score > 0:
+                grade = self.get_grade(avg_score)
+                lines.append(f"{name:<20} (ID: {student_id}): {avg_score:>6.1f} ({grade})")
+                keys.append(class_name)
+                averages.append(avg_score)
+            else:
+                lines.append(f"{name:<20} (ID: {student_id}): {'No Score':>10}")
             
-            # Group by class
-            classes = {}
-            for student in students:
-                student_id, name, class_name, major, avg_score = student
-                if class_name not in classes:
-                    classes[class_name] = []
-                classes[class_name].append((student_id, name, major, avg_score))
+            if processed % 500 == 0:
+                job.report_progress(processed, total_students, "Building class report")
+        lines.append(None)
+        
+        statistics = group_statistics(keys, averages, SIMPLE_GRADES)
+        footers = iter(class_names)
+        report = []
+        for line in lines:
+            if line is not None:
+                report.append(line)
+                continue
+            class_statistics = statistics.get(next(footers))
+            if class_statistics:
+                report.append("")
+                report.append(f"Class Average: {class_statistics['mean']:.1f}")
+                report.append(f"Distribution: {format_distribution(class_statistics)}")
+                report.append(f"Grades: {format_grade_histogram(class_statistics)}")
+            report.append("")
+        return "\n".join(report) + "\n"
+    
+    def generate_subject_report(self):
+        self.start_job("reports", self.cached_report, ("subject",), ALL_STUDENT_DATA,
+                       self.build_subject_report,
+                       on_success=self.show_report,
+                       error_message="Failed to generate subject report")
+    
+    def build_subject_report(self, job):
+        """Build the subject analysis text (runs on a worker thread)"""
+        cursor = self.job_cursor(job)
+        
+        # Every subject's latest scores in one pass
+        job.report_progress(0, len(self.subjects) + 1, "Analyzing scores")
+        cursor.execute('SELECT subject, score FROM latest_scores')
+        rows = cursor.fetchall()
+        statistics = group_statistics([row[0] for row in rows], [row[1] for row in rows], SIMPLE_GRADES)
+        
+        report = "SUBJECT ANALYSIS REPORT\n"
+        report += "=" * 50 + "\n\n"
+        
+        for index, subject in enumerate(self.subjects):
+            job.report_progress(index + 1, len(self.subjects) + 1, f"Analyzing {subject}")
             
-            report = "CLASS REPORT\n"
-            report += "=" * 50 + "\n\n"
+            report += f"SUBJECT: {subject}\n"
+            report += "-" * 30 + "\n"
             
-            for class_name, students_in_class in sorted(classes.items()):
-                report += f"CLASS: {class_name}\n"
-                report += "-" * 30 + "\n"
-                
-                total_avg = 0
-                student_count = 0
+            subject_statistics = statistics.get(subject)
+            if subject_statistics:
+                report += f"Students with scores: {subject_statistics['count']}\n"
+                report += f"Average Score: {subject_statistics['mean']:.1f}\n"
+                report += f"Highest Score: {subject_statistics['max']:.1f}\n"
+                report += f"Lowest Score: {subject_statistics['min']:.1f}\n"
+                report += f"Distribution: {format_distribution(subject_statistics)}\n"
+                report += f"Grades: {format_grade_histogram(subject_statistics)}\n\n"
                 
-                for student_id, name, major, avg_score in students_in_class:
-                    if avg_score > 0:
-                        grade = self.get_grade(avg_score)
-                        report += f"{name:<20} (ID: {student_id}): {avg_score:>6.1f} ({grade})\n"
-                        total_avg += avg_score
-                        student_count += 1
-                    else:
-                        report += f"{name:<20} (ID: {student_id}): {'No Score':>10}\n"
+                cursor.execute('''
+                    SELECT s.name, s.student_id, l.score
+                    FROM latest_scores l
+                    JOIN students s ON s.student_id = l.student_id
+                    WHERE l.subject = ?
+                    ORDER BY l.score DESC
+                    LIMIT ?
+                ''', (subject, 5))
                 
-                if student_count > 0:
-                    class_avg = total_avg / student_count
-                    report += f"\nClass Average: {class_avg:.1f}\n"
-                
-                report += "\n"
+                report += "Top performers:\n"
+                for i, (name, student_id, score) in enumerate(cursor.fetchall()):
+                    grade = self.get_grade(score)
+                    report += f"  {i+1}. {name} (ID: {student_id}): {score:.1f} ({grade})\n"
+            else:
+                report += "No scores recorded for this subject\n"
             
-            self.report_text.delete(1.0, tk.END)
-            self.report_text.insert(1.0, report)
+            report += "\n"
+        
+        return report
+    
+    def cached_report(self, job, key, depends, build, *args):
+        """build(job, *args) through the report cache (runs on a worker thread)"""
+        data_version = self.db.data_version
+        if data_version != self.seen_data_version:
+            # Another process (e.g. scores.py) wrote to the database
+            self.seen_data_version = data_version
+            self.changes.publish()
+        return self.report_cache.get_or_build(key, lambda: build(job, *args), depends)
+    
+    def show_report(self, report):
+        self.report_text.delete(1.0, tk.END)
+        self.report_text.insert(1.0, report)
+    
+    def update_statistics(self):
+        self.start_job("statistics", self.cached_report, ("statistics",), ALL_STUDENT_DATA,
+                       self.build_statistics,
+                       on_success=self.show_statistics,
+                       error_message="Failed to load statistics")
+    
+    def build_statistics(self, job):
+        """Build the statistics text (runs on a worker thread)"""
+        return self.format_statistics(self.collect_statistics(job))
+    
+    def collect_statistics(self, job):
+        """Every statistics figure from one scan of students and one of the latest scores.
+        
+        Averages are of each student's latest score per subject, as in every
+        other report and in scores.py stats.
+        """
+        cursor = self.job_cursor(job)
+        
+        job.report_progress(0, 2, "Reading students")
+        cursor.execute('SELECT student_id, class_name, major FROM students')
+        students = {student_id: (class_name, major) for student_id, class_name, major in cursor}
+        
+        job.report_progress(1, 2, "Reading scores")
+        cursor.execute('SELECT COUNT(*) FROM scores')
+        score_count = cursor.fetchone()[0]
+        
+        # Everything else is folded together from the latest scores
+        cursor.execute('''
+            SELECT student_id, subject, score
+            FROM latest_scores
+        ''')
+        subject_totals = {}
+        student_totals = {}
+        for student_id, subject, score in cursor:
+            subject_total = subject_totals.setdefault(subject, [0, 0.0])
+            subject_total[0] += 1
+            subject_total[1] += score
+            student_total = student_totals.setdefault(student_id, [0, 0.0])
+            student_total[0] += 1
+            student_total[1] += score
+        
+        # Students whose average is 0 count as having no scores, as in the reports
+        averages = {student_id: total / count for student_id, (count, total) in student_totals.items()
+                    if total > 0 and student_id in students}
+        return {
+            "student_count": len(students),
+            "score_count": score_count,
+            "classes": sorted(Counter(class_name for class_name, _ in students.values()).items()),
+            "majors": sorted(Counter(major for _, major in students.values()).items()),
+            # subject -> (average of its latest scores, students with a score)
+            "subjects": {subject: (total / count, count) for subject, (count, total) in subject_totals.items()},
+            "class_averages": group_statistics([students[student_id][0] for student_id in averages],
+                                               list(averages.values()), SIMPLE_GRADES),
+            "major_averages": group_statistics([students[student_id][1] for student_id in averages],
+                                               list(averages.values()), SIMPLE_GRADES),
+            "system_average": sum(averages.values()) / len(averages) if averages else None,
+        }
+    
+    def format_statistics(self, figures):
+        if figures["student_count"] == 0:
+            return "No student data available"
+        
+        stats = "SYSTEM STATISTICS\n"
+        stats += "=" * 40 + "\n\n"
+        
+        stats += f"Total Students: {figures['student_count']}\n"
+        stats += f"Total Score Records: {figures['score_count']}\n\n"
+        
+        stats += "CLASS DISTRIBUTION:\n"
+        for class_name, count in figures["classes"]:
+            stats += f"  {class_name}: {count} students\n"
+        
+        stats += "\nMAJOR DISTRIBUTION:\n"
+        for major, count in figures["majors"]:
+            stats += f"  {major}: {count} students\n"
+        
+        stats += "\nSUBJECT AVERAGES:\n"
+        for subject in self.subjects:
+            if subject in figures["subjects"]:
+                avg_score, student_count_subject = figures["subjects"][subject]
+                stats += f"  {subject:<15}: {avg_score:>6.1f} ({student_count_subject} students)\n"
+            else:
+                stats += f"  {subject:<15}: {'No Data':>10}\n"
+        
+        for title, key in (("CLASS AVERAGES", "class_averages"), ("MAJOR AVERAGES", "major_averages")):
+            if figures[key]:
+                stats += f"\n{title}:\n"
+                for name, group in figures[key].items():
+                    stats += f"  {name}: {group['mean']:.1f} ({format_distribution(group)})\n"
+        
+        if figures["system_average"] is not None:
+            stats += f"\nSYSTEM AVERAGE: {figures['system_average']:.1f}\n"
+        
+        return stats
+    
+    def show_statistics(self, stats):
+        self.stats_text.delete(1.0, tk.END)
+        self.stats_text.insert(1.0, stats)
+    
+    def export_to_csv(self):
+        filename = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
+        )
+        
+        if filename:
+            def exported(row_count):
+                messagebox.showinfo("Success", f"Data exported to {filename}")
+                self.log_database_operation(f"Exported {row_count} students to CSV: {filename}")
             
-        except sqlite3.Error as e:
-            messagebox.showerror("Database Error", f"Failed to generate class report: {e}")
+            self.start_job("reports", self.write_csv_export, filename,
+                           on_success=exported,
+                           error_message="Failed to export")
     
-    def generate_subject_report(self):
+    def write_csv_export(self, job, filename):
+        """Stream the latest-score pivot into a CSV file (runs on a worker thread)"""
+        cursor = self.job_cursor(job)
+        
+        cursor.execute('SELECT COUNT(*) FROM students')
+        total_students = cursor.fetchone()[0]
+        
+        # One pivoted query over latest_scores, folded into one row per student
+        pivot_columns = ",\n".join(
+            "MAX(CASE WHEN l.subject = ? THEN l.score END)" for _ in self.subjects
+        )
+        query = f'''
+            SELECT s.student_id, s.name, s.class_name, s.major,
+                   {pivot_columns},
+                   AVG(l.score)
+            FROM students s
+            LEFT JOIN latest_scores l ON l.student_id = s.student_id
+            GROUP BY s.student_id, s.name, s.class_name, s.major
+            ORDER BY s.student_id
+        '''
+        cursor.execute(query, self.subjects)
+        
+        row_count = 0
         try:
-            report = "SUBJECT ANALYSIS REPORT\n"
-            report += "=" * 50 + "\n\n"
-            
-            for subject in self.subjects:
-                self.cursor.execute('''
-                    SELECT s.name, s.student_id, sc.score
-                    FROM students s
-                    JOIN scores sc ON s.student_id = sc.student_id
-                    WHERE sc.subject = ? AND sc.date_recorded = (
-                        SELECT MAX(date_recorded)
-                        FROM scores sc2
-                        WHERE sc2.student_id = s.student_id AND sc2.subject = ?
-                    )
-                    ORDER BY sc.score DESC
-                ''', (subject, subject))
-                
-                results = self.cursor.fetchall()
+            with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
+                writer = csv.writer(csvfile)
                 
-                report += f"SUBJECT: {subject}\n"
-                report += "-" * 30 + "\n"
+                # Header
+                header = ["Student ID", "Name", "Class", "Major"] + self.subjects + ["Average"]
+                writer.writerow(header)
                 
-                if results:
-                    scores = [result[2] for result in results]
-                    avg_score = sum(scores) / len(scores)
-                    max_score = max(scores)
-                    min_score = min(scores)
-                    
-                    report += f"Students with scores: {len(scores)}\n"
-                    report += f"Average Score: {avg_score:.1f}\n"
-                    report += f"Highest Score: {max_score:.1f}\n"
-                    report += f"Lowest Score: {min_score:.1f}\n\n"
+                # Data is written as the cursor yields it
+                for record in cursor:
+                    subject_scores = record[4:-1]
+                    avg = record[-1]
+                    row = list(record[:4])
+                    row.extend("" if score is None else score for score in subject_scores)
+                    row.append(f"{avg:.1f}" if avg is not None else "")
+                    writer.writerow(row)
                     
-                    report += "Top performers:\n"
-                    for i, (name, student_id, score) in enumerate(results[:5]):
-                        grade = self.get_grade(score)
-                        report += f"  {i+1}. {name} (ID: {student_id}): {score:.1f} ({grade})\n"
-                else:
-                    report += "No scores recorded for this subject\n"
-                
-                report += "\n"
-            
-            self.report_text.delete(1.0, tk.END)
-            self.report_text.insert(1.0, report)
-            
-        except sqlite3.Error as e:
-            messagebox.showerror("Database Error", f"Failed to generate subject report: {e}")
+                    row_count += 1
+                    if row_count % 1000 == 0:
+                        job.report_progress(row_count, total_students, "Exporting")
+        except BaseException:
+            # Don't leave a truncated export behind after a cancel or error
+            if os.path.exists(filename):
+                os.remove(filename)
+            raise
+        
+        return row_count
     
-    def update_statistics(self):
-        try:
-            # Get basic counts
-            self.cursor.execute('SELECT COUNT(*) FROM students')
-            student_count = self.cursor.fetchone()[0]
-            
-            self.cursor.execute('SELECT COUNT(*) FROM scores')
-            score_count = self.cursor.fetchone()[0]
-            
-            if student_count == 0:
-                self.stats_text.delete(1.0, tk.END)
-                self.stats_text.insert(1.0, "No student data available")
-                return
-            
-            stats = "SYSTEM STATISTICS\n"
-            stats += "=" * 40 + "\n\n"
-            
-            stats += f"Total Students: {student_count}\n"
-            stats += f"Total Score Records: {score_count}\n\n"
+    def import_csv(self, students=False):
+        filename = filedialog.askopenfilename(
+            filetypes=[("CSV files", "*.csv"), ("TSV files", "*.tsv"), ("All files", "*.*")]
+        )
+        
+        if filename:
+            kind = "students" if students else "scores"
+            dry_run = self.import_dry_run.get()
             
-            # Class distribution
-            self.cursor.execute('''
-                SELECT class_name, COUNT(*)
-                FROM students
-                GROUP BY class_name
-                ORDER BY class_name
-            ''')
-            classes = self.cursor.fetchall()
-            
-            stats += "CLASS DISTRIBUTION:\n"
-            for class_name, count in classes:
-                stats += f"  {class_name}: {count} students\n"
-            
-            # Major distribution
-            self.cursor.execute('''
-                SELECT major, COUNT(*)
-                FROM students
-                GROUP BY major
-                ORDER BY major
-            ''')
-            majors = self.cursor.fetchall()
-            
-            stats += "\nMAJOR DISTRIBUTION:\n"
-            for major, count in majors:
-                stats += f"  {major}: {count} students\n"
-            
-            # Subject averages
-            stats += "\nSUBJECT AVERAGES:\n"
-            for subject in self.subjects:
-                self.cursor.execute('''
-                    SELECT AVG(score), COUNT(DISTINCT student_id)
-                    FROM scores
-                    WHERE subject = ?
-                ''', (subject,))
-                
-                result = self.cursor.fetchone()
-                avg_score, student_count_subject = result
-                
-                if avg_score is not None:
-                    stats += f"  {subject:<15}: {avg_score:>6.1f} ({student_count_subject} students)\n"
+            def imported(outcome):
+                result, rejects_filename, throughput = outcome
+                if dry_run:
+                    message = (f"Dry run of {filename}: {result.imported} {kind} would be imported\n"
+                               f"Checked {throughput}")
                 else:
-                    stats += f"  {subject:<15}: {'No Data':>10}\n"
-            
-            # Overall system average
-            self.cursor.execute('''
-                SELECT AVG(avg_score)
-                FROM (
-                    SELECT student_id, AVG(score) as avg_score
-                    FROM scores
-                    GROUP BY student_id
-                ) student_averages
-            ''')
-            
-            system_avg = self.cursor.fetchone()[0]
-            if system_avg is not None:
-                stats += f"\nSYSTEM AVERAGE: {system_avg:.1f}\n"
-            
-            self.stats_text.delete(1.0, tk.END)
-            self.stats_text.insert(1.0, stats)
+                    self.update_student_list()
+                    self.update_score_history()
+                    message = f"Imported {result.imported} {kind} from {filename}"
+                if result.rejected:
+                    message += f"\n{len(result.rejected)} rows rejected, see {rejects_filename}"
+                messagebox.showinfo("Import", message)
+                self.log_database_operation(message.replace("\n", "; "))
             
-        except sqlite3.Error as e:
-            messagebox.showerror("Database Error", f"Failed to load statistics: {e}")
+            self.start_job("database", self.run_csv_import, filename, students, dry_run,
+                           on_success=imported,
+                           error_message=f"Failed to {'check' if dry_run else 'import'} {kind}")
     
-    def export_to_csv(self):
-        try:
-            filename = filedialog.asksaveasfilename(
-                defaultextension=".csv",
-                filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
+    def run_csv_import(self, job, filename, students, dry_run=False):
+        """Stream a CSV/TSV file of students or scores into the database (runs on a worker thread).
+        
+        Columns are student_id, name, class, major for students and
+        student_id, subject, score[, date_recorded] for scores. Rejected rows
+        are written to <file>_rejects.csv; scores are loaded all or nothing.
+        A dry run only checks the file, on several processes if it is large.
+        Returns the ImportResult, the rejects file and, for a dry run, the
+        checking speed.
+        """
+        columns = STUDENT_COLUMNS if students else SCORE_COLUMNS
+        service = ScoreService(self.student_repository, self.score_repository, self.subjects, SIMPLE_GRADES)
+        if dry_run:
+            result, throughput = service.validate_file(
+                filename, students=students,
+                on_progress=lambda done, total: job.report_progress(done, total, "Checking file")
             )
+            return result, self.write_import_rejects(filename, result, columns), throughput
+        
+        total_size = os.path.getsize(filename)
+        read_size = 0
+        
+        with open(filename, newline='', encoding='utf-8-sig') as f:
+            def lines():
+                nonlocal read_size
+                for line in f:
+                    read_size += len(line)
+                    yield line
             
-            if filename:
-                self.cursor.execute('''
-                    SELECT s.student_id, s.name, s.class_name, s.major
-                    FROM students s
-                    ORDER BY s.student_id
-                ''')
-                
-                students = self.cursor.fetchall()
-                
-                with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-                    writer = csv.writer(csvfile)
-                    
-                    # Header
-                    header = ["Student ID", "Name", "Class", "Major"] + self.subjects + ["Average"]
-                    writer.writerow(header)
-                    
-                    # Data
-                    for student in students:
-                        student_id, name, class_name, major = student
-                        row = [student_id, name, class_name, major]
-                        
-                        # Get latest scores for each subject
-                        subject_scores = []
-                        for subject in self.subjects:
-                            self.cursor.execute('''
-                                SELECT score
-                                FROM scores
-                                WHERE student_id = ? AND subject = ?
-                                ORDER BY date_recorded DESC
-                                LIMIT 1
-                            ''', (student_id, subject))
-                            
-                            result = self.cursor.fetchone()
-                            if result:
-                                subject_scores.append(result[0])
-                                row.append(result[0])
-                            else:
-                                row.append("")
-                        
-                        # Calculate average
-                        if subject_scores:
-                            avg = sum(subject_scores) / len(subject_scores)
-                            row.append(f"{avg:.1f}")
-                        else:
-                            row.append("")
-                        
-                        writer.writerow(row)
-                
-                messagebox.showinfo("Success", f"Data exported to {filename}")
-                self.log_database_operation(f"Exported data to CSV: {filename}")
-                
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to export: {str(e)}")
+            def progressed(result):
+                # Also where a cancel stops the import
+                job.report_progress(min(read_size, total_size), total_size,
+                                    f"Imported {result.imported} rows")
+            
+            rows = read_csv_rows(lines(), columns, csv_delimiter(filename))
+            try:
+                if students:
+                    result = service.add_students(rows, on_batch=progressed)
+                else:
+                    result = service.import_scores(rows, on_batch=progressed)
+            finally:
+                # Student batches are committed as they go, so publish even after a cancel
+                self.changes.publish("students" if students else "scores")
+        
+        return result, self.write_import_rejects(filename, result, columns), None
+    
+    @staticmethod
+    def write_import_rejects(filename, result, columns):
+        """Write the rejected rows to <file>_rejects.csv; returns its name, or None if there were none"""
+        if not result.rejected:
+            return None
+        rejects_filename = os.path.splitext(filename)[0] + "_rejects.csv"
+        with open(rejects_filename, 'w', newline='', encoding='utf-8') as f:
+            write_rejects(f, result, columns)
+        return rejects_filename
     
     def backup_database(self):
         try:
@@ -819,8 +1077,8 @@ class StudentScoreDBSystem:
             )
             
             if backup_filename:
-                import shutil
-                shutil.copy2(self.db_path, backup_filename)
+                # Online backup so pages still in the WAL file are included
+                self.db.backup(backup_filename)
                 messagebox.showinfo("Success", f"Database backed up to {backup_filename}")
                 self.log_database_operation(f"Database backed up to: {backup_filename}")
                 
@@ -837,11 +1095,19 @@ class StudentScoreDBSystem:
                 )
                 
                 if restore_filename:
-                    self.conn.close()
+                    # Workers read through their own connections: stop them all
+                    # before the file is replaced, then start with a fresh pool
+                    for slot in list(self.jobs):
+                        self.cancel_job(slot)
+                    self.executor.shutdown(wait=True)
+                    self.executor = QueryExecutor(self.root)
+                    
+                    # Closing the last connection checkpoints and removes the WAL file
+                    self.db.close()
                     import shutil
                     shutil.copy2(restore_filename, self.db_path)
-                    self.conn = sqlite3.connect(self.db_path)
-                    self.cursor = self.conn.cursor()
+                    self.run_migrations()
+                    self.changes.publish()
                     self.update_student_list()
                     messagebox.showinfo("Success", "Database restored successfully")
                     self.log_database_operation(f"Database restored from: {restore_filename}")
@@ -854,9 +1120,10 @@ class StudentScoreDBSystem:
                                    "This will delete ALL data permanently. Continue?")
         if result:
             try:
-                self.cursor.execute('DELETE FROM scores')
-                self.cursor.execute('DELETE FROM students')
-                self.conn.commit()
+                with self.db.transaction() as cursor:
+                    cursor.execute('DELETE FROM scores')
+                    cursor.execute('DELETE FROM students')
+                self.changes.publish()
                 self.update_student_list()
                 messagebox.showinfo("Success", "All data cleared successfully")
                 self.log_database_operation("All data cleared from database")
@@ -865,29 +1132,107 @@ class StudentScoreDBSystem:
                 messagebox.showerror("Database Error", f"Failed to clear data: {e}")
     
     def check_database(self):
-        try:
-            # Check database integrity
-            self.cursor.execute('PRAGMA integrity_check')
-            integrity = self.cursor.fetchone()[0]
-            
-            # Get table info
-            self.cursor.execute('SELECT COUNT(*) FROM students')
-            student_count = self.cursor.fetchone()[0]
-            
-            self.cursor.execute('SELECT COUNT(*) FROM scores')
-            score_count = self.cursor.fetchone()[0]
-            
-            info = f"Database Check Results:\n"
-            info += f"Integrity: {integrity}\n"
-            info += f"Students: {student_count}\n"
-            info += f"Score Records: {score_count}\n"
-            info += f"Database Size: {os.path.getsize(self.db_path)} bytes\n"
-            
+        def checked(info):
             messagebox.showinfo("Database Check", info)
             self.log_database_operation("Database integrity check completed")
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Database check failed: {str(e)}")
+        
+        self.start_job("database", self.build_database_check,
+                       on_success=checked,
+                       error_message="Database check failed")
+    
+    def build_database_check(self, job):
+        """Run the integrity check and collect table info (runs on a worker thread)"""
+        cursor = self.job_cursor(job)
+        
+        # Check database integrity
+        job.report_progress(0, 3, "Checking integrity")
+        cursor.execute('PRAGMA integrity_check')
+        integrity = cursor.fetchone()[0]
+        
+        # Get table info
+        job.report_progress(1, 3, "Counting students")
+        cursor.execute('SELECT COUNT(*) FROM students')
+        student_count = cursor.fetchone()[0]
+        
+        job.report_progress(2, 3, "Counting scores")
+        cursor.execute('SELECT COUNT(*) FROM scores')
+        score_count = cursor.fetchone()[0]
+        
+        info = "Database Check Results:\n"
+        info += f"Integrity: {integrity}\n"
+        info += f"Students: {student_count}\n"
+        info += f"Score Records: {score_count}\n"
+        info += f"Database Size: {os.path.getsize(self.db_path)} bytes\n"
+        info += f"Report Cache: {self.report_cache.format_stats()}\n"
+        
+        return info
+    
+    def create_job_status(self, parent, slot):
+        """Progress bar, status text and Cancel button for one kind of background job"""
+        status_frame = ttk.Frame(parent)
+        
+        progress = ttk.Progressbar(status_frame, mode="determinate", maximum=100, length=200)
+        progress.pack(side="left", padx=5)
+        status_label = ttk.Label(status_frame, text="Ready")
+        status_label.pack(side="left", padx=5)
+        ttk.Button(status_frame, text="Cancel",
+                   command=lambda: self.cancel_job(slot)).pack(side="left", padx=5)
+        
+        self.job_widgets[slot] = (progress, status_label)
+        return status_frame
+    
+    def job_cursor(self, job):
+        """Read cursor for a worker thread; cancelling the job interrupts its query"""
+        conn = self.db.reader()
+        job.add_cancel_callback(conn.interrupt)
+        return conn.cursor()
+    
+    def start_job(self, slot, func, *args, on_success, error_message):
+        """Run func(job, *args) in the background, replacing any job already in slot"""
+        self.cancel_job(slot)
+        progress, status_label = self.job_widgets[slot]
+        progress["value"] = 0
+        status_label.config(text="Working...")
+        
+        def finish(text, value):
+            # A replaced job must not touch the widgets its successor now uses
+            if self.jobs.get(slot) is not job:
+                return
+            del self.jobs[slot]
+            progress["value"] = value
+            status_label.config(text=text)
+        
+        def succeeded(result):
+            finish("Done", 100)
+            on_success(result)
+        
+        def failed(error):
+            finish("Failed", 0)
+            if isinstance(error, sqlite3.Error):
+                messagebox.showerror("Database Error", f"{error_message}: {error}")
+            elif isinstance(error, LookupError):
+                messagebox.showerror("Error", str(error))
+            else:
+                messagebox.showerror("Error", f"{error_message}: {str(error)}")
+        
+        def progressed(done, total, message):
+            progress["value"] = done * 100 / total if total else 100
+            status_label.config(text=f"{message}... {done}/{total}")
+        
+        job = self.executor.submit(func, *args, name=func.__name__,
+                                   on_success=succeeded, on_error=failed,
+                                   on_progress=progressed,
+                                   on_cancel=lambda: finish("Cancelled", 0))
+        self.jobs[slot] = job
+        return job
+    
+    def cancel_job(self, slot):
+        job = self.jobs.pop(slot, None)
+        if job is not None:
+            job.cancel()
+            progress, status_label = self.job_widgets[slot]
+            progress["value"] = 0
+            status_label.config(text="Cancelled")
     
     def log_database_operation(self, message):
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -896,13 +1241,13 @@ class StudentScoreDBSystem:
         self.db_log_text.see(tk.END)
     
     def __del__(self):
-        if hasattr(self, 'conn'):
-            self.conn.close()
+        if hasattr(self, 'db'):
+            self.db.close()
 
 def main():
     root = tk.Tk()
     app = StudentScoreDBSystem(root)
-    root.protocol("WM_DELETE_WINDOW", lambda: (app.conn.close(), root.destroy()))
+    root.protocol("WM_DELETE_WINDOW", lambda: (app.executor.shutdown(), app.db.close(), root.destroy()))
     root.mainloop()
 
 if __name__ == "__main__":
@@ -1,11 +1,29 @@
 # -*- coding: utf-8 -*-
+import sys
+from startup_profile import StartupProfiler
+
+# --profile-startup times every import below, so the profiler comes first
+startup_profiler = StartupProfiler.from_argv(sys.argv) if __name__ == "__main__" else None
+
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import csv
 from datetime import datetime
-from pymongo import MongoClient
-import sys
-import os
+import argparse
+import itertools
+from virtual_tree import VirtualTreeview, ListDataSource
+from report_cache import ChangeBus, ReportCache
+from local_score_store import LocalScoreStore
+from local_journal import LocalJournal
+from query_executor import QueryExecutor
+from write_behind import WriteBehindQueue, MongoReplicator, new_score_id
+from mongo_monitor import MongoConnectionMonitor, DEFAULT_MONGODB_URI, DEFAULT_TIMEOUTS_MS
+from repositories import (MemoryStudentRepository, MemoryScoreRepository, MongoStudentRepository,
+                          MongoScoreRepository, get_grade, average_latest_score, rebuild_student_summaries,
+                          prepare_student_database)
+from score_service import (DEFAULT_SUBJECTS, individual_report, class_report, subject_report,
+                           statistics_report, export_rows, format_individual_report, format_class_report,
+                           format_subject_report, format_statistics)
 
 # UTF-8 encoding setup
 import locale
@@ -17,8 +35,15 @@ except:
     except:
         print("Locale setup failed, using default settings")
 
+# Storage backends selectable with --backend
+BACKENDS = ("mongo", "local", "sqlite")
+
+# What the class, subject and statistics reports are built from
+ALL_STUDENT_DATA = (("students", None), ("scores", None))
+
 class StudentScoreSystem:
-    def __init__(self, root):
+    def __init__(self, root, backend="mongo", mongodb_uri=DEFAULT_MONGODB_URI, mongodb_timeouts=None,
+                 health_interval=10.0):
         self.root = root
         self.root.title("Student Score Management System")
         self.root.geometry("1024x768")
@@ -34,25 +59,68 @@ class StudentScoreSystem:
         # Font setup
         self.setup_fonts()
         
-        # Local data initialization (used when MongoDB connection fails)
-        self.students = {}
+        # Local data initialization (used when MongoDB connection fails),
+        # kept on disk so that data entered during an outage is not lost
+        self.students = LocalScoreStore()
+        self.local_journal = LocalJournal("student_scores_local")
+        
+        self.subjects = list(DEFAULT_SUBJECTS)
         
-        self.subjects = ["Introduction to Computers", "IoT Emb", "Capston Design"]
+        # Report texts, dropped as the writes they depend on are published;
+        # they also expire as other clients may write to MongoDB
+        self.changes = ChangeBus()
+        self.report_cache = ReportCache(max_age=60.0)
+        self.changes.subscribe(self.report_cache.invalidate)
         
         # Initialize MongoDB-related attributes
         self.client = None
         self.db = None
-        self.students_collection = None
-        self.scores_collection = None
         self.use_mongodb = False
+        self.backend = backend
+        self.mongodb_uri = mongodb_uri
+        self.mongodb_timeouts = dict(DEFAULT_TIMEOUTS_MS, **(mongodb_timeouts or {}))
+        
+        # Connecting, health checks and replay all run off the Tk thread;
+        # the monitor and the replicator each hold a worker while running
+        self.executor = QueryExecutor(self.root, max_workers=4)
+        self.connection_monitor = MongoConnectionMonitor(
+            self.executor, self._connect_mongodb, self._on_mongodb_connected,
+            self._on_mongodb_disconnected, health_interval=health_interval
+        )
+        
+        # Local writes are queued for MongoDB and replayed once it is reachable again
+        self.write_behind = WriteBehindQueue("student_scores_pending")
+        self.replicator = MongoReplicator(
+            self.executor, self.write_behind, self._connect_for_replay,
+            self._replay_to_mongodb, self._mongodb_recovered
+        )
+        
+        # All reads and writes go through repositories: the local ones over the
+        # store (queueing writes for MongoDB), or the MongoDB ones while connected
+        self.local_students = MemoryStudentRepository(self.students, self.write_behind)
+        self.local_scores = MemoryScoreRepository(self.students, self.write_behind)
+        self.student_repository = self.local_students
+        self.score_repository = self.local_scores
+        
+        # Rows of the student list; changed one student at a time after the first load
+        self.student_source = ListDataSource([], page_builder=self._student_rows)
+        self.student_source_mongodb = False
         
         # Create GUI widgets first
         self.create_widgets()
+        self.root.bind("<<DatabaseModeChanged>>", self._on_mode_changed)
+        
+        # Saved local data is read before any input is handled, so that no
+        # change made meanwhile is overwritten by the load or left unjournaled
+        self.load_local_data()
         
         # MongoDB connection setup (after GUI creation)
-        self.root.after(100, self.setup_mongodb)
+        if self.backend == "mongo":
+            self.root.after(100, self.setup_mongodb)
+        else:
+            self.root.after(100, self._update_mode_indicator)
         
-        # Update student list after a delay to allow MongoDB setup
+        # Show the local data right away; the list reloads if MongoDB connects
         self.root.after(200, self.update_student_list)
     
     def setup_fonts(self):
@@ -69,51 +137,74 @@ class StudentScoreSystem:
             self.title_font = ('TkDefaultFont', 18, 'bold')
             self.button_font = ('TkDefaultFont', 18, 'bold')
     
+    def load_local_data(self):
+        """Load the local store from its snapshot and journal"""
+        try:
+            self.students.load_journal(self.local_journal)
+            self.write_behind.load()
+            self.changes.publish()
+        except Exception as e:
+            print(f"Failed to load local data: {e}")
+    
     def setup_mongodb(self):
-        """MongoDB connection setup (completely silent)"""
-        self.client = None
-        self.db = None
-        self.students_collection = None
-        self.scores_collection = None
-        self.use_mongodb = False
+        """Start connecting to MongoDB in the background (completely silent).
+        
+        The app runs on local data until the monitor reports a connection;
+        every later change of mode arrives as a <<DatabaseModeChanged>> event.
+        """
+        self.connection_monitor.start()
+    
+    def _open_mongodb_client(self):
+        """New client with the configured timeouts, pinged (raises if unreachable)"""
+        # Imported here so the local backend never loads the driver
+        from pymongo import MongoClient
         
-        # Silent MongoDB connection attempt
+        client = MongoClient(self.mongodb_uri, **self.mongodb_timeouts)
         try:
-            from pymongo import MongoClient
-            
-            # Extremely short timeout for instant fallback
-            self.client = MongoClient(
-                'mongodb://localhost:27017/',
-                serverSelectionTimeoutMS=50,  # 50ms timeout
-                connectTimeoutMS=50,
-                socketTimeoutMS=50,
-                connect=False
-            )
-            
-            # Quick connection test
-            self.client.admin.command('ping')
-            
-            # Database setup
-            self.db = self.client['student_management_db']
-            self.students_collection = self.db['students']
-            self.scores_collection = self.db['scores']
-            
-            # Create indexes silently
-            try:
-                self.students_collection.create_index("student_id", unique=True)
-                self.scores_collection.create_index([("student_id", 1), ("subject", 1)])
-            except:
-                pass
-            
-            self.use_mongodb = True
-            
+            client.admin.command('ping')
         except:
-            # Silent fallback to local mode
-            self._cleanup_mongodb()
+            client.close()
+            raise
+        return client
+    
+    def _connect_mongodb(self):
+        """Connect and prepare the collections; runs on the monitor thread"""
+        client = self._open_mongodb_client()
+        db = client['student_management_db']
         
-        # Update status indicator
+        # Indexes and summaries are best effort; the app works without them
+        try:
+            prepare_student_database(db)
+        except:
+            pass
+        
+        return client
+    
+    def _on_mongodb_connected(self, client):
+        """The monitor reached MongoDB"""
+        self._cleanup_mongodb()
+        self.client = client
+        if len(self.write_behind):
+            # Local writes from an earlier outage go first; the replicator
+            # switches to the database once they are in
+            self.replicator.start()
+        else:
+            self._use_mongodb_client()
+    
+    def _use_mongodb_client(self):
+        """Switch to database mode on the monitor's client"""
+        self.db = self.client['student_management_db']
+        self.student_repository = MongoStudentRepository(self.db)
+        # Scores plus one precomputed document per student: latest score per
+        # subject, average and grade (kept in step by add_scores)
+        self.score_repository = MongoScoreRepository(self.db)
+        self._set_mongodb_mode(True)
+    
+    def _on_mongodb_disconnected(self):
+        """The monitor lost MongoDB (or never reached it)"""
+        self._cleanup_mongodb()
         self._update_mode_indicator()
-            
+    
     def _cleanup_mongodb(self):
         """Clean up MongoDB connection objects"""
         try:
@@ -124,17 +215,85 @@ class StudentScoreSystem:
         
         self.client = None
         self.db = None
-        self.students_collection = None
-        self.scores_collection = None
-        self.use_mongodb = False
+        self.student_repository = self.local_students
+        self.score_repository = self.local_scores
+        self._set_mongodb_mode(False)
+    
+    def _set_mongodb_mode(self, enabled):
+        """Record the current mode and announce a change to the UI"""
+        if enabled != self.use_mongodb:
+            self.use_mongodb = enabled
+            # Reports now come from the other store
+            self.changes.publish()
+            self.root.event_generate("<<DatabaseModeChanged>>", when="tail")
+    
+    def _on_mode_changed(self, event=None):
+        """Show data from whichever store the app now uses"""
+        self._update_mode_indicator()
+        self.update_student_list()
+        self.update_score_history()
+    
+    def _connect_for_replay(self):
+        """Open a MongoDB client for the replicator thread (raises if unreachable)"""
+        return self._open_mongodb_client()
+    
+    def _replay_to_mongodb(self, client, operations):
+        """Apply queued local writes to MongoDB; each one can safely be applied twice"""
+        db = client['student_management_db']
+        students = MongoStudentRepository(db)
+        scores = MongoScoreRepository(db)
+        
+        # Each run of operations of one kind is applied as one batch, in order
+        for kind, run in itertools.groupby(operations, key=lambda operation: operation[0]):
+            batch = [args for _, args in run]
+            if kind == "upsert_student":
+                students.add_many(batch)
+            elif kind == "insert_scores":
+                scores.add_scores([
+                    (score_id, student_id, subject, score, datetime.fromisoformat(date_recorded))
+                    for student_id, entries in batch
+                    for score_id, subject, score, date_recorded in entries
+                ])
+            elif kind == "delete_student":
+                for (student_id,) in batch:
+                    students.delete(student_id)
+    
+    def _mongodb_recovered(self):
+        """Every queued local write is in MongoDB; switch back to database mode"""
+        if self.client is not None and not self.use_mongodb:
+            self._use_mongodb_client()
     
     def _fallback_to_local(self, operation_name="Operation"):
         """Silent fallback to local mode when MongoDB fails"""
         if self.use_mongodb:
             self._cleanup_mongodb()
+            # Reconnect from scratch; the monitor reports when the server is back
+            self.connection_monitor.restart()
             return True
         return False
     
+    def _students(self, method, *args):
+        """Call a StudentRepository method on the current backend (see _call)"""
+        return self._call(method, args, self.student_repository, self.local_students)
+    
+    def _scores(self, method, *args):
+        """Call a ScoreRepository method on the current backend (see _call)"""
+        return self._call(method, args, self.score_repository, self.local_scores)
+    
+    def _call(self, method, args, repository, local_repository):
+        """Run a repository method, falling back to local storage if MongoDB fails.
+        
+        This is the only place that deals with MongoDB errors; after a
+        fallback the call is repeated on the local repository.
+        """
+        if repository is not local_repository:
+            try:
+                return getattr(repository, method)(*args)
+            except Exception as e:
+                print(f"MongoDB {method} failed: {e}")
+                self._fallback_to_local()
+        return getattr(local_repository, method)(*args)
+    
     def _update_mode_indicator(self):
         """Update the status indicator showing current mode"""
         if hasattr(self, 'mode_label'):
@@ -228,6 +387,9 @@ class StudentScoreSystem:
         self.student_tree.pack(side="left", fill="both", expand=True)
         scrollbar_student.pack(side="right", fill="y")
         
+        # Only the visible rows exist as Treeview items
+        self.student_view = VirtualTreeview(self.student_tree, scrollbar_student)
+        
         self.student_tree.bind("<ButtonRelease-1>", self.on_student_select)
         
     def create_score_tab(self):
@@ -283,6 +445,8 @@ class StudentScoreSystem:
         self.score_tree.pack(side="left", fill="both", expand=True)
         scrollbar_score.pack(side="right", fill="y")
         
+        self.score_view = VirtualTreeview(self.score_tree, scrollbar_score)
+        
     def create_reports_tab(self):
         reports_frame = ttk.Frame(self.notebook)
         self.notebook.add(reports_frame, text="Reports")
@@ -333,91 +497,79 @@ class StudentScoreSystem:
             messagebox.showerror("Error", "Please fill all fields")
             return
         
-        # Check for duplicate student ID (both modes)
-        if self.use_mongodb and self.students_collection is not None:
-            try:
-                if self.students_collection.find_one({"student_id": student_id}):
-                    messagebox.showerror("Error", "Student ID already exists")
-                    return
-            except:
-                self._fallback_to_local()
-        
-        if not self.use_mongodb and student_id in self.students:
+        # Refused if the ID is already taken
+        if not self._students("add", student_id, name, class_name, major):
             messagebox.showerror("Error", "Student ID already exists")
             return
         
-        # Add student (try MongoDB first, fallback to local)
-        operation_successful = False
+        self.student_changed(student_id, {"name": name, "class": class_name, "major": major})
+        self.clear_student_fields()
+        mode_text = "in database" if self.use_mongodb else "locally"
+        messagebox.showinfo("Success", f"Student added successfully {mode_text}")
+    
+    def update_student_list(self):
+        rows = [(student_id, (student_id, data)) for student_id, data in self._students("all").items()]
         
-        if self.use_mongodb and self.students_collection is not None:
-            try:
-                student_data = {
-                    "student_id": student_id,
-                    "name": name,
-                    "class": class_name,
-                    "major": major,
-                    "created_at": datetime.now()
-                }
-                self.students_collection.insert_one(student_data)
-                operation_successful = True
-            except:
-                self._fallback_to_local()
+        # Averages are only calculated for the rows that are scrolled into view,
+        # one batch per page
+        self.student_source = ListDataSource(rows, page_builder=self._student_rows)
+        self.student_source_mongodb = self.use_mongodb
+        self.student_view.set_source(self.student_source, keep_position=True)
         
-        # Local mode (either by design or after fallback)
-        if not operation_successful:
-            self.students[student_id] = {
-                "name": name,
-                "class": class_name,
-                "major": major,
-                "scores": {}
-            }
-            operation_successful = True
-        
-        if operation_successful:
-            self.update_student_list()
-            self.clear_student_fields()
-            mode_text = "in database" if self.use_mongodb else "locally"
-            messagebox.showinfo("Success", f"Student added successfully {mode_text}")
+        # Update combobox
+        self._update_student_choices()
     
-    def update_student_list(self):
-        for item in self.student_tree.get_children():
-            self.student_tree.delete(item)
+    def _update_student_choices(self):
+        self.score_student_combo['values'] = [
+            f"{student_id} - {data['name']}" for student_id, (_, data) in self.student_source.items
+        ]
+    
+    def student_changed(self, student_id, fields):
+        """Apply one added, updated (fields) or deleted (None) student to the list"""
+        self.changes.publish("students", student_id)
+        if fields is None:
+            self.changes.publish("scores", student_id)
+        
+        if self.student_source_mongodb != self.use_mongodb:
+            # Fell back to local data since the list was loaded
+            self.update_student_list()
+            return
         
-        # Load students (try MongoDB first, fallback to local)
-        students_loaded = False
-        student_list = []
+        if fields is None:
+            position = self.student_source.remove(student_id)
+            if position is not None:
+                self.student_view.invalidate(position)
+        else:
+            data = dict(fields)
+            existing = self.student_source.index(student_id) is not None
+            position = self.student_source.upsert(student_id, (student_id, data))
+            if existing:
+                if self.student_view.has_row(student_id):
+                    self.student_view.update_row(student_id, self.student_source.build(student_id))
+            else:
+                self.student_view.invalidate(position)
         
-        if self.use_mongodb and self.students_collection is not None:
-            try:
-                students = list(self.students_collection.find({}, {"_id": 0}))
-                
-                for student in students:
-                    student_id = student["student_id"]
-                    avg_score = self.calculate_average_score(student_id)
-                    self.student_tree.insert("", "end", values=(
-                        student_id, student["name"], student["class"], student["major"], f"{avg_score:.1f}"
-                    ))
-                    student_list.append(f"{student_id} - {student['name']}")
-                
-                students_loaded = True
-                
-            except:
-                self._fallback_to_local()
+        self._update_student_choices()
+    
+    def student_scores_changed(self, student_id):
+        """Refresh only the average of the student whose scores were saved"""
+        self.changes.publish("scores", student_id)
         
-        # Local mode (either by design or after fallback)
-        if not students_loaded:
-            for student_id, data in self.students.items():
-                avg_score = self.calculate_average_score(student_id)
-                self.student_tree.insert("", "end", values=(
-                    student_id, data["name"], data["class"], data["major"], f"{avg_score:.1f}"
-                ))
-                student_list.append(f"{student_id} - {data['name']}")
-            
-            students_loaded = True
+        if self.student_source_mongodb != self.use_mongodb:
+            self.update_student_list()
+            return
         
-        # Update combobox
-        if students_loaded:
-            self.score_student_combo['values'] = student_list
+        if self.student_view.has_row(student_id):
+            self.student_view.update_row(student_id, self.student_source.build(student_id))
+    
+    def _student_rows(self, students):
+        """Displayed values for (student_id, {"name", "class", "major"}) pairs"""
+        latest = self.get_latest_scores([student_id for student_id, _ in students])
+        rows = []
+        for student_id, data in students:
+            avg_score = self.average_latest_score(latest.get(student_id))
+            rows.append((student_id, data["name"], data["class"], data["major"], f"{avg_score:.1f}"))
+        return rows
     
     def on_student_select(self, event):
         selection = self.student_tree.selection()
@@ -444,61 +596,20 @@ class StudentScoreSystem:
             messagebox.showerror("Error", "Please fill all fields")
             return
         
-        # Try MongoDB first, then fallback to local if needed
-        operation_successful = False
+        try:
+            found = self._students("update", student_id, name, class_name, major)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to update student: {str(e)}")
+            return
         
-        if self.use_mongodb and self.students_collection is not None:
-            try:
-                # MongoDB mode
-                result = self.students_collection.update_one(
-                    {"student_id": student_id},
-                    {"$set": {
-                        "name": name,
-                        "class": class_name,
-                        "major": major,
-                        "updated_at": datetime.now()
-                    }}
-                )
-                
-                if result.matched_count == 0:
-                    messagebox.showerror("Error", "Student ID not found")
-                    return
-                
-                operation_successful = True
-                
-            except Exception as e:
-                print(f"MongoDB update_student failed: {e}")
-                # Fallback to local mode
-                if self._fallback_to_local("Update Student"):
-                    # Retry in local mode (will be handled by the local mode block below)
-                    pass
-                else:
-                    messagebox.showerror("Error", f"Failed to update student: {str(e)}")
-                    return
-        
-        # Local mode (either by design or after fallback)
-        if not operation_successful:
-            try:
-                if student_id not in self.students:
-                    messagebox.showerror("Error", "Student ID not found")
-                    return
-                
-                self.students[student_id].update({
-                    "name": name,
-                    "class": class_name,
-                    "major": major
-                })
-                operation_successful = True
-                
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to update student locally: {str(e)}")
-                return
+        if not found:
+            messagebox.showerror("Error", "Student ID not found")
+            return
         
-        if operation_successful:
-            self.update_student_list()
-            self.clear_student_fields()
-            mode_text = "in database" if self.use_mongodb else "locally"
-            messagebox.showinfo("Success", f"Student updated successfully {mode_text}")
+        self.student_changed(student_id, {"name": name, "class": class_name, "major": major})
+        self.clear_student_fields()
+        mode_text = "in database" if self.use_mongodb else "locally"
+        messagebox.showinfo("Success", f"Student updated successfully {mode_text}")
     
     def delete_student(self):
         student_id = self.student_id_entry.get().strip()
@@ -512,51 +623,21 @@ class StudentScoreSystem:
         if not result:
             return
         
-        # Try MongoDB first, then fallback to local if needed
-        operation_successful = False
+        try:
+            # Deletes the student's scores as well
+            found = self._students("delete", student_id)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to delete student: {str(e)}")
+            return
         
-        if self.use_mongodb and self.students_collection is not None:
-            try:
-                # MongoDB mode - check student exists
-                student = self.students_collection.find_one({"student_id": student_id})
-                if not student:
-                    messagebox.showerror("Error", "Student ID not found")
-                    return
-                
-                # Delete scores first, then student
-                self.scores_collection.delete_many({"student_id": student_id})
-                self.students_collection.delete_one({"student_id": student_id})
-                operation_successful = True
-                
-            except Exception as e:
-                print(f"MongoDB delete_student failed: {e}")
-                # Fallback to local mode
-                if self._fallback_to_local("Delete Student"):
-                    # Retry in local mode (will be handled by the local mode block below)
-                    pass
-                else:
-                    messagebox.showerror("Error", f"Failed to delete student: {str(e)}")
-                    return
-        
-        # Local mode (either by design or after fallback)
-        if not operation_successful:
-            try:
-                if student_id not in self.students:
-                    messagebox.showerror("Error", "Student ID not found")
-                    return
-                
-                del self.students[student_id]
-                operation_successful = True
-                
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to delete student locally: {str(e)}")
-                return
+        if not found:
+            messagebox.showerror("Error", "Student ID not found")
+            return
         
-        if operation_successful:
-            self.update_student_list()
-            self.clear_student_fields()
-            mode_text = "from database" if self.use_mongodb else "locally"
-            messagebox.showinfo("Success", f"Student deleted successfully {mode_text}")
+        self.student_changed(student_id, None)
+        self.clear_student_fields()
+        mode_text = "from database" if self.use_mongodb else "locally"
+        messagebox.showinfo("Success", f"Student deleted successfully {mode_text}")
     
     def clear_student_fields(self):
         self.student_id_entry.delete(0, tk.END)
@@ -583,12 +664,8 @@ class StudentScoreSystem:
                     try:
                         score = float(score_text)
                         if 0 <= score <= 100:
-                            scores_to_save.append({
-                                "student_id": student_id,
-                                "subject": subject,
-                                "score": score,
-                                "date_recorded": current_time
-                            })
+                            # Client-side id so a replayed save cannot duplicate it
+                            scores_to_save.append((new_score_id(), student_id, subject, score, current_time))
                         else:
                             messagebox.showerror("Error", f"Score for {subject} must be between 0-100")
                             return
@@ -604,180 +681,67 @@ class StudentScoreSystem:
             messagebox.showerror("Error", f"Error validating scores: {str(e)}")
             return
         
-        # Check if student exists (both modes)
-        if self.use_mongodb and self.students_collection is not None:
-            try:
-                if not self.students_collection.find_one({"student_id": student_id}):
-                    messagebox.showerror("Error", "Student not found")
-                    return
-            except:
-                self._fallback_to_local()
-        
-        if not self.use_mongodb and student_id not in self.students:
+        if self._students("get", student_id) is None:
             messagebox.showerror("Error", "Student not found")
             return
         
-        # Save scores (try MongoDB first, fallback to local)
-        operation_successful = False
-        
-        if self.use_mongodb and self.scores_collection is not None:
-            try:
-                self.scores_collection.insert_many(scores_to_save)
-                operation_successful = True
-            except:
-                self._fallback_to_local()
-        
-        # Local mode (either by design or after fallback)
-        if not operation_successful:
-            if "scores" not in self.students[student_id]:
-                self.students[student_id]["scores"] = {}
-            
-            for score_data in scores_to_save:
-                subject = score_data["subject"]
-                if subject not in self.students[student_id]["scores"]:
-                    self.students[student_id]["scores"][subject] = []
-                
-                self.students[student_id]["scores"][subject].append({
-                    "score": score_data["score"],
-                    "date": score_data["date_recorded"].strftime("%Y-%m-%d")
-                })
-            
-            operation_successful = True
+        self._scores("add_scores", scores_to_save)
         
-        if operation_successful:
-            self.update_student_list()
-            self.update_score_history()
-            self.clear_score_fields()
-            mode_text = "to database" if self.use_mongodb else "locally"
-            messagebox.showinfo("Success", f"Saved {len(scores_to_save)} scores successfully {mode_text}")
+        self.student_scores_changed(student_id)
+        self.update_score_history()
+        self.clear_score_fields()
+        mode_text = "to database" if self.use_mongodb else "locally"
+        messagebox.showinfo("Success", f"Saved {len(scores_to_save)} scores successfully {mode_text}")
     
     def update_score_history(self):
-        for item in self.score_tree.get_children():
-            self.score_tree.delete(item)
-        
         selected = self.score_student_var.get()
         if not selected:
+            self.score_view.clear()
             return
         
         student_id = selected.split(" - ")[0]
         
-        # Try MongoDB first, then fallback to local if needed
-        scores_loaded = False
+        try:
+            history = self._scores("history", student_id)
+        except Exception as e:
+            print(f"Failed to load score history: {str(e)}")
+            return
         
-        if self.use_mongodb and self.scores_collection is not None:
-            try:
-                # MongoDB mode
-                scores = list(self.scores_collection.find(
-                    {"student_id": student_id},
-                    {"_id": 0}
-                ).sort("date_recorded", -1))
-                
-                for score_data in scores:
-                    grade = self.get_grade(score_data["score"])
-                    date_display = score_data["date_recorded"].strftime("%Y-%m-%d")
-                    self.score_tree.insert("", "end", values=(
-                        date_display, score_data["subject"], f"{score_data['score']:.1f}", grade
-                    ))
-                
-                scores_loaded = True
-                
-            except Exception as e:
-                print(f"MongoDB update_score_history failed: {e}")
-                # Fallback to local mode
-                if self._fallback_to_local("Load Score History"):
-                    # Retry in local mode (will be handled by the local mode block below)
-                    pass
-                else:
-                    print(f"Failed to load score history: {str(e)}")
-                    return
-        
-        # Local mode (either by design or after fallback)
-        if not scores_loaded:
-            try:
-                if student_id not in self.students:
-                    return
-                
-                scores = self.students[student_id].get("scores", {})
-                for subject, score_list in scores.items():
-                    for score_data in score_list:
-                        grade = self.get_grade(score_data["score"])
-                        self.score_tree.insert("", "end", values=(
-                            score_data["date"], subject, score_data["score"], grade
-                        ))
-                
-                scores_loaded = True
-                
-            except Exception as e:
-                print(f"Failed to load score history locally: {str(e)}")
-                return
+        rows = [
+            (index, (date_recorded, subject, f"{score:.1f}", self.get_grade(score)))
+            for index, (date_recorded, subject, score) in enumerate(history)
+        ]
+        self.score_view.set_source(ListDataSource(rows))
     
-    def get_grade(self, score):
-        if score >= 95:
-            return "A+"
-        elif score >= 90:
-            return "A"
-        elif score >= 85:
-            return "B+"
-        elif score >= 80:
-            return "B"
-        elif score >= 75:
-            return "C+"
-        elif score >= 70:
-            return "C"
-        elif score >= 65:
-            return "D+"
-        elif score >= 60:
-            return "D"
-        else:
-            return "F"
+    # Shared with the student_summaries documents (see repositories.py)
+    get_grade = staticmethod(get_grade)
+    average_latest_score = staticmethod(average_latest_score)
     
     def calculate_average_score(self, student_id):
-        # Try MongoDB first, then fallback to local if needed
-        if self.use_mongodb and self.scores_collection is not None:
-            try:
-                # MongoDB mode - calculate average of latest scores per subject
-                pipeline = [
-                    {"$match": {"student_id": student_id}},
-                    {"$sort": {"date_recorded": -1}},
-                    {"$group": {
-                        "_id": "$subject",
-                        "latest_score": {"$first": "$score"}
-                    }},
-                    {"$group": {
-                        "_id": None,
-                        "average": {"$avg": "$latest_score"}
-                    }}
-                ]
-                
-                result = list(self.scores_collection.aggregate(pipeline))
-                return result[0]["average"] if result else 0
-                
-            except Exception as e:
-                print(f"MongoDB calculate_average_score failed: {e}")
-                # Silently fallback to local mode (don't show error dialog for this)
-                self._cleanup_mongodb()
-        
-        # Local mode (either by design or after fallback)
+        """Average of the student's latest score per subject (0 if none)"""
         try:
-            if student_id not in self.students:
-                return 0
-            
-            scores = self.students[student_id].get("scores", {})
-            total_score = 0
-            total_count = 0
-            
-            for subject_scores in scores.values():
-                if subject_scores:
-                    latest_score = subject_scores[-1]["score"]
-                    total_score += latest_score
-                    total_count += 1
-            
-            return total_score / total_count if total_count > 0 else 0
-            
+            return self._scores("average", student_id)
         except Exception as e:
-            print(f"Error calculating average score locally: {e}")
+            print(f"Error calculating average score: {e}")
             return 0
     
+    def get_latest_scores(self, student_ids=None):
+        """Latest score per subject for many students (all if student_ids is None).
+        
+        Returns {student_id: {subject: score}}; students without scores are left
+        out. In MongoDB mode this reads the student_summaries documents in one
+        query rather than aggregating score history.
+        """
+        return self._scores("latest_scores", student_ids)
+    
+    def get_student(self, student_id):
+        """One student's {"name", "class", "major"}, or None"""
+        return self._students("get", student_id)
+    
+    def get_all_students(self):
+        """All students as {student_id: {"name", "class", "major"}}"""
+        return self._students("all")
+    
     def on_score_student_select(self, event):
         self.update_score_history()
     
@@ -792,191 +756,71 @@ class StudentScoreSystem:
             return
         
         student_id = selected.split(" - ")[0]
-        student_data = self.students[student_id]
-        
-        report = f"INDIVIDUAL STUDENT REPORT\n"
-        report += "=" * 50 + "\n\n"
-        report += f"Student ID: {student_id}\n"
-        report += f"Name: {student_data['name']}\n"
-        report += f"Class: {student_data['class']}\n"
-        report += f"Major: {student_data['major']}\n\n"
-        
-        report += "SUBJECT SCORES:\n"
-        report += "-" * 30 + "\n"
-        
-        total_score = 0
-        subject_count = 0
-        
-        for subject in self.subjects:
-            if subject in student_data.get("scores", {}):
-                scores = student_data["scores"][subject]
-                if scores:
-                    latest_score = scores[-1]["score"]
-                    grade = self.get_grade(latest_score)
-                    report += f"{subject:<15}: {latest_score:>6.1f} ({grade})\n"
-                    total_score += latest_score
-                    subject_count += 1
-            else:
-                report += f"{subject:<15}: {'No Score':>10}\n"
-        
-        if subject_count > 0:
-            average = total_score / subject_count
-            overall_grade = self.get_grade(average)
-            report += "-" * 30 + "\n"
-            report += f"{'Overall Average':<15}: {average:>6.1f} ({overall_grade})\n"
+        report = self.report_cache.get_or_build(
+            ("individual", student_id), lambda: self.build_individual_report(student_id),
+            (("students", student_id), ("scores", student_id))
+        )
+        if report is None:
+            messagebox.showerror("Error", "Student not found")
+            return
         
         self.report_text.delete(1.0, tk.END)
         self.report_text.insert(1.0, report)
     
+    def build_individual_report(self, student_id):
+        student_data = self.get_student(student_id)
+        if student_data is None:
+            return None
+        latest = self.get_latest_scores([student_id]).get(student_id, {})
+        return format_individual_report(individual_report(student_id, student_data, latest, self.subjects))
+    
     def generate_class_report(self):
-        if not self.students:
+        report = self.report_cache.get_or_build(("class",), self.build_class_report, ALL_STUDENT_DATA)
+        if report is None:
             messagebox.showerror("Error", "No students available")
             return
         
-        classes = {}
-        for student_id, data in self.students.items():
-            class_name = data["class"]
-            if class_name not in classes:
-                classes[class_name] = []
-            classes[class_name].append((student_id, data))
-        
-        report = "CLASS REPORT\n"
-        report += "=" * 50 + "\n\n"
-        
-        for class_name, students in sorted(classes.items()):
-            report += f"CLASS: {class_name}\n"
-            report += "-" * 30 + "\n"
-            
-            total_avg = 0
-            student_count = 0
-            
-            for student_id, data in students:
-                avg = self.calculate_average_score(student_id)
-                if avg > 0:
-                    grade = self.get_grade(avg)
-                    report += f"{data['name']:<20} (ID: {student_id}): {avg:>6.1f} ({grade})\n"
-                    total_avg += avg
-                    student_count += 1
-                else:
-                    report += f"{data['name']:<20} (ID: {student_id}): {'No Score':>10}\n"
-            
-            if student_count > 0:
-                class_avg = total_avg / student_count
-                report += f"\nClass Average: {class_avg:.1f}\n"
-            
-            report += "\n"
-        
         self.report_text.delete(1.0, tk.END)
         self.report_text.insert(1.0, report)
     
+    def build_class_report(self):
+        all_students = self.get_all_students()
+        if not all_students:
+            return None
+        return format_class_report(class_report(all_students, self.get_latest_scores()))
+    
     def generate_subject_report(self):
-        if not self.students:
+        report = self.report_cache.get_or_build(("subject",), self.build_subject_report, ALL_STUDENT_DATA)
+        if report is None:
             messagebox.showerror("Error", "No students available")
             return
         
-        report = "SUBJECT ANALYSIS REPORT\n"
-        report += "=" * 50 + "\n\n"
-        
-        for subject in self.subjects:
-            report += f"SUBJECT: {subject}\n"
-            report += "-" * 30 + "\n"
-            
-            scores = []
-            students_with_scores = []
-            
-            for student_id, data in self.students.items():
-                if subject in data.get("scores", {}):
-                    subject_scores = data["scores"][subject]
-                    if subject_scores:
-                        score = subject_scores[-1]["score"]
-                        scores.append(score)
-                        students_with_scores.append((data["name"], student_id, score))
-            
-            if scores:
-                avg_score = sum(scores) / len(scores)
-                max_score = max(scores)
-                min_score = min(scores)
-                
-                report += f"Students with scores: {len(scores)}\n"
-                report += f"Average Score: {avg_score:.1f}\n"
-                report += f"Highest Score: {max_score:.1f}\n"
-                report += f"Lowest Score: {min_score:.1f}\n\n"
-                
-                report += "Top performers:\n"
-                students_with_scores.sort(key=lambda x: x[2], reverse=True)
-                for i, (name, student_id, score) in enumerate(students_with_scores[:5]):
-                    grade = self.get_grade(score)
-                    report += f"  {i+1}. {name} (ID: {student_id}): {score:.1f} ({grade})\n"
-            else:
-                report += "No scores recorded for this subject\n"
-            
-            report += "\n"
-        
         self.report_text.delete(1.0, tk.END)
         self.report_text.insert(1.0, report)
     
+    def build_subject_report(self):
+        students = self.get_all_students()
+        if not students:
+            return None
+        return format_subject_report(subject_report(students, self.get_latest_scores(), self.subjects))
+    
     def update_statistics(self):
-        if not self.students:
-            self.stats_text.delete(1.0, tk.END)
-            self.stats_text.insert(1.0, "No student data available")
-            return
-        
-        stats = "SYSTEM STATISTICS\n"
-        stats += "=" * 40 + "\n\n"
-        
-        # Basic stats
-        stats += f"Total Students: {len(self.students)}\n\n"
-        
-        # Class distribution
-        classes = {}
-        majors = {}
-        for student_data in self.students.values():
-            class_name = student_data["class"]
-            major = student_data["major"]
-            classes[class_name] = classes.get(class_name, 0) + 1
-            majors[major] = majors.get(major, 0) + 1
-        
-        stats += "CLASS DISTRIBUTION:\n"
-        for class_name, count in sorted(classes.items()):
-            stats += f"  {class_name}: {count} students\n"
-        
-        stats += "\nMAJOR DISTRIBUTION:\n"
-        for major, count in sorted(majors.items()):
-            stats += f"  {major}: {count} students\n"
-        
-        # Subject averages
-        stats += "\nSUBJECT AVERAGES:\n"
-        for subject in self.subjects:
-            scores = []
-            for student_data in self.students.values():
-                if subject in student_data.get("scores", {}):
-                    subject_scores = student_data["scores"][subject]
-                    if subject_scores:
-                        scores.append(subject_scores[-1]["score"])
-            
-            if scores:
-                avg = sum(scores) / len(scores)
-                stats += f"  {subject:<15}: {avg:>6.1f} ({len(scores)} students)\n"
-            else:
-                stats += f"  {subject:<15}: {'No Data':>10}\n"
-        
-        # Overall system average
-        all_averages = []
-        for student_id in self.students:
-            avg = self.calculate_average_score(student_id)
-            if avg > 0:
-                all_averages.append(avg)
-        
-        if all_averages:
-            system_avg = sum(all_averages) / len(all_averages)
-            stats += f"\nSYSTEM AVERAGE: {system_avg:.1f}\n"
-            stats += f"Students with scores: {len(all_averages)}\n"
+        stats = self.report_cache.get_or_build(("statistics",), self.build_statistics, ALL_STUDENT_DATA)
         
         self.stats_text.delete(1.0, tk.END)
-        self.stats_text.insert(1.0, stats)
+        self.stats_text.insert(1.0, stats or "No student data available")
+    
+    def build_statistics(self):
+        students = self.get_all_students()
+        if not students:
+            return None
+        report = statistics_report(students, self._scores("statistics", students, self.subjects),
+                                   self.subjects, self.get_latest_scores())
+        return format_statistics(report)
     
     def export_to_csv(self):
-        if not self.students:
+        students = self.get_all_students()
+        if not students:
             messagebox.showerror("Error", "No data to export")
             return
         
@@ -989,58 +833,95 @@ class StudentScoreSystem:
             try:
                 with open(filename, 'w', newline='', encoding='utf-8-sig') as csvfile:
                     writer = csv.writer(csvfile)
-                    
-                    # Header
-                    header = ["Student ID", "Name", "Class", "Major"] + self.subjects + ["Average"]
-                    writer.writerow(header)
-                    
-                    # Data
-                    for student_id, data in self.students.items():
-                        row = [student_id, data["name"], data["class"], data["major"]]
-                        
-                        # Add subject scores
-                        for subject in self.subjects:
-                            if subject in data.get("scores", {}):
-                                scores = data["scores"][subject]
-                                if scores:
-                                    row.append(scores[-1]["score"])
-                                else:
-                                    row.append("")
-                            else:
-                                row.append("")
-                        
-                        # Add average
-                        avg = self.calculate_average_score(student_id)
-                        row.append(f"{avg:.1f}" if avg > 0 else "")
-                        
-                        writer.writerow(row)
+                    # Latest scores for every student in one batch
+                    writer.writerows(export_rows(students, self.get_latest_scores(), self.subjects))
                 
                 messagebox.showinfo("Success", f"Data exported to {filename}")
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to export: {str(e)}")
-
+    
     
     def close_connection(self):
-        """Close MongoDB connection"""
+        """Close MongoDB connection and write out pending local changes"""
         try:
-            if hasattr(self, 'use_mongodb') and self.use_mongodb:
-                if hasattr(self, 'client') and self.client:
-                    self.client.close()
-                    print("MongoDB connection closed.")
+            self.connection_monitor.stop()
+            # The client may be open while local writes are still being replayed
+            if hasattr(self, 'client') and self.client:
+                self.client.close()
+                print("MongoDB connection closed.")
         except Exception as e:
             print(f"Error closing MongoDB connection: {e}")
         finally:
             self.use_mongodb = False
+            self.replicator.stop()
+            self.executor.shutdown()
+            self.write_behind.close()
+            self.local_journal.close()
 
 def main():
+    parser = argparse.ArgumentParser(description="Student Score Management System")
+    parser.add_argument("--rebuild-summaries", action="store_true",
+                        help="regenerate the MongoDB student_summaries collection from scores and exit")
+    parser.add_argument("--backend", choices=BACKENDS, default="mongo",
+                        help="mongo: MongoDB with local fallback (default); local: local storage only, "
+                             "without loading the MongoDB driver; sqlite: the SQLite version of the app")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print import and startup times (like python -X importtime) once the window is up")
+    parser.add_argument("--mongodb-uri", default=DEFAULT_MONGODB_URI,
+                        help="MongoDB connection string")
+    parser.add_argument("--server-selection-timeout-ms", type=int,
+                        default=DEFAULT_TIMEOUTS_MS["serverSelectionTimeoutMS"],
+                        help="how long to wait for a usable MongoDB server")
+    parser.add_argument("--connect-timeout-ms", type=int,
+                        default=DEFAULT_TIMEOUTS_MS["connectTimeoutMS"],
+                        help="MongoDB socket connect timeout")
+    parser.add_argument("--socket-timeout-ms", type=int,
+                        default=DEFAULT_TIMEOUTS_MS["socketTimeoutMS"],
+                        help="MongoDB socket read/write timeout")
+    parser.add_argument("--health-interval", type=float, default=10.0,
+                        help="seconds between MongoDB health checks")
+    args = parser.parse_args()
+    if startup_profiler is not None:
+        startup_profiler.mark("imports")
+    timeouts = {
+        "serverSelectionTimeoutMS": args.server_selection_timeout_ms,
+        "connectTimeoutMS": args.connect_timeout_ms,
+        "socketTimeoutMS": args.socket_timeout_ms,
+    }
+    
+    if args.rebuild_summaries:
+        # Runs without the GUI, e.g. after loading scores in bulk
+        from pymongo import MongoClient
+        
+        client = MongoClient(args.mongodb_uri, **timeouts)
+        try:
+            db = client['student_management_db']
+            count = rebuild_student_summaries(db['scores'], db['student_summaries'])
+            print(f"Rebuilt {count} student summaries")
+        finally:
+            client.close()
+        return
+    
     try:
         root = tk.Tk()
-        app = StudentScoreSystem(root)
+        if args.backend == "sqlite":
+            # Imported only when chosen, like pymongo for the mongo backend
+            from student_score_db_system import StudentScoreDBSystem
+            app = StudentScoreDBSystem(root)
+            close = lambda: (app.executor.shutdown(), app.db.close())
+        else:
+            app = StudentScoreSystem(root, backend=args.backend, mongodb_uri=args.mongodb_uri,
+                                     mongodb_timeouts=timeouts, health_interval=args.health_interval)
+            close = app.close_connection
+        
+        if startup_profiler is not None:
+            startup_profiler.mark("window and widgets created")
+            root.after(0, startup_profiler.finish)
         
         # Close MongoDB connection when window is closed
         def on_closing():
             try:
-                app.close_connection()
+                close()
             except Exception as e:
                 print(f"Error during connection close: {e}")
             finally:
@@ -0,0 +1,374 @@
+class ListDataSource:
+    """Rows held in a Python list of (key, payload) pairs.
+    
+    If row_builder is given it turns a payload into the displayed values, and it
+    is only called for rows that are actually fetched for display. page_builder
+    does the same for a whole page of payloads at once, for values that are
+    cheaper to look up in one batch.
+    """
+    
+    def __init__(self, items, row_builder=None, page_builder=None):
+        self.items = list(items)
+        self.row_builder = row_builder
+        self.page_builder = page_builder
+        self._index = {key: position for position, (key, _) in enumerate(self.items)}
+    
+    def count(self):
+        return len(self.items)
+    
+    def index(self, key):
+        """Position of key, or None if it is not in the list"""
+        return self._index.get(key)
+    
+    def get(self, key):
+        position = self._index.get(key)
+        return None if position is None else self.items[position][1]
+    
+    def upsert(self, key, payload):
+        """Replace the payload for key, or append it; returns its position"""
+        position = self._index.get(key)
+        if position is None:
+            position = len(self.items)
+            self.items.append((key, payload))
+            self._index[key] = position
+        else:
+            self.items[position] = (key, payload)
+        return position
+    
+    def remove(self, key):
+        """Drop key from the list; returns the position it had, or None"""
+        position = self._index.pop(key, None)
+        if position is not None:
+            del self.items[position]
+            for index in range(position, len(self.items)):
+                self._index[self.items[index][0]] = index
+        return position
+    
+    def build(self, key):
+        """Displayed values for key"""
+        payload = self.get(key)
+        if self.page_builder is not None:
+            return self.page_builder([payload])[0]
+        return payload if self.row_builder is None else self.row_builder(payload)
+    
+    def fetch(self, offset, limit):
+        page = self.items[offset:offset + limit]
+        if self.page_builder is not None:
+            values = self.page_builder([payload for _, payload in page])
+            return [(key, row) for (key, _), row in zip(page, values)]
+        if self.row_builder is None:
+            return page
+        return [(key, self.row_builder(payload)) for key, payload in page]
+
+class QueryDataSource:
+    """Rows paged out of SQLite with LIMIT/OFFSET.
+    
+    page_sql must select the row key first and end with "LIMIT ? OFFSET ?".
+    formatter turns a fetched row into the displayed values (by default every
+    column after the key). connect is called for each fetch so the rows come
+    from the calling thread's connection.
+    """
+    
+    def __init__(self, connect, count_sql, page_sql, params=(), formatter=None):
+        self.connect = connect
+        self.count_sql = count_sql
+        self.page_sql = page_sql
+        self.params = tuple(params)
+        self.formatter = formatter
+    
+    def count(self):
+        return self.connect().execute(self.count_sql, self.params).fetchone()[0]
+    
+    def fetch(self, offset, limit):
+        rows = self.connect().execute(self.page_sql, self.params + (limit, offset)).fetchall()
+        if self.formatter is None:
+            return [(row[0], tuple(row[1:])) for row in rows]
+        return [(row[0], self.formatter(row)) for row in rows]
+
+class MongoDataSource:
+    """Rows paged out of a MongoDB collection in a fixed sort order.
+    
+    sort is a list of (field, direction) ending in a unique field. A page read
+    right after the one before it continues from that page's last sort values
+    (keyset pagination), so scrolling through the rows never makes the server
+    skip over the earlier ones; only a jump to an unread page uses skip().
+    formatter turns a fetched document into the displayed values. If on_error
+    is given, a failed query is reported to it and shows no rows.
+    """
+    
+    def __init__(self, collection, query, sort, key_field, projection=None, formatter=None, on_error=None):
+        self.collection = collection
+        self.query = query
+        self.sort = list(sort)
+        self.key_field = key_field
+        self.projection = projection
+        self.formatter = formatter
+        self.on_error = on_error
+        self._count = None
+        # offset -> sort values of the row just before it
+        self._boundaries = {}
+    
+    def count(self):
+        if self._count is None:
+            try:
+                if self.query:
+                    self._count = self.collection.count_documents(self.query)
+                else:
+                    self._count = self.collection.estimated_document_count()
+            except Exception as e:
+                if self.on_error is None:
+                    raise
+                self.on_error(e)
+                return 0
+        return self._count
+    
+    def _after(self, values):
+        """Query for the rows that sort after values"""
+        clauses = []
+        for index, ((field, direction), value) in enumerate(zip(self.sort, values)):
+            clause = {earlier: earlier_value for (earlier, _), earlier_value in zip(self.sort, values[:index])}
+            clause[field] = {"$gt" if direction > 0 else "$lt": value}
+            clauses.append(clause)
+        after = {"$or": clauses}
+        return {"$and": [self.query, after]} if self.query else after
+    
+    def fetch(self, offset, limit):
+        try:
+            boundary = self._boundaries.get(offset)
+            if boundary is not None:
+                cursor = self.collection.find(self._after(boundary), self.projection)
+            else:
+                cursor = self.collection.find(self.query, self.projection).skip(offset)
+            documents = list(cursor.sort(self.sort).limit(limit))
+        except Exception as e:
+            if self.on_error is None:
+                raise
+            self.on_error(e)
+            return []
+        
+        if documents:
+            last = documents[-1]
+            self._boundaries[offset + len(documents)] = tuple(last.get(field) for field, _ in self.sort)
+        if self.formatter is None:
+            return [(document[self.key_field], document) for document in documents]
+        return [(document[self.key_field], self.formatter(document)) for document in documents]
+
+class VirtualTreeview:
+    """Drives a ttk.Treeview so it only ever holds the rows on screen.
+    
+    The data source is read a page at a time and the pages around the visible
+    window are kept as a buffer, so scrolling back and forth does not refetch.
+    The scrollbar is driven by the row offset rather than by the Treeview.
+    Item iids are the row keys, so callers can find rows by key.
+    """
+    
+    def __init__(self, tree, scrollbar, page_size=200, cached_pages=8):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.page_size = page_size
+        self.cached_pages = cached_pages
+        
+        self.source = None
+        self.total = 0
+        self.offset = 0
+        self.visible_rows = max(int(tree.cget("height")), 1)
+        self._pages = {}
+        self._page_order = []
+        self._positions = {}
+        self._selected_key = None
+        self._height = None
+        
+        self.scrollbar.configure(command=self._on_scrollbar)
+        self.tree.configure(yscrollcommand=lambda first, last: None)
+        
+        self.tree.bind("<Configure>", self._on_configure, add="+")
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", lambda event: self.scroll(-3))
+        self.tree.bind("<Button-5>", lambda event: self.scroll(3))
+        self.tree.bind("<Up>", lambda event: self._move_selection(-1))
+        self.tree.bind("<Down>", lambda event: self._move_selection(1))
+        self.tree.bind("<Prior>", lambda event: self.scroll(-self.visible_rows))
+        self.tree.bind("<Next>", lambda event: self.scroll(self.visible_rows))
+        self.tree.bind("<<TreeviewSelect>>", self._on_select, add="+")
+    
+    def set_source(self, source, keep_position=False):
+        """Show rows from source (ListDataSource, QueryDataSource, MongoDataSource or compatible)"""
+        self.source = source
+        self._pages = {}
+        self._page_order = []
+        self._positions = {}
+        self.total = source.count() if source is not None else 0
+        if not keep_position:
+            self.offset = 0
+            self._selected_key = None
+        self.render()
+    
+    def refresh(self):
+        """Reload from the current source, keeping the scroll position"""
+        self.set_source(self.source, keep_position=True)
+    
+    def clear(self):
+        self.set_source(None)
+    
+    def invalidate(self, position=0):
+        """Rows from position onwards changed (a row was inserted or removed there).
+        
+        Only the cached pages at or after position are dropped, so a change
+        outside the visible window costs a row count and no Treeview work
+        beyond re-rendering the visible rows.
+        """
+        first = position // self.page_size
+        for number in [number for number in self._pages if number >= first]:
+            self._drop_page(number)
+        self.total = self.source.count() if self.source is not None else 0
+        self.render()
+    
+    def has_row(self, key):
+        """True if key is on a cached page (only those rows need updating)"""
+        return str(key) in self._positions
+    
+    def update_row(self, key, values):
+        """Replace the displayed values of one row in place"""
+        iid = str(key)
+        location = self._positions.get(iid)
+        if location is not None:
+            number, index = location
+            self._pages[number][index] = (key, values)
+        if self.tree.exists(iid):
+            self.tree.item(iid, values=values)
+    
+    def _page(self, number):
+        page = self._pages.get(number)
+        if page is None:
+            page = list(self.source.fetch(number * self.page_size, self.page_size))
+            self._pages[number] = page
+            self._page_order.append(number)
+            for index, (key, _) in enumerate(page):
+                self._positions[str(key)] = (number, index)
+            if len(self._page_order) > self.cached_pages:
+                self._drop_page(self._page_order[0])
+        return page
+    
+    def _drop_page(self, number):
+        page = self._pages.pop(number)
+        self._page_order.remove(number)
+        for key, _ in page:
+            if self._positions.get(str(key), (None,))[0] == number:
+                del self._positions[str(key)]
+    
+    def rows(self, offset, limit):
+        """Return (key, values) for rows [offset, offset + limit)"""
+        if self.source is None:
+            return []
+        rows = []
+        end = min(offset + limit, self.total)
+        position = offset
+        while position < end:
+            number, start = divmod(position, self.page_size)
+            page = self._page(number)
+            if start >= len(page):
+                break
+            chunk = page[start:start + end - position]
+            rows.extend(chunk)
+            position += len(chunk)
+        return rows
+    
+    def render(self):
+        """Update the Treeview items to show rows [offset, offset + visible_rows)"""
+        self.offset = max(0, min(self.offset, self.total - self.visible_rows))
+        rows = self.rows(self.offset, self.visible_rows)
+        
+        wanted = [str(key) for key, _ in rows]
+        wanted_set = set(wanted)
+        existing = self.tree.get_children()
+        stale = [iid for iid in existing if iid not in wanted_set]
+        if stale:
+            self.tree.delete(*stale)
+        
+        for index, (key, values) in enumerate(rows):
+            iid = str(key)
+            if self.tree.exists(iid):
+                self.tree.item(iid, values=values)
+                self.tree.move(iid, "", index)
+            else:
+                self.tree.insert("", index, iid=iid, values=values)
+        
+        if self._selected_key is not None and self._selected_key in wanted_set:
+            self.tree.selection_set(self._selected_key)
+        
+        self._update_scrollbar()
+        self._fit_rows()
+    
+    def _update_scrollbar(self):
+        if self.total <= 0:
+            self.scrollbar.set(0.0, 1.0)
+            return
+        first = self.offset / self.total
+        last = min(self.offset + self.visible_rows, self.total) / self.total
+        self.scrollbar.set(first, last)
+    
+    def scroll(self, rows):
+        """Move the window by a number of rows (negative scrolls up)"""
+        new_offset = max(0, min(self.offset + rows, self.total - self.visible_rows))
+        if new_offset != self.offset:
+            self.offset = new_offset
+            self.render()
+        return "break"
+    
+    def scroll_to(self, index):
+        """Scroll so that row index is visible"""
+        if index < self.offset:
+            self.scroll(index - self.offset)
+        elif index >= self.offset + self.visible_rows:
+            self.scroll(index - self.offset - self.visible_rows + 1)
+    
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.offset = int(float(amount) * self.total)
+            self.render()
+        elif action == "scroll":
+            step = self.visible_rows if unit == "pages" else 1
+            self.scroll(int(amount) * step)
+    
+    def _on_mousewheel(self, event):
+        return self.scroll(-3 if event.delta > 0 else 3)
+    
+    def _on_configure(self, event):
+        self._height = event.height
+        self._fit_rows()
+    
+    def _fit_rows(self):
+        """Match the number of rendered rows to the space the Treeview actually got"""
+        children = self.tree.get_children()
+        bbox = self.tree.bbox(children[0]) if children and self._height else None
+        if bbox:
+            _, top, _, row_height = bbox
+            rows = max(1, (self._height - top) // row_height)
+            if rows != self.visible_rows:
+                self.visible_rows = rows
+                self.render()
+    
+    def _on_select(self, event):
+        selection = self.tree.selection()
+        if selection:
+            self._selected_key = selection[0]
+    
+    def _move_selection(self, step):
+        """Keyboard navigation that scrolls past the rendered rows"""
+        children = self.tree.get_children()
+        if not children:
+            return "break"
+        selection = self.tree.selection()
+        if selection and selection[0] in children:
+            index = self.offset + children.index(selection[0]) + step
+        else:
+            index = self.offset
+        index = max(0, min(index, self.total - 1))
+        self.scroll_to(index)
+        children = self.tree.get_children()
+        position = index - self.offset
+        if 0 <= position < len(children):
+            self.tree.selection_set(children[position])
+            self.tree.focus(children[position])
+            self.tree.event_generate("<ButtonRelease-1>")
+        return "break"
@@ -0,0 +1,175 @@
+import itertools
+import threading
+import uuid
+from collections import OrderedDict
+
+from local_journal import LocalJournal
+from query_executor import JobCancelled
+
+class WriteBehindQueue:
+    """Durable FIFO of MongoDB writes made while the app was working locally.
+    
+    Each operation is (kind, args) with JSON-serializable args, and must be
+    safe to apply more than once: after a crash mid-replay the unacknowledged
+    tail is replayed again. The queue is kept in a LocalJournal, so it
+    survives restarts. It is safe to use from the Tk thread and a replay
+    thread at the same time.
+    """
+    
+    def __init__(self, base_path, compact_after=5000):
+        self.journal = LocalJournal(base_path, compact_after=compact_after)
+        self._operations = OrderedDict()
+        self._lock = threading.Lock()
+        self._loaded = False
+    
+    def load(self):
+        """Read the operations still waiting from a previous session"""
+        with self._lock:
+            self.journal.load(self._restore, self._apply)
+            self._loaded = True
+    
+    def _restore(self, operations):
+        for op_id, kind, args in operations:
+            self._operations[op_id] = (kind, args)
+    
+    def _apply(self, op, args):
+        if op == "enqueue":
+            op_id, kind, op_args = args
+            self._operations[op_id] = (kind, op_args)
+        elif op == "ack":
+            for op_id in args[0]:
+                self._operations.pop(op_id, None)
+    
+    def _record(self, op, *args):
+        if self._loaded:
+            self.journal.record(op, *args)
+            if self.journal.needs_compaction():
+                self.journal.compact([[op_id, kind, args] for op_id, (kind, args) in self._operations.items()])
+    
+    def enqueue(self, kind, *args):
+        """Append an operation; returns its id"""
+        op_id = uuid.uuid4().hex
+        with self._lock:
+            self._operations[op_id] = (kind, list(args))
+            self._record("enqueue", op_id, kind, list(args))
+        return op_id
+    
+    def peek(self, limit):
+        """The oldest operations as (op_id, kind, args), without removing them"""
+        with self._lock:
+            batch = []
+            for op_id, (kind, args) in self._operations.items():
+                if len(batch) >= limit:
+                    break
+                batch.append((op_id, kind, args))
+            return batch
+    
+    def ack(self, op_ids):
+        """Remove operations that have been applied"""
+        with self._lock:
+            for op_id in op_ids:
+                self._operations.pop(op_id, None)
+            self._record("ack", list(op_ids))
+    
+    def __len__(self):
+        with self._lock:
+            return len(self._operations)
+    
+    def close(self):
+        self.journal.close()
+
+class MongoReplicator:
+    """Reconnects to MongoDB in the background and replays a WriteBehindQueue.
+    
+    connect() opens and pings a client (raising if the server is down),
+    apply_batch(client, operations) writes a list of (kind, args) to it, and
+    on_recovered() runs on the Tk thread once the queue has been drained.
+    Failed attempts are retried with exponential backoff.
+    """
+    
+    def __init__(self, executor, queue, connect, apply_batch, on_recovered,
+                 batch_size=500, initial_delay=1.0, max_delay=60.0):
+        self.executor = executor
+        self.queue = queue
+        self.connect = connect
+        self.apply_batch = apply_batch
+        self.on_recovered = on_recovered
+        self.batch_size = batch_size
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.job = None
+    
+    @property
+    def running(self):
+        return self.job is not None
+    
+    def start(self):
+        """Start the reconnect loop unless it is already running"""
+        if self.job is None:
+            job = self.executor.submit(
+                self._run, name="mongodb-replicator",
+                on_success=lambda result: self._finished(job),
+                on_error=lambda error: self._failed(job, error),
+                on_cancel=lambda: self._stopped(job)
+            )
+            self.job = job
+    
+    def stop(self):
+        if self.job is not None:
+            self.job.cancel()
+            self.job = None
+    
+    def _run(self, job):
+        delay = 0
+        while True:
+            job.sleep(delay)
+            delay = min(max(delay * 2, self.initial_delay), self.max_delay)
+            try:
+                client = self.connect()
+            except Exception:
+                # Server still unreachable; try again after the next delay
+                continue
+            
+            try:
+                while True:
+                    job.check_cancelled()
+                    batch = self.queue.peek(self.batch_size)
+                    if not batch:
+                        return True
+                    self.apply_batch(client, [(kind, args) for _, kind, args in batch])
+                    self.queue.ack([op_id for op_id, _, _ in batch])
+            except JobCancelled:
+                raise
+            except Exception as e:
+                # Stays queued; everything that was applied is idempotent
+                print(f"MongoDB replay failed: {e}")
+            finally:
+                client.close()
+    
+    def _finished(self, job):
+        if self.job is not job:
+            return
+        self.job = None
+        if len(self.queue):
+            # Local writes arrived while the last batch was in flight
+            self.start()
+        else:
+            self.on_recovered()
+    
+    def _failed(self, job, error):
+        print(f"MongoDB replicator stopped: {error}")
+        if self.job is job:
+            self.job = None
+    
+    def _stopped(self, job):
+        if self.job is job:
+            self.job = None
+
+def new_score_id():
+    """Client-side id for a replayed score document, so replays are idempotent"""
+    return uuid.uuid4().hex
+
+def score_id_sequence():
+    """Ids like new_score_id() for many scores at once: one random prefix and a counter"""
+    prefix = uuid.uuid4().hex
+    return (f"{prefix}-{n}" for n in itertools.count())